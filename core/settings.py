@@ -67,6 +67,13 @@ MIDDLEWARE = (
     "cove.middleware.CoveConfigCurrentApp",
 )
 
+# If set, the phases of requests for results are timed, in a Server-Timing header and in one log message per request.
+if "SERVER_TIMING" in os.environ:
+    MIDDLEWARE = ("cove_ocds.middleware.ServerTimingMiddleware", *MIDDLEWARE)
+# If set, metrics are recorded in this SQLite database, shared by all processes, and served at /metrics.
+if "METRICS_DATABASE_PATH" in os.environ:
+    MIDDLEWARE = ("cove_ocds.middleware.MetricsMiddleware", *MIDDLEWARE)
+
 ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
@@ -269,3 +276,40 @@ HOTJAR = {
 }
 
 RELEASES_OR_RECORDS_TABLE_LENGTH = int(os.getenv("RELEASES_OR_RECORDS_TABLE_LENGTH", "25"))
+# JSON files of at least this many bytes are parsed incrementally, instead of being read into memory as a string before
+# parsing, if ijson's C backend is installed. The parsed data is still held in memory.
+# Before parsing, their encoding, syntax and top-level structure are checked, without building their data in memory.
+STREAMING_JSON_MIN_SIZE = int(os.getenv("STREAMING_JSON_MIN_SIZE", "104857600"))  # 100 MB
+# The maximum number of schemas (per version, extensions, language and package type) to keep in memory per process.
+SCHEMA_CACHE_SIZE = int(os.getenv("SCHEMA_CACHE_SIZE", "16"))
+# The number of threads in which to build schemas from the leading bytes of JSON files, while the files are parsed.
+# If 0, schemas are built after parsing.
+SCHEMA_PREFETCH_THREADS = int(os.getenv("SCHEMA_PREFETCH_THREADS", "4"))
+# If set, files of at least this many bytes are processed by the `run_jobs` command, instead of during the request. Set
+# it only if `run_jobs` workers are running. If 0, all files are processed during the request.
+BACKGROUND_JOB_MIN_SIZE = int(os.getenv("BACKGROUND_JOB_MIN_SIZE", "0"))
+# Jobs and conversions that have been running for longer than this many seconds are failed, as their worker was likely
+# killed, like for running out of memory.
+BACKGROUND_JOB_TIMEOUT = int(os.getenv("BACKGROUND_JOB_TIMEOUT", "3600"))  # 1 hour
+# If greater than 1, the releases or records of packages with more than VALIDATION_CHUNK_SIZE releases or records are
+# validated in chunks, in this many processes.
+VALIDATION_PROCESSES = int(os.getenv("VALIDATION_PROCESSES", "1"))
+VALIDATION_CHUNK_SIZE = int(os.getenv("VALIDATION_CHUNK_SIZE", "10000"))
+# If set, JSON data is converted to a spreadsheet by the `run_jobs` command after it is checked, instead of only on
+# request.
+CONVERT_AUTOMATICALLY = "CONVERT_AUTOMATICALLY" in os.environ
+METRICS_DATABASE_PATH = os.getenv("METRICS_DATABASE_PATH")
+# If set, the standard's schemas and codelists are read from the bundle in this directory, instead of being fetched.
+# Run the `build_schema_bundle` command to write the bundle.
+SCHEMA_BUNDLE_DIR = os.getenv("SCHEMA_BUNDLE_DIR")
+# If set, the responses to requests for extensions' files are stored in the SQLite database at this path, and are used
+# without a request for EXTENSION_CACHE_EXPIRE_AFTER seconds, after which they are revalidated.
+EXTENSION_CACHE_PATH = os.getenv("EXTENSION_CACHE_PATH")
+EXTENSION_CACHE_EXPIRE_AFTER = int(os.getenv("EXTENSION_CACHE_EXPIRE_AFTER", "3600"))  # 1 hour
+# The number of threads with which to request extensions' files. This shouldn't exceed ocdsextensionregistry's
+# REQUESTS_POOL_MAXSIZE (10, by default), the number of connections per host.
+EXTENSION_FETCH_THREADS = int(os.getenv("EXTENSION_FETCH_THREADS", "8"))
+# If set, the views are async, for an ASGI server (core.asgi). Blocking work runs outside the event loop.
+ASYNC_VIEWS = "ASYNC_VIEWS" in os.environ
+# The number of processes in which the async views parse, check and convert data. If 0, this work runs in threads.
+ANALYSIS_PROCESSES = int(os.getenv("ANALYSIS_PROCESSES", "0"))
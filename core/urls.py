@@ -8,5 +8,21 @@ from django.urls import re_path
 
 import cove_ocds.views
 
-urlpatterns += [re_path(r"^data/(.+)$", cove_ocds.views.explore_ocds, name="explore")]
+
+def view(name):
+    """Return the view, or its async variant if ``ASYNC_VIEWS`` is set."""
+    return getattr(cove_ocds.views, f"{name}_async" if settings.ASYNC_VIEWS else name)
+
+
+# Copy lib-cove-web's URL patterns, instead of extending them, as the index view is replaced if ASYNC_VIEWS is set.
+urlpatterns = [
+    *urlpatterns,
+    re_path(r"^data/([^/]+)/table$", view("explore_table"), name="explore_table"),
+    re_path(r"^data/([^/]+)/ocds-show$", view("explore_ocds_show"), name="explore_ocds_show"),
+    re_path(r"^data/([^/]+)/errors/(\d+)$", view("explore_error_locations"), name="explore_error_locations"),
+    re_path(r"^data/(.+)$", view("explore_ocds"), name="explore"),
+    re_path(r"^metrics$", cove_ocds.views.prometheus_metrics, name="metrics"),
+]
+if settings.ASYNC_VIEWS:
+    urlpatterns.insert(0, re_path(r"^$", view("data_input"), name="index"))
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,218 @@
+"""
+Measure the time and memory that each phase of checking a package takes, over generated packages of different sizes.
+
+The phases call the same functions as ``analyze()`` and the views that serve the results page, in the same order.
+For each phase, the wall time, the peak resident set size (RSS) and the peak memory allocated by Python are recorded.
+The results can be stored as a baseline, and compared to a baseline.
+"""
+
+import contextlib
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+import warnings
+from importlib import metadata
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from flattentool.exceptions import FlattenToolWarning
+from libcove.lib.converters import convert_json
+from libcoveocds.common_checks import common_checks_ocds
+
+from cove_ocds.lib import errors, ocds_show_extra, sharding, snapshot, streaming, summaries, synthetic
+from cove_ocds.lib.schema import SchemaOCDS, get_fields_index, schema_cache
+from cove_ocds.views import get_lib_cove_ocds_config
+
+PHASES = ("parse", "schema", "conversion", "checks", "grouping", "table", "ocds_show", "render")
+METRICS = ("seconds", "peak_rss", "allocated")
+# Differences smaller than these are noise, and aren't regressions.
+NOISE = {"seconds": 0.05, "peak_rss": 2**20, "allocated": 2**20}
+
+
+def _reset_peak_rss():
+    # Linux resets the peak RSS (VmHWM) if "5" is written to clear_refs.
+    with contextlib.suppress(OSError), open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def _peak_rss():
+    with contextlib.suppress(OSError), open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    # The peak RSS of the process so far, in kilobytes on Linux and in bytes on macOS.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def measure(function, *, allocations=True):
+    """
+    Call a function, and return its return value and its measurements.
+
+    :param allocations: whether to trace the memory allocated by Python, which slows the function
+    """
+    _reset_peak_rss()
+    if allocations:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        value = function()
+        seconds = time.perf_counter() - start
+        allocated = tracemalloc.get_traced_memory()[1] if allocations else None
+    finally:
+        if allocations:
+            tracemalloc.stop()
+    return value, {"seconds": seconds, "peak_rss": _peak_rss(), "allocated": allocated}
+
+
+class Run:
+    """The state of checking a package, passed from phase to phase."""
+
+    def __init__(self, path, upload_dir):
+        self.path = path
+        self.upload_dir = upload_dir
+        self.fingerprint = {"file": os.path.basename(path), "time": time.time()}
+        self.config = get_lib_cove_ocds_config()
+
+    def parse(self):
+        if os.path.getsize(self.path) >= settings.STREAMING_JSON_MIN_SIZE:
+            self.json_data = streaming.load(self.path)
+        else:
+            with open(self.path, encoding="utf-8") as f:
+                self.json_data = json.load(f)
+        self.key = "records" if "records" in self.json_data else "releases"
+
+    def schema(self):
+        self.schema_ocds = schema_cache.get(
+            SchemaOCDS(package_data=self.json_data, lib_cove_ocds_config=self.config, record_pkg=self.key == "records")
+        )
+        if self.schema_ocds.extensions:
+            self.schema_ocds.create_extended_schema_file(self.upload_dir, "")
+        self.schema_ocds.get_schema_obj(deref=True)
+
+    def conversion(self):
+        # Record packages aren't converted.
+        if self.key == "records":
+            return
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=FlattenToolWarning)
+            convert_json(
+                self.upload_dir,
+                "",
+                self.path,
+                self.config,
+                schema_url=self.schema_ocds.extended_schema_file or self.schema_ocds.schema_url,
+                replace=True,
+                flatten=True,
+            )
+
+    def checks(self):
+        sharding.write_validation_errors(self.upload_dir, self.json_data, self.schema_ocds)
+        self.context = common_checks_ocds({"file_type": "json"}, self.upload_dir, self.json_data, self.schema_ocds)
+
+    def grouping(self):
+        self.context["validation_errors_grouped"] = errors.write(
+            self.upload_dir, self.context["validation_errors"], self.fingerprint
+        )
+
+    def table(self):
+        summaries.write(self.upload_dir, self.json_data, self.key, self.fingerprint, self.path)
+        self.context[self.key] = summaries.page(self.upload_dir, 1, settings.RELEASES_OR_RECORDS_TABLE_LENGTH)[
+            "results"
+        ]
+        self.context["releases_or_records_count"] = len(self.json_data[self.key])
+
+    def ocds_show(self):
+        items = summaries.read(self.upload_dir, position=0)
+        fields = get_fields_index(self.schema_ocds)
+        directory = os.path.join(self.upload_dir, "ocds_show")
+        if self.key == "records":
+            ocds_show_extra.write_steps(os.path.join(directory, "steps.json.gz"), items[0], fields)
+        else:
+            ocds_show_extra.write_gzip(os.path.join(directory, "0.json.gz"), {self.key: items}, fields)
+
+    def render(self):
+        name = self.key[:-1]
+        self.context.update(
+            {
+                "data_uuid": "00000000-0000-0000-0000-000000000000",
+                "file_type": "json",
+                "json_data": {key: self.json_data[key] for key in snapshot.PACKAGE_METADATA if key in self.json_data},
+                "release_or_record": name,
+            }
+        )
+        # Like the middleware and the view, for a request for the results page.
+        request = RequestFactory().get(f"/data/{self.context['data_uuid']}")
+        request.user = AnonymousUser()
+        request.current_app = settings.COVE_CONFIG["app_name"]
+        request.current_app_base_template = settings.COVE_CONFIG["app_base_template"]
+        render_to_string(f"cove_ocds/explore_{name}.html", self.context, request=request)
+
+
+def run(path, upload_dir, phases=PHASES, *, allocations=True):
+    """
+    Check a package, and return the measurements of each phase.
+
+    :param path: the path to the JSON file of the package
+    :param upload_dir: an empty directory in which to write files, like a supplied data's upload directory
+    :param phases: the phases to measure, in ``PHASES``. A phase that isn't measured is still run, if a later phase
+        needs its result, but conversion is skipped.
+    """
+    state = Run(path, upload_dir)
+    results = {}
+    for phase in PHASES:
+        if phase in phases:
+            _, results[phase] = measure(getattr(state, phase), allocations=allocations)
+        elif phase != "conversion":
+            getattr(state, phase)()
+    return results
+
+
+def environment():
+    """Return a description of the environment in which the benchmark is run."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "libraries": {library: metadata.version(library) for library in snapshot.LIBRARIES},
+    }
+
+
+def package_path(directory, count, *, records=False):
+    """Return the path to a generated package, generating it if it doesn't exist."""
+    path = os.path.join(directory, f"{'records' if records else 'releases'}-{count}.json")
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        synthetic.write_package(tmp, count, records=records)
+        os.replace(tmp, path)
+    return path
+
+
+def compare(results, baseline, threshold):
+    """
+    Return the regressions in the results, compared to the baseline.
+
+    Each regression is a tuple of the package size, the phase, the metric, the baseline value and the result's value.
+
+    :param results: the ``results`` of a benchmark, by package size and phase
+    :param baseline: the ``results`` of a baseline benchmark
+    :param threshold: the fraction by which a metric can exceed its baseline value, like 0.2 for 20%
+    """
+    regressions = []
+    for size, phases in results.items():
+        for phase, measurements in phases.items():
+            expected = baseline.get(size, {}).get(phase, {})
+            for metric in METRICS:
+                old = expected.get(metric)
+                new = measurements.get(metric)
+                if old is None or new is None:
+                    continue
+                if new > old * (1 + threshold) and new - old > NOISE[metric]:
+                    regressions.append((size, phase, metric, old, new))
+    return regressions
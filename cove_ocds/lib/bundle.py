@@ -0,0 +1,192 @@
+"""
+Store the files of the standard in a local bundle, so that schemas and codelists are read without network requests.
+
+The ``build_schema_bundle`` command writes a bundle, for all versions in ``schema_version_choices`` and all
+``LANGUAGES``. If ``SCHEMA_BUNDLE_DIR`` is set, schemas are read from the bundle only (see
+:class:`cove_ocds.lib.schema.SchemaOCDS`). A bundle contains:
+
+``standard/{tag}.zip``
+  The standard's repository at the version's tag, from which lib-cove-ocds reads the release schema, the package
+  schemas and the codelists.
+``schema/{tag}/{name}``
+  The schemas in the ZIP file, to which the package schemas' ``$ref`` URLs are mapped.
+``{version}/{language}/{name}``
+  The schemas published at the version's URL, in each language, from which Flatten Tool reads titles. The release
+  schema is embedded in the release package schema, so that Flatten Tool has no ``$ref`` URLs to follow.
+``manifest.json``
+  The format of the bundle, its digest, the time it was created, the URLs of its files and their paths.
+"""
+
+import contextlib
+import functools
+import hashlib
+import io
+import json
+import os
+import pathlib
+import shutil
+import threading
+import zipfile
+
+import jsonref
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+# Increment if the structure of the bundle changes.
+FORMAT = 1
+MANIFEST = "manifest.json"
+
+STANDARD_ZIP_URL = "https://codeload.github.com/open-contracting/standard/zip/{tag}"
+# The base URL of the schemas to which the package schemas' $ref URLs refer.
+SCHEMA_URL = "https://standard.open-contracting.org/schema/{tag}/"
+SCHEMA_FILES = (
+    "release-schema.json",
+    "release-package-schema.json",
+    "record-package-schema.json",
+    "versioned-release-validation-schema.json",
+)
+PUBLISHED_FILES = ("release-schema.json", "release-package-schema.json", "record-package-schema.json")
+
+
+def get(url):
+    """Return the contents of a URL, as bytes."""
+    response = requests.get(url, timeout=settings.REQUESTS_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def _standard_files(contents, tag):
+    # Like ProfileBuilder.get_standard_file_contents().
+    with zipfile.ZipFile(io.BytesIO(contents)) as z:
+        names = z.namelist()
+        prefix = names[0] + ("standard/schema/" if tag < "1__1__5" else "schema/")
+        return {name[len(prefix) :]: z.read(name) for name in names if name.startswith(prefix)}
+
+
+def _write(directory, path, contents):
+    path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(contents)
+
+
+def write(directory, version_choices, languages, fetch=None):
+    """
+    Write a bundle of the standard's files, replacing any bundle in the directory.
+
+    :param version_choices: the ``schema_version_choices`` of the configuration, as ``version: (display, url, tag)``
+    :param languages: the language codes with which to format the versions' URLs
+    :param fetch: a function that returns the contents of a URL (default :func:`get`)
+    """
+    if fetch is None:
+        fetch = get
+
+    files = {}
+    standard = {}
+
+    # Write to a temporary directory and rename it, so that processes never read a partial bundle.
+    tmp = f"{directory}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        for _, _, tag in version_choices.values():
+            if tag in standard:
+                continue
+            contents = fetch(STANDARD_ZIP_URL.format(tag=tag))
+            standard[tag] = f"standard/{tag}.zip"
+            _write(tmp, standard[tag], contents)
+
+            schemas = _standard_files(contents, tag)
+            for name in SCHEMA_FILES:
+                files[SCHEMA_URL.format(tag=tag) + name] = f"schema/{tag}/{name}"
+                _write(tmp, files[SCHEMA_URL.format(tag=tag) + name], schemas[name])
+
+        for version, (_, url, _) in version_choices.items():
+            for language in languages:
+                base_url = url.format(lang=language)
+                published = {name: json.loads(fetch(base_url + name)) for name in PUBLISHED_FILES}
+                published["release-package-schema.json"]["properties"]["releases"]["items"] = jsonref.replace_refs(
+                    published["release-schema.json"], proxies=False
+                )
+                for name, schema in published.items():
+                    files[base_url + name] = f"{version}/{language}/{name}"
+                    _write(tmp, files[base_url + name], json.dumps(schema, ensure_ascii=False).encode())
+
+        digest = hashlib.sha256()
+        for url, path in sorted(files.items()):
+            digest.update(url.encode())
+            with open(os.path.join(tmp, path), "rb") as f:
+                digest.update(hashlib.file_digest(f, "sha256").digest())
+
+        manifest = {
+            "format": FORMAT,
+            "digest": digest.hexdigest(),
+            "created": timezone.now().isoformat(),
+            "standard": standard,
+            "files": files,
+        }
+        _write(tmp, MANIFEST, json.dumps(manifest, indent=2).encode())
+
+        old = f"{tmp}.old"
+        with contextlib.suppress(FileNotFoundError):
+            os.replace(directory, old)
+        os.replace(tmp, directory)
+        shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    return manifest
+
+
+@functools.lru_cache
+def read_manifest(directory):
+    """Return the manifest of the bundle in the directory."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        message = f"SCHEMA_BUNDLE_DIR ({directory}) has no readable {MANIFEST}: run the build_schema_bundle command"
+        raise ImproperlyConfigured(message) from e
+    if manifest.get("format") != FORMAT:
+        message = f"SCHEMA_BUNDLE_DIR ({directory}) has an old format: run the build_schema_bundle command"
+        raise ImproperlyConfigured(message)
+    return manifest
+
+
+def _path(directory, relative, description):
+    if relative is None:
+        message = f"SCHEMA_BUNDLE_DIR ({directory}) has no {description}: run the build_schema_bundle command"
+        raise ImproperlyConfigured(message)
+    return os.path.join(directory, relative)
+
+
+def standard_zip_url(directory, tag):
+    """Return the ``file://`` URL of the standard's ZIP file at the tag."""
+    path = _path(directory, read_manifest(directory)["standard"].get(tag), f"standard at {tag}")
+    return pathlib.Path(path).resolve().as_uri()
+
+
+def local_path(url):
+    """
+    Return the path to the file in the bundle with the URL, if ``SCHEMA_BUNDLE_DIR`` is set. Otherwise, return the URL.
+
+    Raises :exc:`~django.core.exceptions.ImproperlyConfigured` if the bundle has no such file.
+    """
+    directory = settings.SCHEMA_BUNDLE_DIR
+    if not directory:
+        return url
+    return _path(directory, read_manifest(directory)["files"].get(url), url)
+
+
+def load(url, **kwargs):
+    """
+    Load the JSON file in the bundle with the URL, as a ``loader`` for jsonref.
+
+    OCDS 1.0's package schemas use the http scheme, and the bundle uses the https scheme.
+    """
+    if url.startswith("http://"):
+        url = f"https://{url[7:]}"
+    with open(local_path(url)) as f:
+        return json.load(f, **kwargs)
@@ -0,0 +1,171 @@
+"""
+Store the validation errors of an upload, so that the results page can show their locations page by page.
+
+Each distinct error is stored once, with its category (``required``, ``format`` or ``other``), message type, path and
+error ID, and its number of locations, so that the errors can be grouped without parsing them again. The locations
+are stored in a separate table, in order, so that a page of locations can be read without reading the others.
+
+The errors are stored in ``validation_errors.sqlite3`` in the upload directory, with the fingerprint of the inputs to
+the checks.
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+
+# Increment if the structure of the database changes.
+FORMAT = 1
+FILENAME = "validation_errors.sqlite3"
+
+CATEGORIES = ("required", "format", "other")
+# The message types of errors in the "format" category.
+FORMAT_TYPES = {"format", "pattern", "number", "string", "date-time", "uri", "object", "integer", "array"}
+# The number of locations to show in the table of errors.
+EXAMPLES = 3
+
+SCHEMA = """
+CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE error (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    message_type TEXT,
+    path TEXT,
+    error_id TEXT,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    examples TEXT NOT NULL
+);
+CREATE TABLE location (
+    error INTEGER NOT NULL, position INTEGER NOT NULL, value TEXT NOT NULL, PRIMARY KEY (error, position)
+) WITHOUT ROWID;
+CREATE INDEX error_category ON error (category, id);
+"""
+
+
+def category(message_type):
+    """Return the category of an error with the given message type."""
+    if message_type == "required":
+        return "required"
+    if message_type in FORMAT_TYPES:
+        return "format"
+    return "other"
+
+
+def _connect(path):
+    # Open read-only, so that a missing file isn't created.
+    return contextlib.closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True))
+
+
+def read_metadata(upload_dir):
+    """Return the metadata of the stored errors (the format and the fingerprint), or ``None`` if none are stored."""
+    path = os.path.join(upload_dir, FILENAME)
+    with contextlib.suppress(sqlite3.Error), _connect(path) as connection:
+        return {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM metadata")}
+    return None
+
+
+def _rows(validation_errors, encoder, grouped):
+    for number, (error_json, values) in enumerate(validation_errors, 1):
+        error = json.loads(error_json)
+        name = category(error.get("message_type"))
+        # Group the errors as they are written, so that their keys aren't parsed again.
+        grouped[name].append({"id": number, "error": error, "count": len(values), "examples": values[:EXAMPLES]})
+        yield (
+            number,
+            name,
+            error.get("message_type"),
+            error.get("path_no_number"),
+            error.get("error_id"),
+            error_json,
+            len(values),
+            encoder.encode(values[:EXAMPLES]),
+        )
+
+
+def _locations(validation_errors, encoder):
+    for number, (_, values) in enumerate(validation_errors, 1):
+        for position, value in enumerate(values):
+            yield number, position, encoder.encode(value)
+
+
+def write(upload_dir, validation_errors, value):
+    """
+    Store the validation errors, unless already stored, and return the errors in each category, like :func:`groups`.
+
+    :param validation_errors: the validation errors, as pairs of an error's JSON key and its locations, as returned
+        by lib-cove's ``common_checks_context()``
+    :param value: the fingerprint of the checks' inputs
+    """
+    metadata = {"format": FORMAT, "fingerprint": value}
+    if read_metadata(upload_dir) == metadata:
+        return groups(upload_dir)
+
+    grouped = {name: [] for name in CATEGORIES}
+    path = os.path.join(upload_dir, FILENAME)
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+    # Write to a temporary file and rename it, so that concurrent requests never read a partial file.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tmp)
+
+    with contextlib.closing(sqlite3.connect(tmp)) as connection, connection:
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            "INSERT INTO error VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _rows(validation_errors, encoder, grouped)
+        )
+        connection.executemany("INSERT INTO location VALUES (?, ?, ?)", _locations(validation_errors, encoder))
+        connection.executemany(
+            "INSERT INTO metadata VALUES (?, ?)",
+            ((name, json.dumps(item)) for name, item in metadata.items()),
+        )
+    os.replace(tmp, path)
+    return grouped
+
+
+def groups(upload_dir):
+    """
+    Return the errors in each category, in order, or ``None`` if no errors are stored.
+
+    Each error is a dict with the error's ``id`` in the store, the decoded ``error`` key, its ``count`` of locations,
+    and its first locations (``examples``).
+    """
+    path = os.path.join(upload_dir, FILENAME)
+    grouped = {name: [] for name in CATEGORIES}
+    try:
+        with _connect(path) as connection:
+            for number, name, key, count, examples in connection.execute(
+                "SELECT id, category, key, count, examples FROM error ORDER BY category, id"
+            ):
+                grouped[name].append(
+                    {"id": number, "error": json.loads(key), "count": count, "examples": json.loads(examples)}
+                )
+    except sqlite3.Error:
+        return None
+    return grouped
+
+
+def locations(upload_dir, error, number, size):
+    """
+    Return the number of locations of an error, and the locations on a page, or ``None`` if the error isn't stored.
+
+    :param error: the error's ``id`` in the store
+    :param number: the page number, starting at 1
+    :param size: the number of locations per page
+    """
+    path = os.path.join(upload_dir, FILENAME)
+    try:
+        with _connect(path) as connection:
+            row = connection.execute("SELECT count FROM error WHERE id = ?", [error]).fetchone()
+            if row is None:
+                return None
+            values = connection.execute(
+                "SELECT value FROM location WHERE error = ? AND position >= ? ORDER BY position LIMIT ?",
+                [error, (number - 1) * size, size],
+            )
+            results = [json.loads(value) for (value,) in values]
+    except sqlite3.Error:
+        return None
+    return {"count": row[0], "results": results}
@@ -6,6 +6,56 @@ from libcove.lib.exceptions import CoveInputDataError
 mark_safe_lazy = lazy(mark_safe, str)
 
 
+def raise_encoding_error(err):
+    raise CoveInputDataError(
+        context={
+            "sub_title": _("Sorry, we can't process that data"),
+            "link": "index",
+            "link_text": _("Try Again"),
+            "msg": format_html(
+                _(
+                    "The file that you uploaded doesn't appear to be well formed JSON. OCDS JSON follows "
+                    "the I-JSON format, which requires UTF-8 encoding. Ensure that your file uses UTF-8 "
+                    'encoding, then try uploading again.\n\n<span class="glyphicon glyphicon-exclamation-'
+                    'sign" aria-hidden="true"></span> <strong>Error message:</strong> {}'
+                ),
+                err,
+            ),
+            "error": format(err),
+        }
+    ) from None
+
+
+def raise_json_error(err):
+    raise CoveInputDataError(
+        context={
+            "sub_title": _("Sorry, we can't process that data"),
+            "link": "index",
+            "link_text": _("Try Again"),
+            "msg": format_html(
+                _(
+                    "We think you tried to upload a JSON file, but it is not well formed JSON."
+                    '\n\n<span class="glyphicon glyphicon-exclamation-sign" aria-hidden="true">'
+                    "</span> <strong>Error message:</strong> {}",
+                ),
+                err,
+            ),
+            "error": format(err),
+        }
+    ) from None
+
+
+def raise_non_object_error():
+    raise CoveInputDataError(
+        context={
+            "sub_title": _("Sorry, we can't process that data"),
+            "link": "index",
+            "link_text": _("Try Again"),
+            "msg": _("OCDS JSON should have an object as the top level, the JSON you supplied does not."),
+        }
+    )
+
+
 def raise_invalid_version_argument(version):
     raise CoveInputDataError(
         context={
@@ -92,3 +142,14 @@ def raise_missing_package_error():
             "error": _("Missing OCDS package"),
         }
     )
+
+
+def raise_structure_error(err):
+    """Raise the error for a :exc:`~cove_ocds.lib.streaming.StructureError`, like if the data were parsed."""
+    if err.kind == "encoding":
+        raise_encoding_error(err)
+    if err.kind == "syntax":
+        raise_json_error(err)
+    if err.kind == "top_level":
+        raise_non_object_error()
+    raise_missing_package_error()
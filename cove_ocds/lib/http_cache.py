@@ -0,0 +1,103 @@
+"""
+Cache the responses to requests for extensions' files in a SQLite database, shared by all processes.
+
+lib-cove-ocds downloads each extension's metadata, release schema patch and codelists through the session of
+ocdsextensionregistry, which keeps its responses in memory, for the lifetime of the process. If
+``EXTENSION_CACHE_PATH`` is set, that session's responses are instead stored in the SQLite database at that path.
+
+A stored response is used without a request for ``EXTENSION_CACHE_EXPIRE_AFTER`` seconds. After that, it is
+revalidated with a conditional request (``If-None-Match`` or ``If-Modified-Since``, from the response's ``ETag`` or
+``Last-Modified`` header): if the server responds with 304 Not Modified, the stored response is used again. If the
+server is unreachable or responds with an error, the stored response is used, however old.
+
+The session's adapter pools keep-alive connections per host, so that requests for files of extensions on the same host
+reuse connections. :func:`prefetch` requests the extensions' files concurrently, before lib-cove-ocds reads them.
+"""
+
+import contextlib
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from ocdsextensionregistry import util
+from requests_cache import NEVER_EXPIRE, CacheSettings
+from requests_cache.backends import SQLiteCache, init_backend
+
+# The errors that lib-cove-ocds reports for extensions' files.
+ERRORS = (requests.RequestException, NotImplementedError, zipfile.BadZipFile, UnicodeDecodeError, ValueError)
+
+_lock = threading.Lock()
+# The settings with which the session is configured.
+_configured = None
+
+
+def configure():
+    """Configure ocdsextensionregistry's session according to the settings, if they changed since the last call."""
+    global _configured  # noqa: PLW0603
+
+    key = (settings.EXTENSION_CACHE_PATH, settings.EXTENSION_CACHE_EXPIRE_AFTER)
+    # The session is left as is, unless it was configured before.
+    if key == _configured or (_configured is None and not settings.EXTENSION_CACHE_PATH):
+        return
+
+    with _lock:
+        if key == _configured:
+            return
+
+        session = util.session
+        if settings.EXTENSION_CACHE_PATH:
+            session.cache = SQLiteCache(settings.EXTENSION_CACHE_PATH, wal=True)
+            session.settings = CacheSettings(expire_after=settings.EXTENSION_CACHE_EXPIRE_AFTER, stale_if_error=True)
+        else:
+            # ocdsextensionregistry's defaults.
+            session.cache = init_backend("http_cache", "memory")
+            session.settings = CacheSettings(expire_after=NEVER_EXPIRE)
+
+        _configured = key
+
+
+def _call(function):
+    # Errors are raised again when lib-cove-ocds reads the file, so that it reports them as usual.
+    with contextlib.suppress(*ERRORS):
+        return function()
+    return None
+
+
+def prefetch(extensions, threads):
+    """
+    Request the files of the extensions that lib-cove-ocds reads, concurrently, in at most this many threads.
+
+    Each ExtensionVersion keeps the files that are retrieved. Files that fail to be retrieved are requested again when
+    lib-cove-ocds reads them, in the order of the extensions, so that the errors that it reports are unchanged.
+
+    :param extensions: ExtensionVersion objects
+    """
+    if threads <= 1 or len(extensions) <= 1:
+        return
+
+    remote = [extension for extension in extensions if not extension.download_url]
+    for extension in remote:
+        # Initialize the dict of files, before threads add to it.
+        extension.files  # noqa: B018
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        functions = [lambda extension=extension: extension.metadata for extension in remote]
+        functions.extend(
+            lambda extension=extension: extension.files for extension in extensions if extension.download_url
+        )
+        functions.extend(
+            lambda extension=extension: extension.remote("release-schema.json", default="{}") for extension in remote
+        )
+        results = list(executor.map(_call, functions))
+
+        # Like ExtensionVersion.codelists. The codelists to request depend on the metadata.
+        functions = [
+            lambda extension=extension, name=name: extension.remote(f"codelists/{name}")
+            for extension, metadata in zip(remote, results, strict=False)
+            if metadata is not None and isinstance(metadata.get("codelists"), list)
+            for name in metadata["codelists"]
+            if isinstance(name, str)
+        ]
+        list(executor.map(_call, functions))
@@ -0,0 +1,243 @@
+"""
+Count and measure the uploads that are checked, for the ``/metrics`` endpoint, in the Prometheus text format.
+
+Web server processes and ``run_jobs`` processes add to the same SQLite database, at ``METRICS_DATABASE_PATH``, so that
+the metrics are aggregated across processes. If ``METRICS_DATABASE_PATH`` isn't set, nothing is recorded.
+
+Counters and histograms are stored as the values of their samples. A histogram's buckets are cumulative: observing a
+value increments each bucket whose upper bound is at least the value, and the histogram's ``_sum`` and ``_count``.
+Gauges of work in progress are stored per process, so that the work of a process that dies isn't counted.
+"""
+
+import contextlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+COUNT_BUCKETS = (1, 10, 100, 1e3, 1e4, 1e5, 1e6)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+# The metrics, as name: (type, help, buckets).
+METRICS = {
+    "cove_ocds_upload_size_bytes": ("histogram", "The size of the checked files, in bytes.", SIZE_BUCKETS),
+    "cove_ocds_releases_or_records": (
+        "histogram",
+        "The number of releases or records in the checked files.",
+        COUNT_BUCKETS,
+    ),
+    "cove_ocds_phase_duration_seconds": (
+        "histogram",
+        "The duration of each phase of requests and jobs, in seconds.",
+        DURATION_BUCKETS,
+    ),
+    "cove_ocds_cache_requests_total": ("counter", "Requests to the schema caches, by cache and result.", None),
+    "cove_ocds_error_groups_total": ("counter", "Distinct validation errors in the checked files, by category.", None),
+    "cove_ocds_conversions_total": ("counter", "Finished conversions of JSON data to spreadsheets, by status.", None),
+    "cove_ocds_analyses_in_progress": ("gauge", "Uploads being checked, in requests and jobs.", None),
+    "cove_ocds_analyses_queued": ("gauge", "Uploads waiting to be checked by the run_jobs command.", None),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sample (name TEXT, labels TEXT, value REAL NOT NULL, PRIMARY KEY (name, labels));
+CREATE TABLE IF NOT EXISTS live (name TEXT, pid INTEGER, value REAL NOT NULL, PRIMARY KEY (name, pid));
+"""
+
+# The time to wait for other processes' transactions, in seconds. If exceeded, the samples are dropped, so that
+# recording metrics doesn't delay a response.
+TIMEOUT = 0.5
+
+_lock = threading.Lock()
+# The connection to the database, as (pid, path, connection), shared by the threads of a process.
+_connection = None
+
+
+@contextlib.contextmanager
+def _connect():
+    global _connection  # noqa: PLW0603
+
+    path = settings.METRICS_DATABASE_PATH
+    with _lock:
+        # A forked process opens its own connection.
+        if _connection is None or _connection[:2] != (os.getpid(), path):
+            connection = sqlite3.connect(path, timeout=TIMEOUT, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.executescript(SCHEMA)
+            _connection = (os.getpid(), path, connection)
+        yield _connection[2]
+
+
+def _labels(labels):
+    return json.dumps(labels, sort_keys=True)
+
+
+def _add(samples):
+    """Add the values to the samples, as (name, labels, value) tuples. Errors are logged, not raised."""
+    if not settings.METRICS_DATABASE_PATH:
+        return
+    try:
+        with _connect() as connection, connection:
+            connection.executemany(
+                "INSERT INTO sample VALUES (?, ?, ?) ON CONFLICT DO UPDATE SET value = value + excluded.value",
+                samples,
+            )
+    except sqlite3.Error:
+        logger.exception("Failed to record metrics")
+
+
+def _observations(name, value, labels):
+    yield f"{name}_sum", _labels(labels), value
+    yield f"{name}_count", _labels(labels), 1
+    for bound in (*METRICS[name][2], math.inf):
+        if value <= bound:
+            yield f"{name}_bucket", _labels({**labels, "le": bound}), 1
+
+
+def increment(name, value=1, **labels):
+    """Add the value to a counter or gauge."""
+    _add([(name, _labels(labels), value)])
+
+
+def observe_analysis(size, count, grouped):
+    """
+    Observe the checks of an upload.
+
+    :param size: the file size, in bytes
+    :param count: the number of releases or records
+    :param grouped: the validation errors, grouped by category, as returned by :func:`cove_ocds.lib.errors.groups`
+    """
+    samples = [
+        *_observations("cove_ocds_upload_size_bytes", size, {}),
+        *_observations("cove_ocds_releases_or_records", count, {}),
+    ]
+    for category, items in (grouped or {}).items():
+        samples.append(("cove_ocds_error_groups_total", _labels({"category": category}), len(items)))
+    _add(samples)
+
+
+def observe_timings(timings, kind):
+    """
+    Observe the durations of the phases of a request or job.
+
+    :param timings: a :class:`cove_ocds.lib.timing.Timings`
+    :param kind: "request" or "job"
+    """
+    samples = []
+    for phase, seconds in timings.phases.items():
+        samples.extend(_observations("cove_ocds_phase_duration_seconds", seconds, {"kind": kind, "phase": phase}))
+    if samples:
+        _add(samples)
+
+
+def _add_live(name, value):
+    """Add the value to a gauge of work in progress in this process. Errors are logged, not raised."""
+    if not settings.METRICS_DATABASE_PATH:
+        return
+    try:
+        with _connect() as connection, connection:
+            connection.execute(
+                "INSERT INTO live VALUES (?, ?, ?) ON CONFLICT DO UPDATE SET value = value + excluded.value",
+                (name, os.getpid(), value),
+            )
+    except sqlite3.Error:
+        logger.exception("Failed to record metrics")
+
+
+def _alive(pid):
+    # The processes share the database file, so they run on the same host.
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # the process exists, but is another user's
+        pass
+    return True
+
+
+@contextlib.contextmanager
+def in_progress():
+    """Count the block as an analysis in progress."""
+    _add_live("cove_ocds_analyses_in_progress", 1)
+    try:
+        yield
+    finally:
+        _add_live("cove_ocds_analyses_in_progress", -1)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{key}="{_format_value(value) if key == "le" else _escape(value)}"' for key, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+def expose(gauges=None):
+    """
+    Return the metrics in the Prometheus text format.
+
+    :param gauges: the values of gauges that are computed when the metrics are requested, by name
+    """
+    samples = {}
+    if settings.METRICS_DATABASE_PATH:
+        with _connect() as connection, connection:
+            for name, labels, value in connection.execute("SELECT name, labels, value FROM sample"):
+                samples.setdefault(name, []).append((json.loads(labels), value))
+
+            # Remove the gauges of processes that died, instead of counting their work as in progress forever.
+            totals = {}
+            dead = set()
+            for name, pid, value in connection.execute("SELECT name, pid, value FROM live").fetchall():
+                if pid in dead or not _alive(pid):
+                    dead.add(pid)
+                else:
+                    totals[name] = totals.get(name, 0) + value
+            connection.executemany("DELETE FROM live WHERE pid = ?", [(pid,) for pid in dead])
+            for name, value in totals.items():
+                samples[name] = [({}, value)]
+    for name, value in (gauges or {}).items():
+        samples[name] = [({}, value)]
+
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for labels, count in sorted(samples.get(f"{name}_count", []), key=lambda sample: _labels(sample[0])):
+                cumulative = {
+                    bucket_labels["le"]: value
+                    for bucket_labels, value in samples.get(f"{name}_bucket", [])
+                    if {key: item for key, item in bucket_labels.items() if key != "le"} == labels
+                }
+                lines.extend(
+                    f"{name}_bucket{_format_labels({**labels, 'le': bound})} {_format_value(cumulative.get(bound, 0))}"
+                    for bound in (*buckets, math.inf)
+                )
+                total = next(value for sample_labels, value in samples[f"{name}_sum"] if sample_labels == labels)
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_format_value(count)}")
+        else:
+            lines.extend(
+                f"{name}{_format_labels(labels)} {_format_value(value)}"
+                for labels, value in sorted(samples.get(name, []), key=lambda sample: _labels(sample[0]))
+            )
+    return "\n".join(lines) + "\n"
@@ -1,41 +1,254 @@
-from libcove.lib.common import schema_dict_fields_generator
+import copy
+import gzip
+import json
+import os
+import threading
+from decimal import Decimal
 
+# Increment if the serialization changes, to invalidate stored responses.
+FORMAT = 2
 
-def add_extra_fields(data, deref_release_schema):
-    all_schema_fields = set(schema_dict_fields_generator(deref_release_schema))
 
+class _Encoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return super().default(o)
+
+
+# Subtrees that aren't annotated are encoded with encode(), which uses the C encoder, unlike iterencode().
+_encoder = _Encoder()
+
+
+def iterencode(data, fields):
+    """
+    Yield the JSON serialization of a release package or record package, in chunks.
+
+    Each object in a release has an ``__extra`` member, containing its members that aren't in the schema. The data is
+    walked once, without being copied or modified.
+
+    :param fields: the tree of the release schema's fields, from :func:`cove_ocds.lib.schema.get_fields_index`
+    """
     if "releases" in data:
-        for release in data.get("releases", []):
-            if not isinstance(release, dict):
-                return
-            add_extra_fields_to_obj(release, all_schema_fields, "")
+        key = "releases"
     elif "records" in data:
-        for record in data.get("records", []):
-            if not isinstance(record, dict):
-                return
-            for release in record.get("releases", []):
-                add_extra_fields_to_obj(release, all_schema_fields, "")
+        key = "records"
+    else:
+        key = None
+
+    yield "{"
+    for i, (name, value) in enumerate(data.items()):
+        if i:
+            yield ", "
+        yield f"{_encoder.encode(name)}: "
+        if name == key and isinstance(value, list):
+            yield from _iterencode_package_array(value, key, fields)
+        else:
+            yield _encoder.encode(value)
+    yield "}"
+
+
+def write_gzip(path, data, fields):
+    """Write the serialization of a release package or record package to a gzip file, like :func:`iterencode`."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file and rename it, so that other processes never read a partial file.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    _write_chunks(tmp, iterencode(data, fields))
+    os.replace(tmp, path)
+
+
+def merge(compiled, release):
+    """
+    Merge a release into a compiled release, in place, and return a JSON Merge Patch that reverts the merge.
+
+    Objects are merged recursively, arrays of objects that all have an ``id`` are merged by ``id``, other arrays are
+    replaced, and ``null`` removes a field. Only the fields in the release are visited, so compiling the releases in a
+    record one at a time takes time proportional to their total size.
+    """
+    patch = {}
+    for key, value in release.items():
+        exists = key in compiled
+        previous = compiled.get(key)
+        if value is None:
+            if exists:
+                patch[key] = compiled.pop(key)
+        elif isinstance(value, dict):
+            if isinstance(previous, dict):
+                if subpatch := merge(previous, value):
+                    patch[key] = subpatch
+            else:
+                compiled[key] = {}
+                merge(compiled[key], value)
+                patch[key] = previous
+        elif isinstance(value, list) and value and all(_identifier(item) is not None for item in value):
+            # The array is modified in place, so the patch needs a copy.
+            patch[key] = copy.deepcopy(previous)
+            items = previous if isinstance(previous, list) else []
+            identifiers = {_identifier(item): item for item in items if _identifier(item) is not None}
+            for item in value:
+                identifier = _identifier(item)
+                if identifier not in identifiers:
+                    identifiers[identifier] = {}
+                    items.append(identifiers[identifier])
+                merge(identifiers[identifier], item)
+            compiled[key] = items
+        elif not exists or previous != value:
+            compiled[key] = copy.deepcopy(value)
+            patch[key] = previous
+    return patch
+
+
+def _identifier(item):
+    if isinstance(item, dict) and isinstance(item.get("id"), (str, int)):
+        return item["id"]
+    return None
+
+
+def _date(release):
+    date = release.get("date")
+    # Like OCDS Show, releases without a date are first.
+    return (isinstance(date, str), date if isinstance(date, str) else "")
+
+
+def apply_patch(target, patch):
+    """Apply a JSON Merge Patch to a value, in place if it is an object, and return the result, like OCDS Show."""
+    if not isinstance(patch, dict):
+        return patch
+    if not isinstance(target, dict):
+        target = {}
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        else:
+            target[key] = apply_patch(target.get(key), value)
+    return target
+
 
+def write_steps(path, record, fields):
+    """
+    Compile the releases in a record one at a time, in order of date, and write the steps to a gzip file.
 
-def add_extra_fields_to_obj(obj, all_schema_fields, current_path):
-    if not isinstance(obj, dict):
-        return
-    obj["__extra"] = {}
+    The file contains the compiled release after the last release (``release``), and for each release, a JSON Merge
+    Patch (``diffs``) that reverts it to the previous compiled release, from which OCDS Show displays the changes. Each
+    object in a release has an ``__extra`` member, like :func:`iterencode`. See :func:`read_step`.
+    """
+    releases = record.get("releases") if isinstance(record, dict) else None
+    if not isinstance(releases, list):
+        releases = []
+    releases = sorted((release for release in releases if isinstance(release, dict)), key=_date)
 
-    for key, value in list(obj.items()):
+    compiled = {}
+    # merge() doesn't reuse the values in a patch, so the patches aren't modified by later merges.
+    diffs = [merge(compiled, release) for release in json.loads("".join(_iterencode_array(releases, fields)))]
+    steps = {
+        "ocid": record.get("ocid"),
+        "releases": [{key: value[key] for key in ("id", "date", "tag") if key in value} for value in releases],
+        "release": compiled,
+        "diffs": diffs,
+    }
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file and rename it, so that other processes never read a partial file.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    _write_chunks(tmp, _encoder.iterencode(steps))
+    os.replace(tmp, path)
+
+
+def read_step(path, number):
+    """
+    Return the nth step (from 0) of the steps written by :func:`write_steps`, or ``None`` if there is no nth step.
+
+    The step has the compiled release up to and including the nth release (``release``), and the JSON Merge Patch
+    (``diff``) that reverts it to the previous compiled release. The compiled release is rebuilt by reverting the later
+    releases, without compiling the releases again.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        steps = json.load(f)
+
+    diffs = steps.pop("diffs")
+    if number >= len(diffs):
+        return None
+
+    compiled = steps["release"]
+    for diff in reversed(diffs[number + 1 :]):
+        compiled = apply_patch(compiled, diff)
+    return {**steps, "releaseNumber": number, "release": compiled, "diff": diffs[number]}
+
+
+def _write_chunks(path, chunks):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def _iterencode_package_array(items, key, fields):
+    annotate = True
+
+    yield "["
+    for i, item in enumerate(items):
+        if i:
+            yield ", "
+        # Releases or records after one that isn't an object aren't annotated.
+        if not isinstance(item, dict):
+            annotate = False
+
+        if not annotate:
+            yield _encoder.encode(item)
+        elif key == "releases":
+            yield from _iterencode_object(item, fields)
+        else:
+            yield from _iterencode_record(item, fields)
+    yield "]"
+
+
+def _iterencode_record(record, fields):
+    yield "{"
+    for i, (name, value) in enumerate(record.items()):
+        if i:
+            yield ", "
+        yield f"{_encoder.encode(name)}: "
+        if name == "releases" and isinstance(value, list):
+            yield from _iterencode_array(value, fields)
+        else:
+            yield _encoder.encode(value)
+    yield "}"
+
+
+def _iterencode_array(items, fields):
+    yield "["
+    for i, item in enumerate(items):
+        if i:
+            yield ", "
+        if isinstance(item, dict):
+            yield from _iterencode_object(item, fields)
+        else:
+            yield _encoder.encode(item)
+    yield "]"
+
+
+def _iterencode_object(obj, fields):
+    extra = {}
+    separator = ""
+
+    yield "{"
+    for key, value in obj.items():
         if key == "__extra":
             continue
 
-        new_path = f"{current_path}/{key}"
-        if new_path not in all_schema_fields:
-            obj["__extra"][key] = value
-            continue
+        yield f"{separator}{_encoder.encode(key)}: "
+        separator = ", "
 
-        if isinstance(value, list):
-            for item in value:
-                add_extra_fields_to_obj(item, all_schema_fields, new_path)
+        subfields = fields.get(key)
+        if subfields is None:
+            extra[key] = value
+            yield _encoder.encode(value)
+        elif isinstance(value, list):
+            yield from _iterencode_array(value, subfields)
         elif isinstance(value, dict):
-            add_extra_fields_to_obj(value, all_schema_fields, new_path)
+            yield from _iterencode_object(value, subfields)
+        else:
+            yield _encoder.encode(value)
 
-    if not obj["__extra"]:
-        obj.pop("__extra")
+    if extra:
+        yield f'{separator}"__extra": {_encoder.encode(extra)}'
+    yield "}"
@@ -0,0 +1,68 @@
+"""
+Run blocking work outside the event loop, for the async views that are used if ``ASYNC_VIEWS`` is set.
+
+If ``ANALYSIS_PROCESSES`` is set, CPU-bound work (parsing, checking and converting data) runs in a pool of that many
+processes, so that it uses all cores, and the server process stays free to handle other requests. Otherwise, and for
+other blocking work (reading files, querying the database and downloading data), it runs in threads.
+
+Worker processes are started with the "spawn" method, like in :mod:`cove_ocds.lib.sharding`, and set up Django once.
+Functions that run in the pool, and their arguments and results, must be picklable.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+
+
+def _initialize():
+    django.setup()
+
+
+def _call(function, *args, **kwargs):
+    # Like Django's request_started and request_finished signals, so that database connections don't outlive the work.
+    close_old_connections()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def executor():
+    """Return the pool of ``ANALYSIS_PROCESSES`` processes, starting it on first use."""
+    global _executor  # noqa: PLW0603
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.ANALYSIS_PROCESSES, mp_context=get_context("spawn"), initializer=_initialize
+        )
+    return _executor
+
+
+async def thread(function, *args, **kwargs):
+    """Run a blocking function in a thread, and return its result."""
+    return await sync_to_async(_call, thread_sensitive=False)(function, *args, **kwargs)
+
+
+async def process(function, *args, **kwargs):
+    """Run a CPU-bound function in the pool of processes, or in a thread if ``ANALYSIS_PROCESSES`` is 0."""
+    if not settings.ANALYSIS_PROCESSES:
+        return await thread(function, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), functools.partial(_call, function, *args, **kwargs))
+
+
+def threaded(view):
+    """Return an async view that runs a sync view in a thread."""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await thread(view, request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,406 @@
+"""Share SchemaOCDS instances across requests, so that schemas are loaded and dereferenced once per process."""
+
+import contextlib
+import copy
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from urllib.parse import urljoin
+
+import libcoveocds.schema
+from django.conf import settings
+
+from cove_ocds.lib import bundle, http_cache, metrics, streaming
+
+logger = logging.getLogger(__name__)
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+def _uncached(name):
+    """Return a method of lib-cove-ocds' SchemaOCDS, without its lru_cache."""
+    return getattr(libcoveocds.schema.SchemaOCDS, name).__wrapped__
+
+
+def _memoized(method):
+    """
+    Like ``functools.lru_cache``, but store the results on the instance.
+
+    lru_cache holds a reference to each instance with a cached result, so instances that :class:`SchemaCache` evicts
+    aren't garbage collected, whereas results stored on the instance are discarded with the instance.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self.__dict__.setdefault("_memoized", {})
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = method(self, *args, **kwargs)
+        return cache[key]
+
+    return wrapper
+
+
+class SchemaOCDS(libcoveocds.schema.SchemaOCDS):
+    """
+    Like lib-cove-ocds' SchemaOCDS, but read the standard's files and extensions' files from local caches, if set.
+
+    The standard's files are read from the bundle, if ``SCHEMA_BUNDLE_DIR`` is set. Extensions' files are cached in a
+    database, if ``EXTENSION_CACHE_PATH`` is set, and are requested concurrently.
+
+    See :mod:`cove_ocds.lib.bundle` and :mod:`cove_ocds.lib.http_cache`. ``schema_url``, which Flatten Tool reads, is
+    the path to the file in the bundle. ``pkg_schema_url``, which the results page links to, is unchanged.
+    """
+
+    def __init__(self, *args, **kwargs):
+        http_cache.configure()
+        super().__init__(*args, **kwargs)
+        if settings.SCHEMA_BUNDLE_DIR:
+            self.builder.standard_base_url = bundle.standard_zip_url(settings.SCHEMA_BUNDLE_DIR, self._tag)
+            self.schema_url = bundle.local_path(self.schema_url)
+
+    @property
+    def _tag(self):
+        return self.version_choices[self.version][2]
+
+    @_memoized
+    def _prefetch_extensions(self):
+        http_cache.prefetch(self.builder_extensions, settings.EXTENSION_FETCH_THREADS)
+
+    # Override, to memoize on the instance, instead of with lru_cache.
+    @_memoized
+    def get_schema_obj(self, *, deref=False, proxies=False):
+        self._prefetch_extensions()
+        return _uncached("get_schema_obj")(self, deref=deref, proxies=proxies)
+
+    process_codelists = _memoized(_uncached("process_codelists"))
+    validator = _memoized(_uncached("validator"))
+    get_pkg_schema_obj = _memoized(_uncached("get_pkg_schema_obj"))
+    get_pkg_schema_fields = _memoized(_uncached("get_pkg_schema_fields"))
+
+    def _jsonref_kwarg(self, *, proxies=False):
+        kwargs = super()._jsonref_kwarg(proxies=proxies)
+        if settings.SCHEMA_BUNDLE_DIR:
+            # The package schemas $ref the release schema and the versioned release schema by URL.
+            kwargs["loader"] = bundle.load
+        return kwargs
+
+
+class RequestSchema:
+    """
+    Wrap a shared SchemaOCDS instance, to hold the attributes that are specific to a request.
+
+    Attributes that are set on this object (like ``extended_schema_file`` by ``create_extended_schema_file()``, and
+    ``json_deref_error`` by ``common_checks_ocds()``) don't leak into other requests. Other attributes and methods
+    are read from the shared instance, whose memoized methods are computed once.
+    """
+
+    def __init__(self, schema, config):
+        self.shared = schema
+        # common_checks_ocds() reads options like "skip_aggregates" from the configuration. It is copied, so that
+        # changing these options doesn't change the shared instance's or another request's configuration.
+        self.config = copy.deepcopy(config)
+        self.extended_schema_file = None
+        self.extended_schema_url = None
+
+    def __getattr__(self, name):
+        return getattr(self.shared, name)
+
+    def create_extended_schema_file(self, upload_dir, upload_url):
+        """
+        Like SchemaOCDS.create_extended_schema_file(), but link to the extended schema in the shared store.
+
+        If the file system doesn't support hard links, the extended schema is copied.
+        """
+        basename = "extended_schema.json"
+        path = os.path.join(upload_dir, basename)
+
+        # Always replace any existing extended schema file
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        self.extended_schema_file = None
+        self.extended_schema_url = None
+
+        self.get_schema_obj()
+        if not self.extended:
+            return
+
+        try:
+            _link(store_extended_schema(self.shared), path)
+        except FileNotFoundError:
+            # The expire_extended_schemas command deleted the stored file after it was used. Store it again.
+            _link(store_extended_schema(self.shared), path)
+        self.extended_schema_file = path
+        self.extended_schema_url = urljoin(upload_url, basename)
+
+
+def _link(stored, path):
+    try:
+        os.link(stored, path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(stored, path)
+
+
+# The configuration options that SchemaOCDS reads.
+SCHEMA_OPTIONS = (
+    "context",
+    "current_language",
+    "schema_codelists",
+    "schema_version",
+    "schema_version_choices",
+    "standard_zip",
+)
+
+
+class SchemaCache:
+    """A thread-safe, least recently used cache of SchemaOCDS instances."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(schema):
+        """
+        Return the cache key of a SchemaOCDS instance.
+
+        The package schema URL differs by version, package type and (if the version choices contain ``{lang}``)
+        language. The key contains every configuration option that SchemaOCDS reads.
+        """
+        options = {name: schema.config.config[name] for name in SCHEMA_OPTIONS}
+        return (
+            schema.version,
+            tuple(schema.extensions),
+            schema.package_schema_name,
+            schema.pkg_schema_url,
+            json.dumps(options, sort_keys=True),
+        )
+
+    @staticmethod
+    def _reusable(schema):
+        # Don't reuse a schema whose extensions, references or codelists failed to load, as the failure might be
+        # temporary. process_codelists() sets core_codelists to an empty dict on HTTP error.
+        return not (
+            schema.invalid_extension or schema.json_deref_error or getattr(schema, "core_codelists", True) == {}
+        )
+
+    def __contains__(self, schema):
+        """Return whether a reusable instance equivalent to ``schema`` is cached, without counting a hit or miss."""
+        with self._lock:
+            cached = self._cache.get(self.key(schema))
+            return cached is not None and self._reusable(cached)
+
+    def get(self, schema, prefetched=None):
+        """
+        Return a cached instance equivalent to ``schema``, wrapped in a :class:`RequestSchema`.
+
+        On a miss, ``schema`` is itself cached, or ``prefetched``, if it is equivalent to ``schema`` (see
+        :func:`prefetch`). Check ``schema``'s version and package errors before calling this method, as these depend
+        on the data, not on the cache key.
+        """
+        key = self.key(schema)
+        if prefetched is not None and self.key(prefetched) == key:
+            schema = prefetched
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and self._reusable(cached):
+                self.hits += 1
+                result = "hit"
+                self._cache.move_to_end(key)
+            else:
+                self.misses += 1
+                result = "miss"
+                cached = self._cache[key] = schema
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+
+        metrics.increment("cove_ocds_cache_requests_total", cache="schema", result=result)
+        return RequestSchema(cached, schema.config)
+
+    def cache_info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._cache))
+
+    def cache_clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+schema_cache = SchemaCache(settings.SCHEMA_CACHE_SIZE)
+_prefetch_executor = ThreadPoolExecutor(max_workers=max(settings.SCHEMA_PREFETCH_THREADS, 1))
+
+
+def _prefetch(path, select_version, config):
+    try:
+        header = streaming.read_header(path)
+        schema = SchemaOCDS(
+            select_version=select_version,
+            package_data=header,
+            lib_cove_ocds_config=config,
+            record_pkg="records" in header,
+        )
+        # There's nothing to prefetch if the version or the package is invalid, if the releases or records aren't in
+        # the header, or if an equivalent instance is cached.
+        if (
+            schema.missing_package
+            or schema.invalid_version_argument
+            or schema.invalid_version_data
+            or schema in schema_cache
+        ):
+            return None
+        # Retrieve the extensions and codelists.
+        schema.get_schema_obj()
+        schema.process_codelists()
+    except Exception:
+        logger.exception("Couldn't prefetch the schema of %s", path)
+        return None
+    return schema
+
+
+def prefetch(path, select_version, config):
+    """
+    Start building a SchemaOCDS instance for a JSON file, in a thread, from the leading bytes of the file.
+
+    The ``version`` and ``extensions`` of a package are usually before its releases or records, so the extensions can
+    be retrieved while the file is parsed. Pass the result of :func:`prefetched` to :meth:`SchemaCache.get`.
+
+    Return a future, or ``None`` if ``SCHEMA_PREFETCH_THREADS`` is 0.
+    """
+    if not settings.SCHEMA_PREFETCH_THREADS:
+        return None
+    return _prefetch_executor.submit(_prefetch, path, select_version, config)
+
+
+def prefetched(future):
+    """
+    Return the SchemaOCDS instance built by :func:`prefetch`, or ``None``.
+
+    Wait if the instance is being built. If it isn't yet being built (all threads are busy), cancel it.
+    """
+    if future is None or future.cancel():
+        return None
+    return future.result()
+
+
+def build_fields_index(schema_dict, index=None):
+    """
+    Return a tree of the fields of a dereferenced schema, in which each field maps to a dict of its subfields.
+
+    A path is in the tree if and only if lib-cove's ``schema_dict_fields_generator()`` yields it. Arrays don't add a
+    level, so the tree can be walked in lockstep with data, without building the paths.
+    """
+    if index is None:
+        index = {}
+
+    if "properties" in schema_dict and isinstance(schema_dict["properties"], dict):
+        for property_name, value in schema_dict["properties"].items():
+            subindex = index.setdefault(property_name, {})
+            property_schema_dicts = value.get("oneOf", [value])
+            for property_schema_dict in property_schema_dicts:
+                if not isinstance(property_schema_dict, dict):
+                    continue
+                if "properties" in property_schema_dict:
+                    build_fields_index(property_schema_dict, subindex)
+                elif "items" in property_schema_dict:
+                    build_fields_index(property_schema_dict["items"], subindex)
+
+    if (
+        "items" in schema_dict
+        and isinstance(schema_dict["items"], dict)
+        and "oneOf" in schema_dict["items"]
+        and isinstance(schema_dict["items"]["oneOf"], list)
+    ):
+        for one_of in schema_dict["items"]["oneOf"]:
+            build_fields_index(one_of, index)
+
+    return index
+
+
+def get_fields_index(schema):
+    """
+    Return the tree of the fields of a SchemaOCDS instance's dereferenced release schema.
+
+    The tree is built once per shared instance. Don't modify it.
+    """
+    schema = getattr(schema, "shared", schema)
+    # The tree is held by the instance, so that it is discarded with the instance.
+    index = getattr(schema, "fields_index", None)
+    if index is None:
+        index = schema.fields_index = build_fields_index(schema.get_schema_obj(deref=True))
+    return index
+
+
+def extended_schemas_dir():
+    """Return the directory of the shared store of extended schemas."""
+    return os.path.join(settings.MEDIA_ROOT, "extended_schemas")
+
+
+def _extended_schema_contents(schema):
+    return json.dumps(schema.get_schema_obj(), ensure_ascii=False, indent=2) + "\n"
+
+
+def _extended_schema_digest(schema, contents):
+    # The contents depend on the base version and on the extensions' contents. The order of extensions matters, as
+    # later extensions can override earlier extensions.
+    tag = schema.version_choices[schema.version][2]
+    digest = hashlib.sha256(json.dumps([tag, list(schema.extensions)]).encode())
+    digest.update(contents.encode())
+    return digest.hexdigest()
+
+
+def store_extended_schema(schema):
+    """
+    Write the extended schema of a SchemaOCDS instance to the shared store, unless already stored, and return its path.
+
+    Extended schemas are stored by a hash of the base version, the extension URLs and the extended schema, so that
+    uploads with the same extensions share a file. The file's modification time is updated on each use, for
+    the ``expire_extended_schemas`` command.
+    """
+    # The digest is held by the instance, so that it is computed once, and is discarded with the instance.
+    contents = None
+    digest = getattr(schema, "extended_schema_digest", None)
+    if digest is None:
+        contents = _extended_schema_contents(schema)
+        digest = schema.extended_schema_digest = _extended_schema_digest(schema, contents)
+
+    directory = extended_schemas_dir()
+    path = os.path.join(directory, f"{digest}.json")
+
+    try:
+        os.utime(path)
+        result = "hit"
+    except FileNotFoundError:
+        result = "miss"
+        if contents is None:
+            contents = _extended_schema_contents(schema)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file and rename it, so that other processes never read a partial file.
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(contents)
+        os.replace(tmp, path)
+
+    metrics.increment("cove_ocds_cache_requests_total", cache="extended_schema", result=result)
+
+    return path
@@ -0,0 +1,184 @@
+"""
+Validate the releases or records of large packages in chunks, in a pool of processes.
+
+The results are written to ``validation_errors-3.json``, in the format of lib-cove's
+``get_schema_validation_errors()``. lib-cove's ``common_checks_context()`` reads this file instead of validating the
+data in a single thread.
+"""
+
+import functools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import jsonschema.validators
+
+# Register libcoveocds' "uniqueItems" and "oneOf" validators on lib-cove's validator, in the worker processes.
+import libcoveocds.common_checks  # noqa: F401
+from django.conf import settings
+from jsonschema.exceptions import _RefResolutionError
+from libcove.lib.common import get_schema_validation_errors
+from libcove.lib.tools import decimal_default
+from referencing import Registry, Resource
+from referencing.exceptions import Unresolvable
+
+from .streaming import PACKAGE_ARRAYS
+
+
+class _ChunkSchema:
+    """
+    The parts of a SchemaOCDS instance that ``get_schema_validation_errors()`` uses, in a form that can be pickled.
+
+    The referenced schemas are copied from the instance's registry, so that worker processes don't retrieve them.
+    """
+
+    def __init__(self, schema):
+        self.pkg_schema = schema.get_pkg_schema_obj()
+        self.resources = [(uri, resource.contents) for uri, resource in schema.registry.items()]
+
+    # Build in the worker process, after unpickling.
+    @functools.cached_property
+    def registry(self):
+        return Registry().with_resources((uri, Resource.from_contents(contents)) for uri, contents in self.resources)
+
+    def get_pkg_schema_obj(self):
+        return self.pkg_schema
+
+    def validator(self, validator, format_checker):
+        return validator(self.pkg_schema, format_checker=format_checker, registry=self.registry)
+
+
+class _UniqueItemsSchema:
+    """Check only the uniqueness of a package's releases or records, which can't be checked chunk by chunk."""
+
+    def __init__(self, pkg_schema, key):
+        self.pkg_schema = {"properties": {key: pkg_schema["properties"][key]}}
+
+    def get_pkg_schema_obj(self):
+        return self.pkg_schema
+
+    def validator(self, validator, format_checker):
+        # jsonschema skips keywords whose validator is None.
+        skip = {keyword: None for keyword in validator.VALIDATORS if keyword not in ("properties", "uniqueItems")}
+        cls = jsonschema.validators.extend(validator, skip)
+        return cls(self.pkg_schema, format_checker=format_checker)
+
+
+_schema = None
+
+
+def _initialize(schema):
+    global _schema  # noqa: PLW0603
+    _schema = schema
+
+
+def _validate(package):
+    try:
+        return get_schema_validation_errors(package, _schema, "-", {}, {})
+    # The parent process falls back to lib-cove, to report the error.
+    except (Unresolvable, _RefResolutionError):
+        return None
+
+
+def _offset_errors(validation_errors, key, offset, *, package=True):
+    """
+    Return the validation errors of a chunk, with paths relative to the package instead of to the chunk.
+
+    :param offset: the index of the chunk's first release or record in the package
+    :param package: whether to keep the errors that aren't about a release or record
+    """
+    prefix = f"{key}/"
+    errors = {}
+
+    for json_key, values in validation_errors.items():
+        for value in values:
+            path = value["path"]
+            if not path.startswith(prefix):
+                if package and path != key:
+                    errors.setdefault(json_key, []).append(value)
+                continue
+
+            index, _, rest = path[len(prefix) :].partition("/")
+            number = int(index) + offset
+            item = {**value, "path": f"{prefix}{number}/{rest}" if rest else f"{prefix}{number}"}
+
+            # An error about a release or record (like "Array element '1' is not a JSON object") uses its index as
+            # the header and in the message.
+            error_key = json_key
+            if not rest and offset:
+                error = json.loads(json_key)
+                if error["header"] == int(index):
+                    error["header"] = number
+                    pre_header = f"Array element '{index}'"
+                    if error["message"].startswith(pre_header):
+                        error["message"] = f"Array element '{number}'{error['message'][len(pre_header) :]}"
+                    error_key = json.dumps(error, default=decimal_default)
+
+            errors.setdefault(error_key, []).append(item)
+
+    return errors
+
+
+def get_validation_errors(json_data, schema_obj, processes, chunk_size):
+    """
+    Return the validation errors of a package, like ``get_schema_validation_errors()``.
+
+    The releases or records are validated in chunks, in a pool of processes. Return ``None`` if the schema's
+    references can't be resolved.
+    """
+    key = next(key for key in PACKAGE_ARRAYS if key in json_data)
+    items = json_data[key]
+    metadata = {k: v for k, v in json_data.items() if k != key}
+
+    # The first chunk is validated with the package metadata. Errors at the path of the releases or records (like
+    # non-unique IDs) are dropped from all chunks, and checked across all chunks, below.
+    packages = [{**metadata, key: items[:chunk_size]}]
+    packages.extend({key: items[start : start + chunk_size]} for start in range(chunk_size, len(items), chunk_size))
+
+    with ProcessPoolExecutor(
+        max_workers=min(processes, len(packages)),
+        mp_context=get_context("spawn"),
+        initializer=_initialize,
+        initargs=(_ChunkSchema(schema_obj),),
+    ) as executor:
+        futures = [executor.submit(_validate, package) for package in packages]
+
+        validation_errors = get_schema_validation_errors(
+            {key: items}, _UniqueItemsSchema(schema_obj.get_pkg_schema_obj(), key), "-", {}, {}
+        )
+
+        for number, future in enumerate(futures):
+            chunk_errors = future.result()
+            if chunk_errors is None:
+                return None
+            offset = number * chunk_size
+            for json_key, values in _offset_errors(chunk_errors, key, offset, package=not number).items():
+                validation_errors.setdefault(json_key, []).extend(values)
+
+    return validation_errors
+
+
+def write_validation_errors(upload_dir, json_data, schema_obj):
+    """
+    Validate the package in chunks and write ``validation_errors-3.json``, and return whether the file was written.
+
+    The file is written only if the ``VALIDATION_PROCESSES`` setting is greater than 1, and if the package has more
+    releases or records than the ``VALIDATION_CHUNK_SIZE`` setting.
+    """
+    processes = settings.VALIDATION_PROCESSES
+    chunk_size = settings.VALIDATION_CHUNK_SIZE
+
+    items = next((json_data[key] for key in PACKAGE_ARRAYS if key in json_data), None)
+    if processes <= 1 or not isinstance(items, list) or len(items) <= chunk_size:
+        return False
+
+    validation_errors = get_validation_errors(json_data, schema_obj, processes, chunk_size)
+    if validation_errors is None:
+        return False
+
+    # Use the same format as lib-cove's common_checks_context().
+    with open(os.path.join(upload_dir, "validation_errors-3.json"), "w+") as f:
+        json.dump(validation_errors, f, sort_keys=True, indent=2, default=decimal_default)
+
+    return True
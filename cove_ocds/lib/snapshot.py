@@ -0,0 +1,189 @@
+"""
+Store the results of checking an upload, so that later page views don't repeat the checks.
+
+The fingerprint identifies the inputs to the checks: the file's contents, the schema version, the extensions, and the
+versions of the libraries and of this module's format. The results, and the files that the checks write to the upload
+directory (like ``validation_errors-3.json`` and converted files), are valid only for the fingerprint that is stored
+in ``fingerprint.json``.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+from importlib import metadata
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Increment if the structure of the context or the results of analyze() change.
+FORMAT = 5
+LIBRARIES = ("libcove", "libcoveocds", "flattentool", "ocdsextensionregistry")
+# The properties of the package that templates use.
+PACKAGE_METADATA = ("publisher", "license", "publicationPolicy")
+# The keys of the context whose values don't depend on the schema version, the extensions or the language.
+VERSION_INDEPENDENT = ("releases_aggregates", "records_aggregates", "additional_checks")
+# The files that the checks write to the upload directory, and that lib-cove reuses if they exist.
+CHECKED_FILES = ("validation_errors-3.json",)
+
+
+def _read(path):
+    with contextlib.suppress(FileNotFoundError, ValueError), open(path, encoding="utf-8") as f:
+        return json.load(f)
+    return None
+
+
+def _write(path, data):
+    # Write to a temporary file and rename it, so that concurrent requests never read a partial file.
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _libraries():
+    return {library: metadata.version(library) for library in LIBRARIES}
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return [path, stat.st_size, stat.st_mtime_ns]
+
+
+def file_digest(db_data):
+    """
+    Return the SHA-256 digest of the supplied data's file.
+
+    The digest is calculated once, and then re-calculated only if the file's path, size or modification time changes.
+    """
+    path = db_data.original_file.path
+    stat = _file_stat(path)
+
+    stored = _read(os.path.join(db_data.upload_dir(), "fingerprint.json"))
+    if stored and stored["stat"] == stat:
+        return stored["fingerprint"]["file"]
+
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def fingerprint(db_data, schema_ocds):
+    """Return the fingerprint of the inputs to checking the supplied data against the given schema."""
+    return {
+        "format": FORMAT,
+        "file": file_digest(db_data),
+        "version": schema_ocds.version,
+        "extensions": list(schema_ocds.extensions),
+        "libraries": _libraries(),
+    }
+
+
+def independent_fingerprint(value):
+    """Return the parts of a fingerprint that identify the JSON data, independent of the schema version."""
+    return {key: value[key] for key in ("format", "file", "libraries")}
+
+
+def save_version_independent(upload_dir, value, context):
+    """
+    Store the results of the checks that don't depend on the schema version.
+
+    :param value: the fingerprint of the checks' inputs
+    :param context: the context returned by ``analyze()``
+    """
+    _write(
+        os.path.join(upload_dir, "version_independent.json"),
+        {
+            "fingerprint": independent_fingerprint(value),
+            "context": {key: context[key] for key in VERSION_INDEPENDENT if key in context},
+        },
+    )
+
+
+def load_version_independent(upload_dir, value):
+    """
+    Return the stored results of the checks that don't depend on the schema version.
+
+    Return ``None`` if no results are stored, or if the stored results don't match the given fingerprint.
+    """
+    stored = _read(os.path.join(upload_dir, "version_independent.json"))
+    if not stored or stored["fingerprint"] != independent_fingerprint(value):
+        return None
+    return stored["context"]
+
+
+def read_fingerprint(upload_dir):
+    """Return the fingerprint for which the files in the upload directory were written, if any."""
+    stored = _read(os.path.join(upload_dir, "fingerprint.json"))
+    if stored:
+        return stored["fingerprint"]
+    return None
+
+
+def write_fingerprint(db_data, value):
+    _write(
+        os.path.join(db_data.upload_dir(), "fingerprint.json"),
+        {"fingerprint": value, "stat": _file_stat(db_data.original_file.path)},
+    )
+
+
+def remove_stale_files(upload_dir, value):
+    """
+    Remove the files that the checks wrote, if they were written for a fingerprint other than the given fingerprint.
+
+    :param value: the fingerprint of the checks' inputs
+    """
+    if read_fingerprint(upload_dir) == value:
+        return
+    for name in CHECKED_FILES:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(upload_dir, name))
+
+
+def _path(upload_dir, language):
+    return os.path.join(upload_dir, f"snapshot-{language}.json")
+
+
+def save(upload_dir, language, value, context, keys):
+    """
+    Store the results of the checks.
+
+    :param value: the fingerprint of the checks' inputs
+    :param context: the context returned by ``analyze()``
+    :param keys: the keys of the context to store
+    """
+    data = {key: context[key] for key in keys}
+
+    # Templates use only the package metadata.
+    if "json_data" in data:
+        data["json_data"] = {key: data["json_data"][key] for key in PACKAGE_METADATA if key in data["json_data"]}
+
+    _write(
+        _path(upload_dir, language),
+        {"fingerprint": value, "table_length": settings.RELEASES_OR_RECORDS_TABLE_LENGTH, "context": data},
+    )
+
+
+def load(db_data, version, language):
+    """
+    Return the stored results of checking the supplied data against the given version in the given language.
+
+    Return ``None`` if no results are stored, or if the stored results don't match the current fingerprint.
+    """
+    upload_dir = db_data.upload_dir()
+
+    stored = _read(_path(upload_dir, language))
+    if not stored:
+        return None
+
+    value = stored["fingerprint"]
+    if (
+        value != read_fingerprint(upload_dir)
+        or value["format"] != FORMAT
+        or value["version"] != version
+        or value["libraries"] != _libraries()
+        or value["file"] != file_digest(db_data)
+        or stored["table_length"] != settings.RELEASES_OR_RECORDS_TABLE_LENGTH
+    ):
+        return None
+
+    return stored["context"]
@@ -0,0 +1,356 @@
+"""
+Read JSON files incrementally, so that large uploads aren't read into memory as a string before parsing.
+
+:func:`load` still builds the whole document, as lib-cove-ocds' checks and the templates need the whole package: the
+peak memory is that of the parsed data, without the string from which :func:`json.load` parses it. ijson's pure Python
+backends are many times slower than :func:`json.load`, so the file is parsed incrementally only if ijson's C backend
+is installed.
+"""
+
+import codecs
+import contextlib
+import json
+import re
+from array import array
+
+import ijson
+
+# The top-level properties of release packages and record packages that contain the releases and records.
+PACKAGE_ARRAYS = ("releases", "records")
+
+CHUNK_SIZE = 65536
+# Whether load() parses incrementally. Only ijson's C backend is about as fast as json.load().
+INCREMENTAL = ijson.backend == "yajl2_c"
+# The number of bytes that read_header() reads, at most.
+HEADER_SIZE = 1048576
+# The top-level properties that read_header() returns.
+HEADER_PROPERTIES = ("version", "extensions")
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# The first characters of JSON values other than objects.
+_NON_OBJECT = frozenset('["-0123456789tfnNI')
+
+
+class StructureError(ValueError):
+    """
+    Raised by :func:`check` if a JSON file can't be checked.
+
+    ``kind`` is "encoding" (the file isn't UTF-8), "syntax" (the file isn't well-formed JSON), "top_level" (the
+    top-level value isn't an object) or "package" (the object has no releases or records). ``offset`` is the byte
+    offset of the error.
+    """
+
+    def __init__(self, kind, message, offset):
+        super().__init__(f"{message} (byte {offset})")
+        self.kind = kind
+        self.offset = offset
+
+
+def _parse(path, coro, *args, limit=None, **kwargs):
+    """
+    Yield the results of an ijson coroutine, reading the file in chunks.
+
+    If ``limit`` is set, stop after the chunk that reaches that number of bytes.
+
+    Raises :exc:`UnicodeDecodeError` if the file isn't UTF-8, like ``open(path, encoding="utf-8")``. (ijson's backends
+    don't report encoding errors consistently.)
+    """
+    results = ijson.sendable_list()
+    target = coro(results, *args, **kwargs)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                decoder.decode(chunk)
+                target.send(chunk)
+                yield from results
+                del results[:]
+                if limit is not None and f.tell() >= limit:
+                    return
+        decoder.decode(b"", final=True)
+        target.close()
+        yield from results
+    finally:
+        # The python backend raises an error if it is closed before the end of the input, which would otherwise be
+        # reported as an unraisable exception when the coroutine is garbage collected.
+        with contextlib.suppress(ijson.JSONError):
+            target.close()
+
+
+def load(path):
+    """
+    Return the parsed contents of a JSON file, like :func:`json.load`.
+
+    Raises :exc:`UnicodeDecodeError` if the file isn't UTF-8, and :exc:`ValueError` if the file isn't well-formed JSON.
+    """
+    if not INCREMENTAL:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    try:
+        # Parse to the end, so that data after the top-level value is reported as an error.
+        for item in _parse(path, ijson.items_coro, "", use_float=True):
+            data = item
+    except ijson.JSONError as e:
+        raise ValueError(str(e)) from None
+    return data
+
+
+def read_header(path):
+    """
+    Return the ``version`` and ``extensions`` of a package, if they precede its releases or records.
+
+    Only the leading bytes of the file are read, until the releases or records. If found, the returned dict has the
+    property of the releases or records, set to an empty list, so that the package type is known. If the leading bytes
+    are malformed, the returned dict is incomplete.
+    """
+    header = {}
+    builder = None
+    key = None
+    depth = 0
+
+    with contextlib.suppress(ijson.JSONError, UnicodeDecodeError):
+        for event, value in _parse(path, ijson.basic_parse_coro, limit=HEADER_SIZE, use_float=True):
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+
+            if builder is not None:
+                builder.event(event, value)
+                # The value of the top-level property is complete.
+                if depth == 1:
+                    header[key] = builder.value
+                    builder = None
+            elif depth == 1 and event == "map_key":
+                key = value
+                if key in PACKAGE_ARRAYS:
+                    header[key] = []
+                    break
+                if key in HEADER_PROPERTIES:
+                    builder = ijson.ObjectBuilder()
+            # The top-level value is complete.
+            elif depth == 0:
+                break
+
+    return header
+
+
+def find_spans(path, key):
+    """
+    Return the byte offsets of the start and end of each release or record in a package, as two arrays.
+
+    Like :func:`json.load`, if the package has the same property more than once, the last is used. If the property
+    isn't an array, or if the top-level value isn't an object, the arrays are empty. The file must be well-formed JSON.
+
+    Like :func:`check`, the file is read in chunks, and each value is skipped by the C scanner of the :mod:`json`
+    module, so that only one release or record is in memory at once.
+
+    :param key: "releases" or "records"
+    """
+    starts = array("q")
+    ends = array("q")
+
+    with open(path, "rb") as f:
+        reader = _Reader(f)
+        index = reader.whitespace(0)
+        if reader.text[index : index + 1] != "{":
+            return starts, ends
+        index = reader.whitespace(index + 1)
+
+        while reader.text[index : index + 1] == '"':
+            name, index = reader.decode(index)
+            # Skip the colon.
+            index = reader.whitespace(reader.whitespace(index) + 1)
+
+            if name == key:
+                starts = array("q")
+                ends = array("q")
+            if name != key or reader.text[index] != "[":
+                index = reader.value(index)
+            else:
+                index = reader.whitespace(index + 1)
+                while reader.text[index] != "]":
+                    starts.append(reader.byte_offset(index))
+                    index = reader.decode(index)[1]
+                    ends.append(reader.byte_offset(index))
+                    index = reader.whitespace(reader.discard(index))
+                    if reader.text[index] == ",":
+                        index = reader.whitespace(index + 1)
+                index += 1
+
+            index = reader.whitespace(reader.discard(index))
+            if reader.text[index : index + 1] == ",":
+                index = reader.whitespace(index + 1)
+
+    return starts, ends
+
+
+def _whitespace(text, index):
+    return _WHITESPACE.match(text, index).end()
+
+
+def read_spans(path, spans):
+    """
+    Return the parsed values at the given byte offsets in a JSON file.
+
+    :param spans: pairs of the byte offsets of the start and end of each value
+    """
+    values = []
+    with open(path, "rb") as f:
+        for start, end in spans:
+            f.seek(start)
+            values.append(json.loads(f.read(end - start)))
+    return values
+
+
+class _Reader:
+    """Decode a UTF-8 file incrementally, keeping the text from the start of the value being scanned."""
+
+    def __init__(self, f):
+        self.f = f
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        # The byte offset of the start of the text.
+        self.offset = 0
+        # An index in the text and its byte offset, from which byte_offset() counts, so that calls with increasing
+        # indices take linear time.
+        self.index = 0
+        self.index_offset = 0
+        # The number of bytes read.
+        self.read = 0
+        self.eof = False
+
+    def fill(self):
+        """Read more of the file. Read at least as much as the text, so that rescanning a value takes linear time."""
+        chunk = self.f.read(max(CHUNK_SIZE, len(self.text)))
+        pending = len(self.decoder.getstate()[0])
+        try:
+            self.text += self.decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as e:
+            offset = self.read - pending + e.start
+            message = f"'utf-8' codec can't decode byte 0x{e.object[e.start]:02x}: {e.reason}"
+            raise StructureError("encoding", message, offset) from None
+        self.read += len(chunk)
+        self.eof = not chunk
+
+    def discard(self, index):
+        """Discard the text before the index, if it is long, and return the index's new value."""
+        if index < CHUNK_SIZE:
+            return index
+        self.offset = self.byte_offset(index)
+        self.text = self.text[index:]
+        self.index = 0
+        self.index_offset = self.offset
+        return 0
+
+    def byte_offset(self, index):
+        if index < self.index:
+            return self.offset + len(self.text[:index].encode())
+        self.index_offset += len(self.text[self.index : index].encode())
+        self.index = index
+        return self.index_offset
+
+    def error(self, kind, message, index):
+        return StructureError(kind, message, self.byte_offset(index))
+
+    def whitespace(self, index):
+        """Return the index of the next non-whitespace character, or of the end of the file."""
+        while True:
+            index = _whitespace(self.text, index)
+            if index < len(self.text) or self.eof:
+                return index
+            self.fill()
+
+    def decode(self, index):
+        """Return the value at the index and the index of its end, reading more of the file as needed."""
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, index)
+            except json.JSONDecodeError as e:
+                # The error is in the text, rather than due to the end of the text. (A truncated literal or escape
+                # sequence is reported at its start.)
+                if self.eof or (e.pos < len(self.text) - 8 and not e.msg.startswith("Unterminated string")):
+                    raise self.error("syntax", e.msg, e.pos) from None
+            else:
+                # A number might continue after the end of the text.
+                if end < len(self.text) or self.eof:
+                    return value, end
+            self.fill()
+
+    def value(self, index):
+        """Return the index of the end of the value at the index. Scan an array one item at a time."""
+        if self.text[index : index + 1] != "[":
+            return self.decode(index)[1]
+
+        index = self.whitespace(index + 1)
+        if self.text[index : index + 1] == "]":
+            return index + 1
+        while True:
+            index = self.discard(self.decode(index)[1])
+            index = self.whitespace(index)
+            character = self.text[index : index + 1]
+            if character == "]":
+                return index + 1
+            if character != ",":
+                raise self.error("syntax", "Expecting ',' delimiter", index)
+            index = self.whitespace(index + 1)
+
+
+def check(path):
+    """
+    Check that a file is UTF-8, is well-formed JSON, and is an object with releases or records.
+
+    The file is read in chunks, and each value is scanned by the C scanner of the :mod:`json` module, like
+    :func:`find_spans`. Arrays in the top-level object are scanned one item at a time, so that only one release or
+    record is in memory at once. The errors are found in the order that :func:`json.load` finds them, and the
+    non-object and missing package errors are found after the file is checked to be well-formed.
+
+    Raises :exc:`StructureError` if the file can't be checked.
+    """
+    with open(path, "rb") as f:
+        reader = _Reader(f)
+        index = reader.whitespace(0)
+        if reader.text.startswith("\ufeff"):
+            raise reader.error("syntax", "Unexpected UTF-8 BOM (decode using utf-8-sig)", 0)
+
+        start = reader.byte_offset(index)
+        character = reader.text[index : index + 1]
+        keys = set()
+        if character in _NON_OBJECT:
+            index = reader.value(index)
+        elif character != "{":
+            raise reader.error("syntax", "Expecting value", index)
+        else:
+            index = reader.whitespace(index + 1)
+            if reader.text[index : index + 1] != "}":
+                while True:
+                    if reader.text[index : index + 1] != '"':
+                        raise reader.error("syntax", "Expecting property name enclosed in double quotes", index)
+                    key, index = reader.decode(index)
+                    keys.add(key)
+                    index = reader.whitespace(index)
+                    if reader.text[index : index + 1] != ":":
+                        raise reader.error("syntax", "Expecting ':' delimiter", index)
+                    index = reader.discard(reader.value(reader.whitespace(index + 1)))
+                    index = reader.whitespace(index)
+                    if reader.text[index : index + 1] == "}":
+                        break
+                    if reader.text[index : index + 1] != ",":
+                        raise reader.error("syntax", "Expecting ',' delimiter", index)
+                    index = reader.whitespace(index + 1)
+            end = reader.byte_offset(index)
+            index += 1
+
+        index = reader.whitespace(index)
+        if index < len(reader.text):
+            raise reader.error("syntax", "Extra data", index)
+
+    if character != "{":
+        message = "The top-level value isn't an object"
+        raise StructureError("top_level", message, start)
+    if not keys.intersection(PACKAGE_ARRAYS):
+        message = "The top-level object has no releases or records"
+        raise StructureError("package", message, end)
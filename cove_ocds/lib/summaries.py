@@ -0,0 +1,264 @@
+"""
+Store a summary of each release or record in an upload, so that the results page can show its table page by page.
+
+The summaries are extracted once, when the data is checked, and stored in ``summaries.sqlite3`` in the upload
+directory, with the fingerprint of the data from which they were extracted.
+
+If the upload is a JSON file, the byte offsets of each release or record in the file are stored, too, so that a
+release or record can be read without parsing the whole file.
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from . import streaming
+
+# Increment if the structure of the database or of the summaries changes.
+FORMAT = 3
+FILENAME = "summaries.sqlite3"
+
+# The fields of a release that the releases table uses. Each field maps to its subfields, or to None for all.
+RELEASE_FIELDS = {
+    "ocid": None,
+    "id": None,
+    "date": None,
+    "tag": None,
+    "tender": {
+        "title": None,
+        "description": None,
+        "items": {"description": None},
+        "procuringEntity": {"name": None, "identifier": {"id": None}},
+    },
+    "awards": {"title": None, "description": None},
+    "contracts": {"title": None, "description": None},
+    "buyer": {"name": None, "identifier": {"id": None}},
+}
+
+# The columns by which summaries can be sorted, by package type.
+SORT_COLUMNS = {
+    "releases": ("ocid", "id", "date"),
+    "records": ("ocid",),
+}
+
+SURROGATES = range(0xD800, 0xE000)
+
+SCHEMA = """
+CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE summary (
+    position INTEGER PRIMARY KEY, ocid TEXT, id TEXT, date TEXT, row TEXT NOT NULL, start INTEGER, end INTEGER
+);
+"""
+
+INDEXES = """
+CREATE INDEX summary_ocid ON summary (ocid, position);
+CREATE INDEX summary_id ON summary (id, position);
+CREATE INDEX summary_date ON summary (date, position);
+"""
+
+
+def _trim(value, fields):
+    if fields is None:
+        return value
+    if isinstance(value, dict):
+        return {key: _trim(value[key], subfields) for key, subfields in fields.items() if key in value}
+    if isinstance(value, list):
+        return [_trim(item, fields) for item in value]
+    return value
+
+
+def _column(value):
+    return value if isinstance(value, str) else None
+
+
+def release_summary(release):
+    """Return the fields of a release that the releases table uses."""
+    if not isinstance(release, dict):
+        return {}
+    return _trim(release, RELEASE_FIELDS)
+
+
+def record_summary(record):
+    """Return the number of releases in a record, and whether it has a compiled release and a versioned release."""
+    if not isinstance(record, dict):
+        record = {}
+    releases = record.get("releases", "")
+    summary = {
+        "release_count": len(releases) if hasattr(releases, "__len__") else 0,
+        "compiledRelease": bool(record.get("compiledRelease")),
+        "versionedRelease": bool(record.get("versionedRelease")),
+    }
+    if "ocid" in record:
+        summary["ocid"] = record["ocid"]
+    return summary
+
+
+def _rows(items, key, spans):
+    summarize = release_summary if key == "releases" else record_summary
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    for position, item in enumerate(items):
+        summary = summarize(item)
+        yield (
+            position,
+            _column(summary.get("ocid")),
+            _column(summary.get("id")),
+            _column(summary.get("date")),
+            encoder.encode(summary),
+            *((spans[0][position], spans[1][position]) if spans else (None, None)),
+        )
+
+
+def _connect(path):
+    # Open read-only, so that a missing file isn't created.
+    return contextlib.closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True))
+
+
+def read_metadata(upload_dir):
+    """
+    Return the metadata of the stored summaries, or ``None`` if no summaries are stored.
+
+    The metadata are the format, the fingerprint of the data, the package's key, the path to the JSON file (if any)
+    relative to the upload directory, and the URL of the schema with which OCDS Show annotates the data (if any).
+    """
+    path = os.path.join(upload_dir, FILENAME)
+    with contextlib.suppress(sqlite3.Error), _connect(path) as connection:
+        return {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM metadata")}
+    return None
+
+
+def write(upload_dir, json_data, key, value, path=None, schema_url=None):
+    """
+    Extract and store the summaries of the releases or records in a package, unless already stored.
+
+    :param key: "releases" or "records"
+    :param value: the fingerprint of the data
+    :param path: the path to the JSON file from which the data was parsed, if any, to store byte offsets
+    :param schema_url: the URL of the schema with which OCDS Show annotates the data
+    """
+    metadata = {
+        "format": FORMAT,
+        "fingerprint": value,
+        "key": key,
+        "path": path and os.path.relpath(path, upload_dir),
+        "schema_url": schema_url,
+    }
+    if read_metadata(upload_dir) == metadata:
+        return
+
+    spans = None
+    if path is not None:
+        spans = streaming.find_spans(path, key)
+        # The data was parsed from the file, so this shouldn't occur.
+        if len(spans[0]) != len(json_data[key]):
+            spans = None
+
+    path = os.path.join(upload_dir, FILENAME)
+
+    # Write to a temporary file and rename it, so that concurrent requests never read a partial file.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tmp)
+
+    with contextlib.closing(sqlite3.connect(tmp)) as connection, connection:
+        connection.executescript(SCHEMA)
+        connection.executemany("INSERT INTO summary VALUES (?, ?, ?, ?, ?, ?, ?)", _rows(json_data[key], key, spans))
+        connection.executescript(INDEXES)
+        connection.executemany(
+            "INSERT INTO metadata VALUES (?, ?)",
+            ((name, json.dumps(item)) for name, item in metadata.items()),
+        )
+    os.replace(tmp, path)
+
+
+def _upper_bound(prefix):
+    # Strings that start with the prefix sort before the prefix with its last character incremented.
+    last = ord(prefix[-1]) + 1
+    if last > sys.maxunicode:
+        return None
+    # Skip the surrogates, which can't be encoded as UTF-8.
+    if last in SURROGATES:
+        last = SURROGATES.stop
+    return prefix[:-1] + chr(last)
+
+
+def page(upload_dir, number, size, sort=None, *, descending=False, ocid=None):
+    """
+    Return the number of matching summaries, and the summaries on a page, or ``None`` if no summaries are stored.
+
+    :param number: the page number, starting at 1
+    :param size: the number of summaries per page
+    :param sort: the column by which to sort, in ``SORT_COLUMNS``, or ``None`` to sort by position in the package
+    :param ocid: if set, return only the summaries whose OCID starts with this prefix
+    """
+    path = os.path.join(upload_dir, FILENAME)
+
+    where = []
+    params = []
+    if ocid:
+        where.append("ocid >= ?")
+        params.append(ocid)
+        upper = _upper_bound(ocid)
+        if upper is None:
+            where.append("substr(ocid, 1, ?) = ?")
+            params.extend([len(ocid), ocid])
+        else:
+            where.append("ocid < ?")
+            params.append(upper)
+    where = f"WHERE {' AND '.join(where)}" if where else ""
+
+    direction = "DESC" if descending else "ASC"
+    order = f"{sort} {direction}, position {direction}" if sort else f"position {direction}"
+
+    try:
+        with _connect(path) as connection:
+            (count,) = connection.execute(f"SELECT COUNT(*) FROM summary {where}", params).fetchone()  # noqa: S608
+            rows = connection.execute(
+                f"SELECT row FROM summary {where} ORDER BY {order} LIMIT ? OFFSET ?",  # noqa: S608
+                [*params, size, (number - 1) * size],
+            )
+            results = [json.loads(row) for (row,) in rows]
+    except sqlite3.Error:
+        return None
+
+    return {"count": count, "results": results}
+
+
+def find(upload_dir, *, position=None, ocid=None, id=None):  # noqa: A002
+    """
+    Return the positions and byte offsets of the releases or records with the given position, OCID or ID, in order.
+
+    Return ``None`` if no summaries are stored. Releases or records whose byte offsets aren't stored are omitted.
+    """
+    path = os.path.join(upload_dir, FILENAME)
+
+    where = ["start IS NOT NULL"]
+    params = []
+    for column, value in (("position", position), ("ocid", ocid), ("id", id)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+
+    try:
+        with _connect(path) as connection:
+            return connection.execute(
+                f"SELECT position, start, end FROM summary WHERE {' AND '.join(where)} ORDER BY position",  # noqa: S608
+                params,
+            ).fetchall()
+    except sqlite3.Error:
+        return None
+
+
+def read(upload_dir, **kwargs):
+    """
+    Return the releases or records with the given position, OCID or ID, by reading only their bytes from the file.
+
+    Return ``None`` if no summaries are stored.
+    """
+    spans = find(upload_dir, **kwargs)
+    if not spans:
+        return spans
+    path = os.path.join(upload_dir, read_metadata(upload_dir)["path"])
+    return streaming.read_spans(path, [(start, end) for _, start, end in spans])
@@ -0,0 +1,233 @@
+"""
+Generate release packages and record packages of any size, for benchmarks, load tests and profiling.
+
+The releases have the shape of those in ``tests/fixtures/30_releases.json``, and the records the shape of those in
+``tests/fixtures/7_records.json``: each OCID has 5 releases, and each record has a compiled release. The nesting depth
+of the releases, the extensions, the rate of duplicate IDs, the rate of errors and the length of strings can be set.
+
+The data is generated from a seed, so the same options always generate the same data. The package is written one
+release or record at a time, so that its size isn't limited by memory.
+"""
+
+import json
+import random
+
+from cove_ocds.lib.ocds_show_extra import merge
+
+# The number of releases per OCID.
+RELEASES_PER_OCID = 5
+# The maximum nesting depth of the releases:
+#
+# 0. ocid, id, date, tag, initiationType
+# 1. tender
+# 2. tender items, buyer, parties
+# 3. awards, contracts
+# 4. contract transactions
+MAX_DEPTH = 4
+
+WORDS = (
+    "road",
+    "bridge",
+    "school",
+    "hospital",
+    "supply",
+    "construction",
+    "maintenance",
+    "services",
+    "equipment",
+    "municipal",
+    "lighting",
+    "water",
+)
+
+
+def _invalid_date(release):
+    release["date"] = "2020-13-45"
+
+
+def _invalid_type(release):
+    release["initiationType"] = 1
+
+
+def _missing_id(release):
+    del release["id"]
+
+
+def _invalid_amount(release):
+    if "tender" in release:
+        release["tender"]["value"]["amount"] = str(release["tender"]["value"]["amount"])
+    else:
+        _invalid_date(release)
+
+
+# Functions that make a release invalid against the schema.
+ERRORS = (_invalid_date, _invalid_type, _missing_id, _invalid_amount)
+
+
+class Generator:
+    """Generate releases, records and packages."""
+
+    def __init__(self, *, depth=1, extensions=(), duplicate_rate=0, error_rate=0, string_length=30, seed=0):
+        """
+        Set the options of the generated data.
+
+        :param depth: the nesting depth of the releases, from 0 to ``MAX_DEPTH``
+        :param extensions: the URLs of the extensions that the package declares
+        :param duplicate_rate: the fraction of releases whose ID is the same as the previous release's, or the fraction
+            of records whose OCID is the same as the previous record's
+        :param error_rate: the fraction of releases with an error against the schema (see ``ERRORS``)
+        :param string_length: the length of titles and descriptions
+        :param seed: the seed from which the data is generated
+        """
+        self.depth = depth
+        self.extensions = list(extensions)
+        self.duplicate_rate = duplicate_rate
+        self.error_rate = error_rate
+        self.string_length = string_length
+        self.seed = seed
+
+    def _random(self, kind, number):
+        # Each release or record is generated from its own seed, so that it doesn't depend on the others.
+        return random.Random(f"{self.seed}-{kind}-{number}")  # noqa: S311 # not for security
+
+    def _text(self, rng, prefix):
+        text = prefix
+        while len(text) < self.string_length:
+            text += f" {rng.choice(WORDS)}"
+        return text[: self.string_length]
+
+    def package_metadata(self):
+        """Return the metadata of a package."""
+        metadata = {
+            "uri": "https://example.com/package.json",
+            "publisher": {"name": "Example"},
+            "publishedDate": "2020-01-01T00:00:00Z",
+            "version": "1.1",
+        }
+        if self.extensions:
+            metadata["extensions"] = self.extensions
+        return metadata
+
+    def release(self, number):
+        """Return the nth release, counting from 0."""
+        rng = self._random("release", number)
+        index = number // RELEASES_PER_OCID + 1
+        step = number % RELEASES_PER_OCID + 1
+        ocid = f"ocds-example-{index}"
+        if step > 1 and rng.random() < self.duplicate_rate:
+            step -= 1
+        amount = rng.randint(1, 1000) * 1000
+
+        release = {
+            "ocid": ocid,
+            "id": f"{ocid}-{step}",
+            "date": f"2020-01-{number % RELEASES_PER_OCID + 1:02d}T00:00:00Z",
+            "tag": ["tender"],
+            "initiationType": "tender",
+        }
+        if self.depth >= 1:
+            release["tender"] = {
+                "id": f"{ocid}-tender",
+                "title": self._text(rng, f"Tender {index}"),
+                "description": self._text(rng, "Description"),
+                "status": "active",
+                "value": {"amount": amount, "currency": "USD"},
+            }
+        if self.depth >= 2:  # noqa: PLR2004
+            buyer = {"id": "buyer-1", "name": self._text(rng, "Buyer")}
+            supplier = {"id": f"supplier-{rng.randint(1, 100)}", "name": self._text(rng, "Supplier")}
+            release["buyer"] = buyer
+            release["parties"] = [{**buyer, "roles": ["buyer"]}, {**supplier, "roles": ["supplier"]}]
+            release["tender"]["items"] = [
+                {
+                    "id": str(i),
+                    "description": self._text(rng, f"Item {i}"),
+                    "classification": {"scheme": "CPV", "id": "45233130", "description": "Construction work"},
+                    "quantity": rng.randint(1, 10),
+                    "unit": {"name": "Unit"},
+                }
+                for i in range(1, rng.randint(1, 3) + 1)
+            ]
+        if self.depth >= 3:  # noqa: PLR2004
+            release["tag"] = ["award", "contract"]
+            release["awards"] = [
+                {
+                    "id": f"{ocid}-award",
+                    "title": self._text(rng, "Award"),
+                    "status": "active",
+                    "date": release["date"],
+                    "value": {"amount": amount, "currency": "USD"},
+                    "suppliers": [supplier],
+                }
+            ]
+            release["contracts"] = [
+                {
+                    "id": f"{ocid}-contract",
+                    "awardID": f"{ocid}-award",
+                    "title": self._text(rng, "Contract"),
+                    "status": "active",
+                    "value": {"amount": amount, "currency": "USD"},
+                }
+            ]
+        if self.depth >= 4:  # noqa: PLR2004
+            release["tag"] = ["implementation"]
+            release["contracts"][0]["implementation"] = {
+                "transactions": [
+                    {
+                        "id": f"{ocid}-transaction-{i}",
+                        "date": release["date"],
+                        "value": {"amount": amount // 4, "currency": "USD"},
+                        "payer": buyer,
+                        "payee": supplier,
+                    }
+                    for i in range(1, rng.randint(1, 4) + 1)
+                ]
+            }
+
+        if rng.random() < self.error_rate:
+            rng.choice(ERRORS)(release)
+
+        return release
+
+    def record(self, number):
+        """Return the nth record, counting from 0, whose releases are the releases for its OCID."""
+        rng = self._random("record", number)
+        if number and rng.random() < self.duplicate_rate:
+            number -= 1
+        releases = [self.release(number * RELEASES_PER_OCID + i) for i in range(RELEASES_PER_OCID)]
+
+        compiled = {}
+        for release in releases:
+            merge(compiled, release)
+        compiled["id"] = f"{compiled.get('ocid')}-{compiled.get('date')}"
+        compiled["tag"] = ["compiled"]
+
+        return {"ocid": f"ocds-example-{number + 1}", "releases": releases, "compiledRelease": compiled}
+
+    def write(self, path, count, *, records=False):
+        """
+        Write a release package, or a record package, to a file.
+
+        :param count: the number of releases or records
+        """
+        key = "records" if records else "releases"
+        generate = self.record if records else self.release
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.package_metadata())[:-1])
+            f.write(f', "{key}": [')
+            for number in range(count):
+                if number:
+                    f.write(", ")
+                f.write(json.dumps(generate(number)))
+            f.write("]}")
+
+
+def write_package(path, count, *, records=False, **options):
+    """
+    Write a release package, or a record package, to a file.
+
+    :param count: the number of releases or records
+    :param options: the options of :class:`Generator`
+    """
+    Generator(**options).write(path, count, records=records)
@@ -0,0 +1,88 @@
+"""
+Time the phases of a request, like parsing, checking and rendering, to know where the time of a slow request went.
+
+``ServerTimingMiddleware`` (in ``cove_ocds/middleware.py``) starts recording the timings of a request. The code of the
+phases calls :func:`phase` and :func:`annotate`, which do nothing if no timings are being recorded, like if the
+middleware isn't installed, or if the code runs outside a request.
+"""
+
+import contextlib
+import contextvars
+import time
+
+_current = contextvars.ContextVar("timings", default=None)
+
+
+class Timings:
+    """The durations of the phases of a request, and fields that describe the request's data."""
+
+    def __init__(self):
+        self.phases = {}
+        self.fields = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Add the duration of the block to the phase's duration."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def header(self, total=None):
+        """
+        Return the value of a ``Server-Timing`` header, with the durations in milliseconds.
+
+        :param total: the duration of the request, in seconds
+        """
+        metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        if total is not None:
+            metrics.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+@contextlib.contextmanager
+def record():
+    """
+    Record the timings of the phases in the block, and yield the :class:`Timings`.
+
+    If timings are already being recorded, yield the same :class:`Timings`.
+    """
+    timings = _current.get()
+    if timings is not None:
+        yield timings
+        return
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Time the block as the named phase, if timings are being recorded."""
+    timings = _current.get()
+    if timings is None:
+        yield
+    else:
+        with timings.phase(name):
+            yield
+
+
+def annotate(**fields):
+    """Describe the request's data, like its file size, if timings are being recorded."""
+    timings = _current.get()
+    if timings is not None:
+        timings.fields.update(fields)
+
+
+def add(timings):
+    """Add timings that were recorded elsewhere, like in another process, if timings are being recorded."""
+    current = _current.get()
+    if current is None or current is timings:
+        return
+    for name, seconds in timings.phases.items():
+        current.phases[name] = current.phases.get(name, 0) + seconds
+    current.fields.update(timings.fields)
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cove_ocds.lib import benchmark
+
+
+class Command(BaseCommand):
+    help = "Measure the time and memory that each phase of checking a package takes, over generated packages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=int,
+            nargs="+",
+            default=[1000, 10000, 100000],
+            help="the numbers of releases (or records) in the generated packages",
+        )
+        parser.add_argument("--records", action="store_true", help="generate record packages")
+        parser.add_argument(
+            "--phase", nargs="+", choices=benchmark.PHASES, default=benchmark.PHASES, help="the phases to measure"
+        )
+        parser.add_argument("--directory", help="the directory in which to store generated packages, to reuse them")
+        parser.add_argument("--no-allocations", action="store_true", help="don't trace memory allocations")
+        parser.add_argument("--output", help="the file to which to write the results, as JSON")
+        parser.add_argument("--baseline", help="the results of a previous benchmark, with which to compare")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="the fraction by which a measurement can exceed its baseline (default 0.2)",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)["results"]
+
+        directory = options["directory"] or tempfile.mkdtemp(prefix="cove-ocds-benchmark-")
+        os.makedirs(directory, exist_ok=True)
+
+        results = {}
+        for size in options["size"]:
+            path = benchmark.package_path(directory, size, records=options["records"])
+            with tempfile.TemporaryDirectory() as upload_dir:
+                results[str(size)] = benchmark.run(
+                    path, upload_dir, options["phase"], allocations=not options["no_allocations"]
+                )
+
+            for phase, measurements in results[str(size)].items():
+                allocated = measurements["allocated"]
+                self.stdout.write(
+                    f"{size:>9} {phase:<10} {measurements['seconds']:>9.3f}s "
+                    f"{measurements['peak_rss'] / 2**20:>9.1f} MiB RSS "
+                    f"{'-' if allocated is None else f'{allocated / 2**20:.1f}':>9} MiB allocated"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({"environment": benchmark.environment(), "results": results}, f, indent=2)
+
+        if baseline is not None:
+            if regressions := benchmark.compare(results, baseline, options["threshold"]):
+                for size, phase, metric, old, new in regressions:
+                    self.stderr.write(f"{size} {phase} {metric}: {old:g} -> {new:g}")
+                message = f"{len(regressions)} measurements regressed by more than {options['threshold']:.0%}"
+                raise CommandError(message)
+            self.stdout.write("No regressions")
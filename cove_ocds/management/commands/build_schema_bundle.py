@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cove_ocds.lib import bundle
+
+
+class Command(BaseCommand):
+    help = "Write the schemas and codelists of all versions and languages to a bundle, to use with SCHEMA_BUNDLE_DIR"
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", nargs="?", help="the directory of the bundle (default SCHEMA_BUNDLE_DIR)")
+
+    def handle(self, *args, **options):
+        directory = options["directory"] or settings.SCHEMA_BUNDLE_DIR
+        if not directory:
+            message = "Set the directory argument or SCHEMA_BUNDLE_DIR"
+            raise CommandError(message)
+
+        manifest = bundle.write(
+            directory,
+            settings.COVE_CONFIG["schema_version_choices"],
+            [code for code, _ in settings.LANGUAGES],
+        )
+        self.stdout.write(f"Wrote {len(manifest['files'])} files to {directory} ({manifest['digest']})")
@@ -0,0 +1,28 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cove_ocds.lib.schema import extended_schemas_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete extended schemas that no upload links to, and that haven't been used in DELETE_FILES_AFTER_DAYS days"
+    )
+
+    def handle(self, *args, **options):
+        directory = extended_schemas_dir()
+        if not os.path.isdir(directory):
+            return
+
+        cutoff = time.time() - timedelta(days=settings.DELETE_FILES_AFTER_DAYS).total_seconds()
+
+        for entry in os.scandir(directory):
+            stat = entry.stat()
+            # Uploads link to the stored file, so a link count of 1 means that no upload uses it. Uploads that copied
+            # the stored file, because hard links aren't supported, don't need it.
+            if stat.st_mtime < cutoff and stat.st_nlink == 1:
+                os.remove(entry.path)
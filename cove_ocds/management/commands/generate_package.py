@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from cove_ocds.lib import synthetic
+
+
+class Command(BaseCommand):
+    help = "Generate a release package or record package, for benchmarks, load tests and profiling"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="the file to which to write the package")
+        parser.add_argument(
+            "--size", type=int, default=1000, help="the number of releases (or records) in the package (default 1000)"
+        )
+        parser.add_argument("--records", action="store_true", help="generate a record package")
+        parser.add_argument(
+            "--depth",
+            type=int,
+            choices=range(synthetic.MAX_DEPTH + 1),
+            default=1,
+            help="the nesting depth of the releases (default 1)",
+        )
+        parser.add_argument("--extension", nargs="+", default=[], help="the URLs of extensions to declare")
+        parser.add_argument(
+            "--duplicate-rate",
+            type=float,
+            default=0,
+            help="the fraction of releases (or records) with the same ID (or OCID) as the previous one",
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=0, help="the fraction of releases with an error against the schema"
+        )
+        parser.add_argument(
+            "--string-length", type=int, default=30, help="the length of titles and descriptions (default 30)"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="the seed from which the data is generated")
+
+    def handle(self, *args, **options):
+        synthetic.write_package(
+            options["path"],
+            options["size"],
+            records=options["records"],
+            depth=options["depth"],
+            extensions=options["extension"],
+            duplicate_rate=options["duplicate_rate"],
+            error_rate=options["error_rate"],
+            string_length=options["string_length"],
+            seed=options["seed"],
+        )
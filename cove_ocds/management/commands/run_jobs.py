@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cove_ocds.models import Conversion, Job
+from cove_ocds.views import run_conversion, run_job
+
+
+class Command(BaseCommand):
+    help = "Process large uploads and conversions in the background. Run one command per worker process."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--burst", action="store_true", help="exit once no jobs are queued")
+        parser.add_argument("--sleep", type=float, default=1, help="seconds to wait between checks for new jobs")
+
+    def handle(self, *args, **options):
+        while True:
+            # Checks are run before conversions, as users wait for the results of checks.
+            if job := Job.claim():
+                run_job(job)
+            elif conversion := Conversion.claim():
+                run_conversion(conversion)
+            elif options["burst"]:
+                return
+            else:
+                time.sleep(options["sleep"])
@@ -0,0 +1,82 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from cove_ocds.lib import metrics, timing
+
+logger = logging.getLogger(__name__)
+
+
+class TimingMiddleware:
+    """Record the timings of the phases of a request, and pass them to ``finish()``. Supports async views."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with timing.record() as timings:
+            response = self.get_response(request)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with timing.record() as timings:
+            response = await self.get_response(request)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def finish(self, request, response, timings, total):  # noqa: ARG002
+        """
+        Return the response. Subclasses override this method, to report the timings or to modify the response.
+
+        :param total: the duration of the request, in seconds
+        """
+        return response
+
+
+class ServerTimingMiddleware(TimingMiddleware):
+    """
+    Add a ``Server-Timing`` header to responses whose views time their phases, and log one line of JSON per response.
+
+    This middleware is installed if the ``SERVER_TIMING`` environment variable is set.
+    """
+
+    def finish(self, request, response, timings, total):
+        if timings.phases:
+            response["Server-Timing"] = timings.header(total)
+            logger.info(
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.path,
+                        "status": response.status_code,
+                        **timings.fields,
+                        "phases": {name: round(seconds, 6) for name, seconds in timings.phases.items()},
+                        "total": round(total, 6),
+                    },
+                    default=str,
+                )
+            )
+
+        return response
+
+
+class MetricsMiddleware(TimingMiddleware):
+    """
+    Observe the durations of the phases of requests, for the ``/metrics`` endpoint.
+
+    This middleware is installed if the ``METRICS_DATABASE_PATH`` environment variable is set.
+    """
+
+    def finish(self, request, response, timings, total):  # noqa: ARG002
+        metrics.observe_timings(timings, "request")
+        return response
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.29 on 2026-10-18 17:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("input", "0010_alter_supplieddata_original_file"),
+        ("cove_ocds", "0001_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Conversion",
+            fields=[
+                (
+                    "supplied_data",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="conversion",
+                        serialize=False,
+                        to="input.supplieddata",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        db_index=True,
+                        default="queued",
+                        max_length=9,
+                    ),
+                ),
+                ("queued", models.DateTimeField(default=django.utils.timezone.now)),
+                ("started", models.DateTimeField(blank=True, null=True)),
+                ("finished", models.DateTimeField(blank=True, null=True)),
+                ("schema_url", models.TextField()),
+                ("error", models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
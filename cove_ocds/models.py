@@ -0,0 +1,179 @@
+from datetime import timedelta
+
+from cove.input.models import SuppliedData
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+
+class Task(models.Model):
+    """
+    A task about supplied data, run by the ``run_jobs`` command.
+
+    If no ``run_jobs`` workers are configured, conversions are run during the request, instead.
+
+    Subclasses define the ``supplied_data`` and ``error`` fields.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        COMPLETED = "completed"
+        FAILED = "failed"
+
+    status = models.CharField(max_length=9, choices=Status.choices, default=Status.QUEUED, db_index=True)
+
+    queued = models.DateTimeField(default=timezone.now)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.supplied_data_id} ({self.status})"
+
+    @property
+    def pending(self):
+        return self.status in (self.Status.QUEUED, self.Status.RUNNING)
+
+    @classmethod
+    def _cutoff(cls):
+        return timezone.now() - timedelta(seconds=settings.BACKGROUND_JOB_TIMEOUT)
+
+    @property
+    def stale(self):
+        """Whether the task has been running for longer than ``BACKGROUND_JOB_TIMEOUT`` seconds."""
+        return self.status == self.Status.RUNNING and self.started < self._cutoff()
+
+    def expire(self):
+        """
+        Fail the task, if it is stale, like if its worker was killed for running out of memory.
+
+        A stale task isn't queued again, as it would likely fail the same way.
+        """
+        if self.stale:
+            self.finish(self.timeout_error())
+
+    def timeout_error(self):
+        """Return the error of a stale task, in the format of the subclass's ``error`` field."""
+        return _("The task was interrupted, or took too long.")
+
+    @classmethod
+    def _enqueue(cls, supplied_data, **kwargs):
+        """
+        Queue the task, replacing any previous task of the same type, and return it.
+
+        If the previous task is running, it is returned instead, as its worker writes to the same upload directory.
+        """
+        values = {
+            "status": cls.Status.QUEUED,
+            "queued": timezone.now(),
+            "started": None,
+            "finished": None,
+            "error": None,
+            **kwargs,
+        }
+        task, created = cls.objects.get_or_create(supplied_data=supplied_data, defaults=values)
+        if created:
+            return task
+
+        task.expire()
+        if task.status == cls.Status.RUNNING:
+            return task
+        # A worker might have started the task, or another request might have replaced it, since it was read.
+        if not cls.objects.filter(pk=task.pk, status=task.status, queued=task.queued).update(**values):
+            return cls.objects.get(pk=task.pk)
+        for name, value in values.items():
+            setattr(task, name, value)
+        return task
+
+    @classmethod
+    def claim(cls):
+        """
+        Return the oldest queued task, after marking it as running, or ``None`` if no task is queued.
+
+        A task is claimed with a conditional update, so that only one worker process runs it. Stale tasks are failed.
+        """
+        for task in cls.objects.filter(status=cls.Status.RUNNING, started__lt=cls._cutoff()):
+            task.expire()
+
+        for task in cls.objects.filter(status=cls.Status.QUEUED).order_by("queued")[:10]:
+            if task.start():
+                return task
+        return None
+
+    def start(self):
+        """Mark the task as running, if it is still queued, and return whether it was marked."""
+        started = timezone.now()
+        if (
+            type(self)
+            .objects.filter(pk=self.pk, status=self.Status.QUEUED, queued=self.queued)
+            .update(status=self.Status.RUNNING, started=started)
+        ):
+            self.status = self.Status.RUNNING
+            self.started = started
+            return True
+        return False
+
+    def finish(self, error=None):
+        self.status = self.Status.FAILED if error else self.Status.COMPLETED
+        self.finished = timezone.now()
+        self.error = error
+        # A request might have replaced the task while it was running. If so, leave the new task alone.
+        type(self).objects.filter(pk=self.pk, status=self.Status.RUNNING, started=self.started).update(
+            status=self.status, finished=self.finished, error=self.error
+        )
+
+
+class Job(Task):
+    """The background processing of a large upload."""
+
+    supplied_data = models.OneToOneField(SuppliedData, on_delete=models.CASCADE, primary_key=True, related_name="job")
+
+    # The request's parameters.
+    language = models.CharField(max_length=10)
+    version = models.CharField(max_length=10, blank=True)
+    flatten = models.BooleanField(default=False)
+
+    # The context of the error page, if the job failed.
+    error = models.JSONField(null=True, blank=True)
+
+    @classmethod
+    def enqueue(cls, supplied_data, language, version="", *, flatten=False):
+        """Queue the processing of the supplied data, replacing any previous job, unless it is running."""
+        return cls._enqueue(supplied_data, language=language, version=version, flatten=flatten)
+
+    def timeout_error(self):
+        # Like views.job_error_context().
+        return {
+            "sub_title": _("Sorry, we can't process that data"),
+            "link": "index",
+            "link_text": _("Try Again"),
+            "msg": _("The processing of the data was interrupted, or took too long. The data might be too large."),
+            "msg_safe": False,
+            "support_email": settings.COVE_CONFIG.get("support_email"),
+        }
+
+
+class Conversion(Task):
+    """The conversion of JSON data to a spreadsheet, which is deferred so that it doesn't delay the checks."""
+
+    supplied_data = models.OneToOneField(
+        SuppliedData, on_delete=models.CASCADE, primary_key=True, related_name="conversion"
+    )
+
+    # The schema against which to flatten the data, like the extended schema file.
+    schema_url = models.TextField()
+
+    # The error message, if the conversion failed.
+    error = models.JSONField(null=True, blank=True)
+
+    @classmethod
+    def enqueue(cls, supplied_data, schema_url):
+        """Queue the conversion of the supplied data, replacing any previous conversion, unless it is running."""
+        return cls._enqueue(supplied_data, schema_url=schema_url)
+
+    def timeout_error(self):
+        return _("The conversion was interrupted, or took too long. The data might be too large.")
@@ -1,32 +1,69 @@
-import copy
+import gzip
+import hashlib
 import json
 import logging
+import math
 import os
 import re
 import warnings
-from decimal import Decimal
+from urllib.parse import urljoin
 
+from cove.input.models import SuppliedData
+from cove.input.views import data_input
 from cove.views import cove_web_input_error, explore_data_context
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.template.defaultfilters import date as date_filter
 from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 from django.utils.html import format_html
+from django.utils.http import quote_etag
+from django.utils.safestring import SafeData, mark_safe
+from django.utils.timezone import template_localtime
 from django.utils.translation import gettext as _
 from flattentool.exceptions import FlattenToolValueError, FlattenToolWarning
+from flattentool.json_input import BadlyFormedJSONError
 from libcove.lib.common import get_spreadsheet_meta_data
 from libcove.lib.converters import convert_json, convert_spreadsheet
-from libcove.lib.exceptions import CoveInputDataError
+from libcove.lib.exceptions import CoveInputDataError, UnrecognisedFileType
+from libcove.lib.tools import get_file_type
 from libcoveocds.common_checks import common_checks_ocds
 from libcoveocds.config import LibCoveOCDSConfig
-from libcoveocds.schema import SchemaOCDS
 
-from cove_ocds.lib.views import group_validation_errors
-
-from .lib import exceptions
-from .lib.ocds_show_extra import add_extra_fields
+from cove_ocds.models import Conversion, Job
+from cove_ocds.templatetags.cove_ocds import to_datetime
+
+from .lib import (
+    bundle,
+    errors,
+    exceptions,
+    metrics,
+    ocds_show_extra,
+    offload,
+    sharding,
+    snapshot,
+    streaming,
+    summaries,
+    timing,
+)
+from .lib.schema import SchemaOCDS, get_fields_index, prefetch, prefetched, schema_cache
 
 logger = logging.getLogger(__name__)
-MAXIMUM_RELEASES_OR_RECORDS = 100
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+# The keys of the context that describe the conversion of JSON data to a spreadsheet.
+CONVERSION_KEYS = {
+    "conversion",
+    "conversion_error",
+    "conversion_task",
+    "conversion_warning_messages",
+    "conversion_warning_messages_titles",
+    "converted_file_size",
+    "converted_file_size_titles",
+    "converted_path",
+    "converted_url",
+}
 
 
 def format_lang(choices, lang):
@@ -37,8 +74,22 @@ def format_lang(choices, lang):
     return formatted_choices
 
 
-@cove_web_input_error
-def explore_ocds(request, pk):
+def get_lib_cove_ocds_config():
+    """Return the configuration of lib-cove-ocds, in the current language."""
+    lib_cove_ocds_config = LibCoveOCDSConfig(settings.COVE_CONFIG)
+    lib_cove_ocds_config.config["current_language"] = translation.get_language()
+    lib_cove_ocds_config.config["schema_version_choices"] = format_lang(
+        lib_cove_ocds_config.config["schema_version_choices"], translation.get_language()
+    )
+    return lib_cove_ocds_config
+
+
+def explore_context(request, pk):
+    """
+    Return the context of the results page and the supplied data, or a response if the data needn't be analyzed.
+
+    The response is an error page, the page of a background job, or the page of the stored results.
+    """
     try:
         context, db_data, error = explore_data_context(request, pk)
     # https://github.com/OpenDataServices/lib-cove-web/pull/145
@@ -63,80 +114,195 @@ def explore_ocds(request, pk):
     if error:
         return error
 
-    lib_cove_ocds_config = LibCoveOCDSConfig(settings.COVE_CONFIG)
-    lib_cove_ocds_config.config["current_language"] = translation.get_language()
-    lib_cove_ocds_config.config["schema_version_choices"] = format_lang(
-        lib_cove_ocds_config.config["schema_version_choices"], request.LANGUAGE_CODE
+    if settings.BACKGROUND_JOB_MIN_SIZE and context["original_file"]["size"] >= settings.BACKGROUND_JOB_MIN_SIZE:
+        job = Job.objects.filter(supplied_data=db_data).first()
+        if job is not None:
+            job.expire()
+        if job is None or request.method == "POST":
+            job = Job.enqueue(
+                db_data,
+                translation.get_language(),
+                request.POST.get("version", ""),
+                flatten=bool(request.POST.get("flatten")),
+            )
+        elif job.status == Job.Status.COMPLETED:
+            response = render_stored(request, db_data, context)
+            if response is not None:
+                return response
+            # The results aren't stored in this language, or are outdated. Queue a job, instead of processing the file
+            # in the request.
+            job = Job.enqueue(db_data, translation.get_language(), job.version)
+        if job.pending:
+            context["job"] = job
+            return render(request, "cove_ocds/processing.html", context)
+        return render_error(request, job.error)
+
+    # Render the stored results, unless the user asked to change the version or to convert the data.
+    if request.method == "GET" and db_data.rendered:
+        response = render_stored(request, db_data, context)
+        if response is not None:
+            return response
+
+    return context, db_data
+
+
+@cove_web_input_error
+def explore_ocds(request, pk):
+    result = explore_context(request, pk)
+    if isinstance(result, HttpResponse):
+        return result
+    context, db_data = result
+
+    with metrics.in_progress():
+        context, template = analyze(
+            context,
+            db_data,
+            post_version_choice=request.POST.get("version"),
+            flatten=request.POST.get("flatten"),
+            request=request,
+        )
+
+    return render_results(request, db_data, template, context)
+
+
+async def explore_ocds_async(request, pk):
+    """
+    Like ``explore_ocds``, but analyze the supplied data in the pool of processes, without blocking the event loop.
+
+    The results are stored by the worker, and then rendered like stored results. See :mod:`cove_ocds.lib.offload`.
+    """
+    result = await offload.thread(cove_web_input_error(explore_context), request, pk)
+    if isinstance(result, HttpResponse):
+        return result
+    context, db_data = result
+
+    first_render = not db_data.rendered
+    with metrics.in_progress():
+        error, timings = await offload.process(
+            analyze_supplied_data,
+            db_data.pk,
+            translation.get_language(),
+            post_version_choice=request.POST.get("version"),
+            flatten=request.POST.get("flatten"),
+        )
+    timing.add(timings)
+
+    if error:
+        return await offload.thread(render_error, request, error)
+    return await offload.thread(render_analyzed, request, db_data, context, first_render=first_render)
+
+
+def render_analyzed(request, db_data, context, *, first_render):
+    """Render the results that ``analyze_supplied_data()`` stored."""
+    db_data.refresh_from_db()
+    response = render_stored(request, db_data, context, first_render=first_render)
+    if response is not None:
+        return response
+
+    # The file or its fingerprint changed since the results were stored.
+    context, template = analyze(
+        context,
+        db_data,
+        post_version_choice=request.POST.get("version"),
+        flatten=request.POST.get("flatten"),
+        request=request,
+    )
+    return render_results(request, db_data, template, context)
+
+
+def render_stored(request, db_data, context, *, first_render=False):
+    """Render the stored results of checking the supplied data, or return ``None`` if none are stored."""
+    with timing.phase("snapshot"):
+        stored = snapshot.load(db_data, db_data.schema_version, translation.get_language())
+    if stored is None:
+        return None
+
+    context.update(stored)
+    context["first_render"] = first_render
+    # The conversion's status changes independently of the checks.
+    if context["file_type"] == "json" and context["release_or_record"] == "release":
+        with timing.phase("conversion"):
+            context.update(conversion_context(db_data, LibCoveOCDSConfig(settings.COVE_CONFIG), request=request))
+    timing.annotate(extension_count=len((context.get("extensions") or {}).get("extensions", ())))
+    return render_results(request, db_data, f"cove_ocds/explore_{context['release_or_record']}.html", context)
+
+
+def render_error(request, error):
+    """Render the error page, with the context from ``job_error_context()``."""
+    error_context = dict(error)
+    if error_context.pop("msg_safe", False):
+        error_context["msg"] = mark_safe(error_context["msg"])
+    return render(request, "error.html", error_context)
+
+
+def render_results(request, db_data, template, context):
+    """Render the results page, and describe the supplied data in the request's timings."""
+    timing.annotate(
+        file_size=context["original_file"]["size"],
+        release_count=context.get("releases_or_records_count"),
+        schema_version=db_data.schema_version,
     )
+    with timing.phase("render"):
+        return render(request, template, context)
+
+
+def analyze(context, db_data, post_version_choice=None, flatten=None, request=None):
+    """
+    Check and convert the supplied data, and return the context and template with which to render the results.
+
+    Raises :exc:`~libcove.lib.exceptions.CoveInputDataError` if the data can't be processed.
+
+    :param context: the context from ``explore_data_context()``, or at least its "file_type" and "original_file"
+    :param post_version_choice: the version to check the data against, overriding the version in the data
+    :param flatten: whether to convert JSON data to a spreadsheet
+    """
+    lib_cove_ocds_config = get_lib_cove_ocds_config()
 
     upload_dir = db_data.upload_dir()
     upload_url = db_data.upload_url()
     file_name = db_data.original_file.path
     file_type = context["file_type"]
+    # The keys of the context that are independent of the request.
+    request_keys = set(context)
 
-    post_version_choice = request.POST.get("version")
-    replace = False
     validation_errors_path = os.path.join(upload_dir, "validation_errors-3.json")
 
     if file_type == "json":
+        json_path = file_name
+        select_version = post_version_choice or db_data.schema_version
+        # Retrieve the extensions while the file is parsed.
+        future = prefetch(file_name, select_version, lib_cove_ocds_config)
+
+        streamed = context["original_file"]["size"] >= settings.STREAMING_JSON_MIN_SIZE
+        if streamed:
+            # Check the file without building its data in memory, so that unusable files are rejected quickly.
+            with timing.phase("prescan"):
+                try:
+                    streaming.check(file_name)
+                except streaming.StructureError as err:
+                    exceptions.raise_structure_error(err)
+
         with open(file_name, encoding="utf-8") as fp:
             try:
-                json_data = json.load(fp)
+                with timing.phase("parse"):
+                    json_data = streaming.load(file_name) if streamed else json.load(fp)
             except UnicodeError as err:
-                raise CoveInputDataError(
-                    context={
-                        "sub_title": _("Sorry, we can't process that data"),
-                        "link": "index",
-                        "link_text": _("Try Again"),
-                        "msg": format_html(
-                            _(
-                                "The file that you uploaded doesn't appear to be well formed JSON. OCDS JSON follows "
-                                "the I-JSON format, which requires UTF-8 encoding. Ensure that your file uses UTF-8 "
-                                'encoding, then try uploading again.\n\n<span class="glyphicon glyphicon-exclamation-'
-                                'sign" aria-hidden="true"></span> <strong>Error message:</strong> {}'
-                            ),
-                            err,
-                        ),
-                        "error": format(err),
-                    }
-                ) from None
+                exceptions.raise_encoding_error(err)
             except ValueError as err:
-                raise CoveInputDataError(
-                    context={
-                        "sub_title": _("Sorry, we can't process that data"),
-                        "link": "index",
-                        "link_text": _("Try Again"),
-                        "msg": format_html(
-                            _(
-                                "We think you tried to upload a JSON file, but it is not well formed JSON."
-                                '\n\n<span class="glyphicon glyphicon-exclamation-sign" aria-hidden="true">'
-                                "</span> <strong>Error message:</strong> {}",
-                            ),
-                            err,
-                        ),
-                        "error": format(err),
-                    }
-                ) from None
+                exceptions.raise_json_error(err)
 
             if not isinstance(json_data, dict):
-                raise CoveInputDataError(
-                    context={
-                        "sub_title": _("Sorry, we can't process that data"),
-                        "link": "index",
-                        "link_text": _("Try Again"),
-                        "msg": _("OCDS JSON should have an object as the top level, the JSON you supplied does not."),
-                    }
-                )
+                exceptions.raise_non_object_error()
 
             version_in_data = json_data.get("version") or ""
             db_data.data_schema_version = version_in_data
-            select_version = post_version_choice or db_data.schema_version
-            schema_ocds = SchemaOCDS(
-                select_version=select_version,
-                package_data=json_data,
-                lib_cove_ocds_config=lib_cove_ocds_config,
-                record_pkg="records" in json_data,
-            )
+            with timing.phase("schema"):
+                schema_ocds = SchemaOCDS(
+                    select_version=select_version,
+                    package_data=json_data,
+                    lib_cove_ocds_config=lib_cove_ocds_config,
+                    record_pkg="records" in json_data,
+                )
 
             if schema_ocds.missing_package:
                 exceptions.raise_missing_package_error()
@@ -150,39 +316,34 @@ def explore_ocds(request, pk):
                         version_in_data = f"{version_in_data} (it must be a string)"
                     context["unrecognized_version_data"] = version_in_data
 
-            if schema_ocds.version != db_data.schema_version:
-                replace = True
+            with timing.phase("schema"):
+                schema_ocds = schema_cache.get(schema_ocds, prefetched(future))
+
+            fingerprint = snapshot.fingerprint(db_data, schema_ocds)
+            replace = is_stale(db_data, fingerprint)
             if schema_ocds.extensions:
-                schema_ocds.create_extended_schema_file(upload_dir, upload_url)
+                with timing.phase("schema"):
+                    schema_ocds.create_extended_schema_file(upload_dir, upload_url)
             url = schema_ocds.extended_schema_file or schema_ocds.schema_url
 
             if "records" in json_data:
                 context["conversion"] = None
             else:
-                with warnings.catch_warnings():
-                    warnings.filterwarnings("ignore", category=FlattenToolWarning)
-
-                    convert_json_context = convert_json(
-                        upload_dir,
-                        upload_url,
-                        file_name,
-                        lib_cove_ocds_config,
-                        schema_url=url,
-                        # Unsure why exists() was added in https://github.com/open-contracting/cove-ocds/commit/d793c49
-                        replace=replace and os.path.exists(os.path.join(upload_dir, "flattened.xlsx")),
-                        request=request,
-                        flatten=request.POST.get("flatten"),
-                    )
-
-                context.update(convert_json_context)
+                with timing.phase("conversion"):
+                    queue_conversion(db_data, url, flatten=bool(flatten), replace=replace)
+                    context.update(conversion_context(db_data, lib_cove_ocds_config, schema_url=url, request=request))
 
     else:
-        metatab_schema_url = SchemaOCDS(select_version="1.1", lib_cove_ocds_config=lib_cove_ocds_config).pkg_schema_url
+        # This is SchemaOCDS(select_version="1.1").pkg_schema_url, without building a schema.
+        metatab_schema_url = bundle.local_path(
+            urljoin(lib_cove_ocds_config.config["schema_version_choices"]["1.1"][1], "release-package-schema.json")
+        )
 
         with warnings.catch_warnings():
             warnings.filterwarnings("ignore", category=FlattenToolWarning)
 
-            metatab_data = get_spreadsheet_meta_data(upload_dir, file_name, metatab_schema_url, file_type)
+            with timing.phase("parse"):
+                metatab_data = get_spreadsheet_meta_data(upload_dir, file_name, metatab_schema_url, file_type)
 
         if "version" not in metatab_data:
             metatab_data["version"] = "1.0"
@@ -190,11 +351,12 @@ def explore_ocds(request, pk):
             db_data.data_schema_version = metatab_data["version"]
 
         select_version = post_version_choice or db_data.schema_version
-        schema_ocds = SchemaOCDS(
-            select_version=select_version,
-            package_data=metatab_data,
-            lib_cove_ocds_config=lib_cove_ocds_config,
-        )
+        with timing.phase("schema"):
+            schema_ocds = SchemaOCDS(
+                select_version=select_version,
+                package_data=metatab_data,
+                lib_cove_ocds_config=lib_cove_ocds_config,
+            )
 
         if schema_ocds.invalid_version_argument:
             exceptions.raise_invalid_version_argument(post_version_choice)
@@ -205,30 +367,35 @@ def explore_ocds(request, pk):
             else:
                 context["unrecognized_version_data"] = version_in_data
 
-        if db_data.schema_version and schema_ocds.version != db_data.schema_version:  # if user changes schema version
-            replace = True
+        with timing.phase("schema"):
+            schema_ocds = schema_cache.get(schema_ocds)
+
+        fingerprint = snapshot.fingerprint(db_data, schema_ocds)
+        replace = is_stale(db_data, fingerprint)
 
         if schema_ocds.extensions:
-            schema_ocds.create_extended_schema_file(upload_dir, upload_url)
+            with timing.phase("schema"):
+                schema_ocds.create_extended_schema_file(upload_dir, upload_url)
         url = schema_ocds.extended_schema_file or schema_ocds.schema_url
-        pkg_url = schema_ocds.pkg_schema_url
+        pkg_url = bundle.local_path(schema_ocds.pkg_schema_url)
 
         with warnings.catch_warnings():
             warnings.filterwarnings("ignore", category=FlattenToolWarning)
 
             try:
-                context.update(
-                    getattr(convert_spreadsheet, "__wrapped__", convert_spreadsheet)(
-                        upload_dir,
-                        upload_url,
-                        file_name,
-                        file_type,
-                        lib_cove_ocds_config,
-                        schema_url=url,
-                        pkg_schema_url=pkg_url,
-                        replace=replace,
+                with timing.phase("conversion"):
+                    context.update(
+                        getattr(convert_spreadsheet, "__wrapped__", convert_spreadsheet)(
+                            upload_dir,
+                            upload_url,
+                            file_name,
+                            file_type,
+                            lib_cove_ocds_config,
+                            schema_url=url,
+                            pkg_schema_url=pkg_url,
+                            replace=replace,
+                        )
                     )
-                )
             except FlattenToolValueError as err:
                 raise CoveInputDataError(
                     context={
@@ -252,22 +419,42 @@ def explore_ocds(request, pk):
                 logger.exception(extra={"request": request})
                 raise CoveInputDataError(wrapped_err=err) from None
 
-        with open(context["converted_path"], encoding="utf-8") as fp:
+        json_path = context["converted_path"]
+        with timing.phase("parse"), open(json_path, encoding="utf-8") as fp:
             json_data = json.load(fp)
 
-    if replace and os.path.exists(validation_errors_path):
-        os.remove(validation_errors_path)
+    snapshot.remove_stale_files(upload_dir, fingerprint)
+    if file_type == "json" and not os.path.exists(validation_errors_path):
+        with timing.phase("checks"):
+            sharding.write_validation_errors(upload_dir, json_data, schema_ocds)
 
-    context = common_checks_ocds(context, upload_dir, json_data, schema_ocds)
+    # Reuse the results of the checks that don't depend on the schema version, if the version changed. (Spreadsheets
+    # are converted to JSON using the schema, so the JSON data itself depends on the version.)
+    version_independent = None
+    if file_type == "json":
+        version_independent = snapshot.load_version_independent(upload_dir, fingerprint)
+    if version_independent is not None:
+        # common_checks_ocds() reads these options from the request's copy of the configuration.
+        schema_ocds.config.config["skip_aggregates"] = True
+        schema_ocds.config.config["additional_checks"] = "none"
+
+    with timing.phase("checks"):
+        context = common_checks_ocds(context, upload_dir, json_data, schema_ocds)
+
+    if version_independent is not None:
+        context.update(version_independent)
 
     if schema_ocds.json_deref_error:
         exceptions.raise_json_deref_error(schema_ocds.json_deref_error)
 
+    with timing.phase("grouping"):
+        grouped = errors.write(upload_dir, context["validation_errors"], fingerprint)
+
     context.update(
         {
             "data_schema_version": db_data.data_schema_version,
             "first_render": not db_data.rendered,
-            "validation_errors_grouped": group_validation_errors(context["validation_errors"]),
+            "validation_errors_grouped": grouped,
         }
     )
 
@@ -289,38 +476,418 @@ def explore_ocds(request, pk):
 
     if "records" in json_data:
         context["release_or_record"] = "record"
-        ocds_show_schema = SchemaOCDS(record_pkg=True)
-        ocds_show_deref_schema = ocds_show_schema.get_schema_obj(deref=True)
         template = "cove_ocds/explore_record.html"
         if hasattr(json_data, "get") and hasattr(json_data.get("records"), "__iter__"):
-            context["records"] = json_data["records"]
-            if isinstance(json_data["records"], list) and len(json_data["records"]) < MAXIMUM_RELEASES_OR_RECORDS:
-                context["ocds_show_data"] = ocds_show_data(json_data, ocds_show_deref_schema)
+            context["records"] = table_context(db_data, json_data, "records", fingerprint, file_type, json_path)
+            context["releases_or_records_count"] = len(json_data["records"])
         else:
             context["records"] = []
+            context["releases_or_records_count"] = 0
     else:
         context["release_or_record"] = "release"
-        ocds_show_schema = SchemaOCDS(record_pkg=False)
-        ocds_show_deref_schema = ocds_show_schema.get_schema_obj(deref=True)
         template = "cove_ocds/explore_release.html"
         if hasattr(json_data, "get") and hasattr(json_data.get("releases"), "__iter__"):
-            context["releases"] = json_data["releases"]
-            if isinstance(json_data["releases"], list) and len(json_data["releases"]) < MAXIMUM_RELEASES_OR_RECORDS:
-                context["ocds_show_data"] = ocds_show_data(json_data, ocds_show_deref_schema)
+            context["releases"] = table_context(db_data, json_data, "releases", fingerprint, file_type, json_path)
+            context["releases_or_records_count"] = len(json_data["releases"])
         else:
             context["releases"] = []
+            context["releases_or_records_count"] = 0
+
+    # The validation errors are stored in validation_errors-3.json, and templates use validation_errors_count.
+    keys = set(context) - request_keys - {"first_render", "validation_errors"}
+    if file_type == "json" and context["release_or_record"] == "release":
+        keys -= CONVERSION_KEYS
+
+    with timing.phase("snapshot"):
+        if file_type == "json" and version_independent is None:
+            snapshot.save_version_independent(upload_dir, fingerprint, context)
+        snapshot.write_fingerprint(db_data, fingerprint)
+        snapshot.save(upload_dir, translation.get_language(), fingerprint, context, keys)
+
+    timing.annotate(extension_count=len(schema_ocds.extensions))
+    metrics.observe_analysis(context["original_file"]["size"], context["releases_or_records_count"], grouped)
+
+    return context, template
+
+
+def table_context(db_data, json_data, key, fingerprint, file_type, json_path):
+    """
+    Store the summaries of the releases or records, and return the summaries on the first page of the table.
+
+    The other pages are served by ``explore_table``.
+
+    :param json_path: the path to the JSON file from which the data was parsed
+    """
+    if not isinstance(json_data[key], list):
+        return []
+
+    upload_dir = db_data.upload_dir()
+    # Spreadsheets are converted to JSON using the schema, so the JSON data itself depends on the version.
+    value = snapshot.independent_fingerprint(fingerprint) if file_type == "json" else fingerprint
+    with timing.phase("table"):
+        summaries.write(upload_dir, json_data, key, value, json_path, ocds_show_schema(key).schema_url)
+        return summaries.page(upload_dir, 1, settings.RELEASES_OR_RECORDS_TABLE_LENGTH)["results"]
+
+
+def ocds_show_schema(key):
+    """Return the schema with which OCDS Show annotates the releases or records: the default version's schema."""
+    return SchemaOCDS(lib_cove_ocds_config=get_lib_cove_ocds_config(), record_pkg=key == "records")
+
+
+def _summaries_metadata(pk):
+    """Return the upload directory of the supplied data, and the metadata of its summaries, or raise a 404 error."""
+    try:
+        db_data = SuppliedData.objects.get(pk=pk)
+    except (SuppliedData.DoesNotExist, ValidationError):
+        raise Http404 from None
+
+    upload_dir = db_data.upload_dir()
+    metadata = summaries.read_metadata(upload_dir)
+    if metadata is None:
+        raise Http404
+    return upload_dir, metadata
+
+
+def explore_table(request, pk):
+    """
+    Return a page of the table of releases or records, as JSON.
+
+    Query string parameters:
+
+    page
+      The page number, starting at 1
+    sort
+      The column by which to sort, optionally prefixed by ``-`` to sort in descending order
+    ocid
+      Return only the releases or records whose OCID starts with this value
+    """
+    upload_dir, metadata = _summaries_metadata(pk)
+
+    try:
+        number = int(request.GET.get("page", "1"))
+    except ValueError:
+        number = 0
+    if number < 1:
+        return JsonResponse({"error": "page must be a positive integer"}, status=400)
+
+    sort = request.GET.get("sort", "")
+    descending = sort.startswith("-")
+    sort = sort.removeprefix("-") or None
+    if sort is not None and sort not in summaries.SORT_COLUMNS[metadata["key"]]:
+        return JsonResponse(
+            {"error": f"sort must be one of {', '.join(summaries.SORT_COLUMNS[metadata['key']])}"}, status=400
+        )
 
-    return render(request, template, context)
+    size = settings.RELEASES_OR_RECORDS_TABLE_LENGTH
+    data = summaries.page(upload_dir, number, size, sort, descending=descending, ocid=request.GET.get("ocid"))
+    if data is None:
+        raise Http404
 
+    if metadata["key"] == "releases":
+        for release in data["results"]:
+            release["date_display"] = _date_display(release.get("date"))
 
-# This should only be run when data is small.
-def ocds_show_data(json_data, ocds_show_deref_schema):
-    new_json_data = copy.deepcopy(json_data)
-    add_extra_fields(new_json_data, ocds_show_deref_schema)
-    return json.dumps(new_json_data, default=default)
+    return JsonResponse(
+        {
+            "release_or_record": metadata["key"][:-1],
+            "count": data["count"],
+            "page": number,
+            "num_pages": max(math.ceil(data["count"] / size), 1),
+            "results": data["results"],
+        }
+    )
+
+
+def explore_ocds_show(request, pk):
+    """
+    Return the releases or records with an OCID, or at a position, as a package for OCDS Show.
+
+    Each object in a release has an ``__extra`` member, containing its members that aren't in the schema. The response
+    is compressed once and stored in the upload directory. It is sent compressed, if the client accepts gzip, and can
+    be validated with its ETag.
+
+    If ``step`` is set, the releases in the record are compiled instead, once for all steps, and the response is the
+    compiled release at that step, with a patch to the compiled release at the previous step. See
+    :func:`cove_ocds.lib.ocds_show_extra.write_steps`.
+
+    Query string parameters:
+
+    ocid
+      The OCID of the releases or records
+    position
+      The position of the release or record in the package, if ``ocid`` isn't set
+    step
+      The position of a release in the record, in order of date (record packages only)
+    """
+    upload_dir, metadata = _summaries_metadata(pk)
+    key = metadata["key"]
+
+    if (ocid := request.GET.get("ocid")) is not None:
+        kwargs = {"ocid": ocid}
+    else:
+        try:
+            kwargs = {"position": int(request.GET["position"])}
+        except (KeyError, ValueError):
+            return JsonResponse({"error": "ocid or position must be set"}, status=400)
+
+    if (step := request.GET.get("step")) is not None:
+        try:
+            step = int(step)
+        except ValueError:
+            step = -1
+        if step < 0 or key != "records":
+            return JsonResponse({"error": "step must be a non-negative integer, for record packages"}, status=400)
+
+    # The metadata contain the URL of the schema, which was stored when the data was checked.
+    digest = hashlib.sha256(
+        json.dumps([metadata, kwargs, step is not None, ocds_show_extra.FORMAT], sort_keys=True).encode()
+    ).hexdigest()
+    etag = quote_etag(digest if step is None else f"{digest}-{step}")
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        path = os.path.join(upload_dir, "ocds_show", f"{digest}.json.gz")
+
+        if not os.path.exists(path):
+            with timing.phase("ocds_show"):
+                items = summaries.read(upload_dir, **kwargs)
+                if not items:
+                    raise Http404
+                fields = get_fields_index(schema_cache.get(ocds_show_schema(key)))
+                if step is None:
+                    ocds_show_extra.write_gzip(path, {key: items}, fields)
+                else:
+                    ocds_show_extra.write_steps(path, items[0], fields)
+
+        if step is None:
+            with open(path, "rb") as f:
+                content = f.read()
+        else:
+            with timing.phase("ocds_show"):
+                data = ocds_show_extra.read_step(path, step)
+            if data is None:
+                raise Http404
+            content = gzip.compress(json.dumps(data).encode())
+
+        if ACCEPTS_GZIP.search(request.headers.get("Accept-Encoding", "")):
+            response = HttpResponse(content, content_type="application/json")
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(gzip.decompress(content), content_type="application/json")
+        response.headers["ETag"] = etag
+
+    patch_vary_headers(response, ["Accept-Encoding"])
+    # The data is deleted after some days, so store it only privately, and revalidate it on each use.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def prometheus_metrics(request):
+    """Return the metrics of all processes, in the Prometheus text format, if ``METRICS_DATABASE_PATH`` is set."""
+    if not settings.METRICS_DATABASE_PATH:
+        raise Http404
+
+    gauges = {"cove_ocds_analyses_queued": Job.objects.filter(status=Job.Status.QUEUED).count()}
+    return HttpResponse(metrics.expose(gauges), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
-def default(self, obj):
-    if isinstance(obj, Decimal):
-        return float(obj)
-    return json.JSONEncoder().default(obj)
+def explore_error_locations(request, pk, error):
+    """
+    Return a page of the locations of a validation error, as JSON.
+
+    Query string parameters:
+
+    page
+      The page number, starting at 1
+    """
+    try:
+        db_data = SuppliedData.objects.get(pk=pk)
+    except (SuppliedData.DoesNotExist, ValidationError):
+        raise Http404 from None
+
+    try:
+        number = int(request.GET.get("page", "1"))
+    except ValueError:
+        number = 0
+    if number < 1:
+        return JsonResponse({"error": "page must be a positive integer"}, status=400)
+
+    size = settings.VALIDATION_ERROR_LOCATIONS_LENGTH
+    data = errors.locations(db_data.upload_dir(), int(error), number, size)
+    if data is None:
+        raise Http404
+
+    return JsonResponse(
+        {
+            "count": data["count"],
+            "page": number,
+            "num_pages": max(math.ceil(data["count"] / size), 1),
+            "results": data["results"],
+        }
+    )
+
+
+def _date_display(value):
+    # Like `release.date|to_datetime|date:"j M Y, H:i (e)"` in the template.
+    if not isinstance(value, str):
+        return ""
+    return date_filter(template_localtime(to_datetime(value)), "j M Y, H:i (e)")
+
+
+def is_stale(db_data, fingerprint):
+    """Return whether the files in the upload directory were written for a different fingerprint."""
+    stored = snapshot.read_fingerprint(db_data.upload_dir())
+    if stored is None:
+        # The upload was checked before fingerprints were stored.
+        return db_data.rendered
+    return stored != fingerprint
+
+
+def queue_conversion(db_data, schema_url, *, flatten=False, replace=False):
+    """
+    Queue the conversion of JSON data to a spreadsheet, if requested, or if it was converted using another schema.
+
+    If ``BACKGROUND_JOB_MIN_SIZE`` isn't set, no ``run_jobs`` workers are configured, so the data is converted now.
+
+    :param flatten: whether the user requested the conversion
+    :param replace: whether the files in the upload directory were written for a different schema
+    """
+    conversion = Conversion.objects.filter(supplied_data=db_data).first()
+    if conversion is not None:
+        conversion.expire()
+    if conversion is None:
+        # The data might have been converted before conversions were queued.
+        converted = os.path.exists(os.path.join(db_data.upload_dir(), "flattened.xlsx"))
+        if not (flatten or settings.CONVERT_AUTOMATICALLY or (replace and converted)):
+            return
+    elif not (replace or (flatten and conversion.status == Conversion.Status.FAILED)):
+        return
+
+    conversion = Conversion.enqueue(db_data, schema_url)
+    # If no run_jobs workers are configured, convert the data during the request.
+    if not settings.BACKGROUND_JOB_MIN_SIZE and conversion.start():
+        run_conversion(conversion)
+
+
+def conversion_context(db_data, lib_cove_ocds_config, schema_url=None, request=None):
+    """Return the context about the conversion of JSON data to a spreadsheet."""
+    conversion = Conversion.objects.filter(supplied_data=db_data).first()
+    if conversion is not None:
+        conversion.expire()
+        if conversion.pending:
+            return {"conversion": "converting", "conversion_task": conversion}
+        if conversion.status == Conversion.Status.FAILED:
+            return {"conversion": "flatten", "conversion_error": conversion.error}
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=FlattenToolWarning)
+
+        # This doesn't convert the data. It reads the results of a conversion, if any.
+        return convert_json(
+            db_data.upload_dir(),
+            db_data.upload_url(),
+            db_data.original_file.path,
+            lib_cove_ocds_config,
+            schema_url=schema_url,
+            replace=False,
+            request=request,
+            flatten=False,
+        )
+
+
+def run_conversion(conversion):
+    """Convert the JSON data of a conversion to a spreadsheet, and record its result."""
+    db_data = conversion.supplied_data
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=FlattenToolWarning)
+
+        try:
+            context = convert_json(
+                db_data.upload_dir(),
+                db_data.upload_url(),
+                db_data.original_file.path,
+                LibCoveOCDSConfig(settings.COVE_CONFIG),
+                schema_url=conversion.schema_url,
+                replace=True,
+                flatten=True,
+            )
+            # convert_json() logs and returns most errors.
+            error = context.get("conversion_error")
+        except Exception as err:
+            logger.exception("Conversion failed")
+            error = repr(err)
+
+    conversion.finish(error)
+    metrics.increment("cove_ocds_conversions_total", status=conversion.status)
+
+
+def analyze_supplied_data(pk, language, post_version_choice=None, flatten=None):
+    """
+    Run the ``analyze()`` function for supplied data, outside a request, and store its results.
+
+    Return the context of the error page (or ``None``) and the :class:`~cove_ocds.lib.timing.Timings` of the phases.
+    """
+    db_data = SuppliedData.objects.get(pk=pk)
+    context = {
+        "file_type": get_file_type(db_data.original_file),
+        "original_file": {"size": db_data.original_file.size},
+    }
+
+    error = None
+    with translation.override(language), timing.record() as timings:
+        try:
+            analyze(context, db_data, post_version_choice=post_version_choice, flatten=flatten)
+        except Exception as err:  # noqa: BLE001 # the error page is rendered instead of a server error
+            error = job_error_context(err)
+
+    return error, timings
+
+
+def run_job(job):
+    """Run the ``analyze()`` function for a job, and record its result."""
+    with metrics.in_progress():
+        error, timings = analyze_supplied_data(
+            job.supplied_data_id, job.language, post_version_choice=job.version or None, flatten=job.flatten
+        )
+
+    job.finish(error)
+    metrics.observe_timings(timings, "job")
+
+
+def job_error_context(err):
+    """Return the context of the error page for an exception, like lib-cove-web's ``cove_web_input_error``."""
+    context = {
+        "sub_title": _("Sorry, we can't process that data"),
+        "link": "index",
+        "link_text": _("Try Again"),
+    }
+    if isinstance(err, CoveInputDataError) and not hasattr(err, "wrapped_err"):
+        context.update(err.context)
+    elif isinstance(err, CoveInputDataError):
+        context["msg"] = _(
+            "We think you tried to supply a spreadsheet, but we failed to convert it.\n\nError message: {}"
+        ).format(repr(err.wrapped_err))
+    elif isinstance(err, BadlyFormedJSONError):
+        context["msg"] = _(
+            "We think you tried to upload a JSON file, but it is not well formed JSON.\n\nError message: {}"
+        ).format(err)
+    elif isinstance(err, UnrecognisedFileType):
+        context["msg"] = _("We did not recognise the file type.\n\nWe can only process json, csv, ods and xlsx files.")
+    else:
+        logger.error("Job failed", exc_info=err)
+        context["msg"] = _("An error occurred while processing the data.\n\nError message: {}").format(err)
+
+    msg_safe = isinstance(context["msg"], SafeData)
+    # The context is stored as JSON.
+    context = {key: str(value) for key, value in context.items()}
+    context["msg_safe"] = msg_safe
+    context["support_email"] = settings.COVE_CONFIG.get("support_email")
+    return context
+
+
+# The async variants of the views that read files, query the database or download data, but don't analyze data.
+data_input_async = offload.threaded(data_input)
+explore_table_async = offload.threaded(explore_table)
+explore_ocds_show_async = offload.threaded(explore_ocds_show)
+explore_error_locations_async = offload.threaded(explore_error_locations)
@@ -0,0 +1,139 @@
+import json
+import os
+from unittest.mock import patch
+
+import libcove.lib.common as cove_common
+import pytest
+from django.core.management import CommandError, call_command
+from libcoveocds.schema import SchemaOCDS
+
+from cove_ocds.lib import benchmark, synthetic
+
+METRICS_EXT = (
+    "https://raw.githubusercontent.com/open-contracting-extensions/ocds_metrics_extension/master/extension.json"
+)
+
+
+def test_synthetic_package(tmp_path):
+    path = tmp_path / "package.json"
+    synthetic.write_package(path, 7)
+
+    with open(path) as f:
+        package = json.load(f)
+
+    assert package["version"] == "1.1"
+    assert [release["id"] for release in package["releases"]] == [
+        *(f"ocds-example-1-{i}" for i in range(1, 6)),
+        "ocds-example-2-1",
+        "ocds-example-2-2",
+    ]
+
+    synthetic.write_package(path, 2, records=True)
+
+    with open(path) as f:
+        package = json.load(f)
+
+    assert [record["ocid"] for record in package["records"]] == ["ocds-example-1", "ocds-example-2"]
+    assert len(package["records"][1]["releases"]) == synthetic.RELEASES_PER_OCID
+
+
+@pytest.mark.parametrize("depth", range(synthetic.MAX_DEPTH + 1))
+def test_synthetic_package_valid(tmp_path, depth):
+    path = tmp_path / "package.json"
+    synthetic.write_package(path, 10, depth=depth, string_length=50)
+
+    with open(path) as f:
+        package = json.load(f)
+
+    if depth:
+        assert len(package["releases"][0]["tender"]["title"]) == 50
+    else:
+        assert "tender" not in package["releases"][0]
+    assert cove_common.get_schema_validation_errors(package, SchemaOCDS(), "-", {}, {}) == {}
+
+
+def test_synthetic_package_options(tmp_path):
+    generator = synthetic.Generator(duplicate_rate=1)
+
+    assert [generator.release(i)["id"] for i in range(3)] == [
+        "ocds-example-1-1",
+        "ocds-example-1-1",
+        "ocds-example-1-2",
+    ]
+
+    generator = synthetic.Generator(depth=synthetic.MAX_DEPTH, duplicate_rate=1, error_rate=1, seed=1)
+
+    assert generator.release(3) == generator.release(3)
+    assert generator.release(3) != synthetic.Generator(depth=synthetic.MAX_DEPTH, error_rate=1, seed=2).release(3)
+
+    package = {"version": "1.1", "releases": [generator.release(i) for i in range(20)]}
+    assert cove_common.get_schema_validation_errors(package, SchemaOCDS(), "-", {}, {})
+
+    record = generator.record(1)
+    assert record["ocid"] == "ocds-example-1"
+    assert record["compiledRelease"]["tag"] == ["compiled"]
+
+    path = tmp_path / "package.json"
+    call_command("generate_package", path, "--size", "3", "--records", "--extension", METRICS_EXT, "--seed", "1")
+
+    with open(path) as f:
+        package = json.load(f)
+
+    assert package["extensions"] == [METRICS_EXT]
+    assert [record["ocid"] for record in package["records"]] == [f"ocds-example-{i}" for i in range(1, 4)]
+    assert package["records"][0]["compiledRelease"]["tender"]["id"] == "ocds-example-1-tender"
+
+
+@pytest.mark.django_db
+def test_benchmark(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    call_command(
+        "benchmark",
+        *("--size", "20", "--phase", "parse", "checks", "render", "--directory", str(tmp_path)),
+        *("--output", str(output)),
+    )
+
+    with open(output) as f:
+        data = json.load(f)
+
+    assert list(data["results"]["20"]) == ["parse", "checks", "render"]
+    assert data["results"]["20"]["checks"]["seconds"] > 0
+    assert data["results"]["20"]["checks"]["peak_rss"] > 0
+    assert data["results"]["20"]["checks"]["allocated"] > 0
+    assert " checks " in capsys.readouterr().out
+    # The generated package is reused.
+    assert os.path.exists(tmp_path / "releases-20.json")
+
+    for measurements in data["results"]["20"].values():
+        for metric in benchmark.METRICS:
+            measurements[metric] *= 10
+    with open(output, "w") as f:
+        json.dump(data, f)
+
+    call_command(
+        "benchmark", *("--size", "20", "--phase", "parse", "--directory", str(tmp_path), "--baseline", output)
+    )
+
+    assert "No regressions" in capsys.readouterr().out
+
+    for measurements in data["results"]["20"].values():
+        measurements["seconds"] = 0
+    with open(output, "w") as f:
+        json.dump(data, f)
+
+    with pytest.raises(CommandError, match="regressed"), patch("time.perf_counter", side_effect=[0, 1]):
+        call_command(
+            "benchmark", *("--size", "20", "--phase", "parse", "--directory", str(tmp_path), "--baseline", output)
+        )
+
+
+def test_benchmark_compare():
+    baseline = {"1000": {"parse": {"seconds": 1.0, "peak_rss": 2**30, "allocated": None}}}
+
+    assert benchmark.compare({"1000": {"parse": {"seconds": 1.1, "peak_rss": 2**30}}}, baseline, 0.2) == []
+    assert benchmark.compare({"1000": {"parse": {"seconds": 1.3, "allocated": 2**30}}}, baseline, 0.2) == [
+        ("1000", "parse", "seconds", 1.0, 1.3)
+    ]
+    # Differences within the noise aren't regressions.
+    assert benchmark.compare({"1000": {"parse": {"seconds": 0.04}}}, {"1000": {"parse": {"seconds": 0.01}}}, 0.2) == []
+    assert benchmark.compare({"10": {"parse": {"seconds": 2.0}}}, baseline, 0.2) == []
@@ -0,0 +1,116 @@
+import io
+import json
+import zipfile
+from unittest.mock import patch
+
+import libcove.lib.common as cove_common
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+
+from cove_ocds.lib import bundle
+from cove_ocds.lib.schema import SchemaOCDS as LocalSchemaOCDS
+
+
+def fetch_standard(url):
+    """Return the contents of a URL of a small, fake standard."""
+    tag = "1__0__3" if "1__0__3" in url or "/1.0/" in url else "1__1__5"
+    base_url = f"https://standard.open-contracting.org/schema/{tag}/"
+    schemas = {
+        "release-schema.json": {
+            "$schema": "http://json-schema.org/draft-04/schema#",
+            "type": "object",
+            "required": ["ocid", "id"],
+            "properties": {
+                "ocid": {"type": "string", "title": url},
+                "id": {"type": "string"},
+                "tag": {"type": "array", "items": {"type": "string"}, "codelist": "releaseTag.csv"},
+            },
+        },
+        "versioned-release-validation-schema.json": {
+            "$schema": "http://json-schema.org/draft-04/schema#",
+            "type": "object",
+            "properties": {"ocid": {"type": "string"}},
+        },
+        "release-package-schema.json": {
+            "$schema": "http://json-schema.org/draft-04/schema#",
+            "type": "object",
+            "properties": {"releases": {"type": "array", "items": {"$ref": f"{base_url}release-schema.json"}}},
+        },
+        "record-package-schema.json": {
+            "$schema": "http://json-schema.org/draft-04/schema#",
+            "type": "object",
+            "properties": {"records": {"type": "array", "items": {"$ref": "#/definitions/record"}}},
+            "definitions": {
+                "record": {
+                    "type": "object",
+                    "properties": {
+                        "compiledRelease": {"$ref": f"{base_url}release-schema.json"},
+                        "releases": {
+                            "oneOf": [{"type": "array"}, {"items": {"$ref": f"{base_url}release-schema.json"}}]
+                        },
+                        "versionedRelease": {"$ref": f"{base_url}versioned-release-validation-schema.json"},
+                    },
+                }
+            },
+        },
+    }
+
+    if not url.startswith(bundle.STANDARD_ZIP_URL.format(tag="")):
+        return json.dumps(schemas[url.rsplit("/", 1)[1]]).encode()
+
+    buffer = io.BytesIO()
+    prefix = f"standard-{tag}/{'standard/' if tag == '1__0__3' else ''}schema/"
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr(f"standard-{tag}/", "")
+        for name, schema in schemas.items():
+            z.writestr(f"{prefix}{name}", json.dumps(schema))
+        z.writestr(f"{prefix}codelists/releaseTag.csv", "Code\ntender\n")
+    return buffer.getvalue()
+
+
+def test_schema_bundle(settings, tmp_path):
+    directory = tmp_path / "bundle"
+
+    with patch("cove_ocds.lib.bundle.get", fetch_standard):
+        call_command("build_schema_bundle", directory, stdout=io.StringIO())
+
+    manifest = bundle.read_manifest(str(directory))
+    assert manifest["standard"] == {"1__0__3": "standard/1__0__3.zip", "1__1__5": "standard/1__1__5.zip"}
+    assert manifest["files"]["https://standard.open-contracting.org/1.1/es/release-schema.json"] == (
+        "1.1/es/release-schema.json"
+    )
+
+    settings.SCHEMA_BUNDLE_DIR = str(directory)
+
+    schema = LocalSchemaOCDS(select_version="1.1", record_pkg=True)
+    assert schema.schema_url == str(directory / "1.1" / "en" / "release-schema.json")
+    assert schema.pkg_schema_url == "https://standard.open-contracting.org/1.1/en/record-package-schema.json"
+    assert set(schema.get_schema_obj()["properties"]) == {"ocid", "id", "tag"}
+
+    # The package schema's $ref URLs are read from the bundle.
+    record = schema.get_pkg_schema_obj(deref=True)["definitions"]["record"]
+    assert record["properties"]["versionedRelease"]["properties"] == {"ocid": {"type": "string"}}
+
+    # The codelists are read from the bundle.
+    schema.process_codelists()
+    assert schema.core_codelists == {"releaseTag.csv": {"tender"}}
+
+    data = {"records": [{"compiledRelease": {"ocid": "ocds-213czf-1", "tag": ["tender"]}}]}
+    assert [
+        json.loads(key)["message"] for key in cove_common.get_schema_validation_errors(data, schema, "-", {}, {})
+    ] == ["'id' is missing but required within 'compiledRelease'"]
+
+    # The release package schema, which Flatten Tool reads, embeds the release schema.
+    path = bundle.local_path("https://standard.open-contracting.org/1.0/es/release-package-schema.json")
+    with open(path) as f:
+        assert json.load(f)["properties"]["releases"]["items"]["properties"]["ocid"]["title"] == (
+            "https://standard.open-contracting.org/1.0/es/release-schema.json"
+        )
+
+    with pytest.raises(ImproperlyConfigured):
+        bundle.local_path("https://standard.open-contracting.org/1.1/fr/release-schema.json")
+
+    settings.SCHEMA_BUNDLE_DIR = str(tmp_path / "missing")
+    with pytest.raises(ImproperlyConfigured):
+        LocalSchemaOCDS()
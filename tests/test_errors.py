@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.uploadedfile import UploadedFile
+from django.urls import reverse
+
+from cove_ocds.lib import errors
+
+
+@pytest.mark.django_db
+def test_explore_error_locations(client, settings):
+    settings.VALIDATION_ERROR_LOCATIONS_LENGTH = 400
+
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "1001_empty_releases.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+
+    grouped = resp.context["validation_errors_grouped"]
+    item = grouped["required"][0]
+    assert item["error"]["path_no_number"] == "releases"
+    assert item["count"] == 1001
+    assert item["examples"] == [{"path": f"releases/{i}"} for i in range(3)]
+    # The locations aren't rendered into the page.
+    assert b"releases/3" not in resp.content
+
+    url = reverse("explore_error_locations", args=(data.pk, item["id"]))
+
+    content = client.get(url, {"page": "3"}).json()
+    assert content["count"] == 1001
+    assert content["num_pages"] == 3
+    assert [value["path"] for value in content["results"]] == [f"releases/{i}" for i in range(800, 1001)]
+
+    assert client.get(url, {"page": "0"}).status_code == 400
+    assert client.get(reverse("explore_error_locations", args=(data.pk, 1000))).status_code == 404
+
+
+def test_errors(tmp_path):
+    validation_errors = [
+        (json.dumps({"message_type": "required", "path_no_number": "releases/id"}), [{"path": "releases/0/id"}] * 5),
+        (json.dumps({"message_type": "date-time", "path_no_number": "releases/date"}), [{"path": "releases/0/date"}]),
+        (json.dumps({"message_type": "enum", "error_id": "x"}), [{"path": "releases/0/tag", "value": "x"}]),
+    ]
+
+    grouped = errors.write(tmp_path, validation_errors, {"file": "abc"})
+
+    assert errors.read_metadata(tmp_path) == {"format": errors.FORMAT, "fingerprint": {"file": "abc"}}
+    assert errors.groups(tmp_path) == grouped
+    assert errors.write(tmp_path, validation_errors, {"file": "abc"}) == grouped
+    assert [[item["id"] for item in grouped[name]] for name in errors.CATEGORIES] == [[1], [2], [3]]
+    assert grouped["required"][0]["count"] == 5
+    assert grouped["required"][0]["examples"] == [{"path": "releases/0/id"}] * 3
+    assert grouped["other"][0]["error"] == {"message_type": "enum", "error_id": "x"}
+    assert errors.locations(tmp_path, 1, 2, 2) == {"count": 5, "results": [{"path": "releases/0/id"}] * 2}
+    assert errors.locations(tmp_path, 4, 1, 2) is None
+    assert errors.groups(tmp_path / "missing") is None
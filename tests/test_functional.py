@@ -86,7 +86,7 @@ def test_modal_additional_checks_error(submit_url, filename):
 @pytest.mark.skipif(REMOTE, reason="Depends on VALIDATION_ERROR_LOCATIONS_LENGTH = 1000")
 def test_modal_error_list_1001(submit_url):
     """
-    When there are more than 1000 error locations, the first 1000 are shown in the table, and there is a message.
+    When there are more than 1000 error locations, the first 1000 are shown in the table, and the rest on another page.
     """
     page = submit_url("1001_empty_releases.json")
 
@@ -94,19 +94,26 @@ def test_modal_error_list_1001(submit_url):
 
     page.click("text=1001")
     modal_body = page.locator(".modal-body").first
+    modal_body.locator("table tbody tr").first.wait_for()
     modal_text = modal_body.text_content()
 
     assert modal_body.locator("table tbody tr").count() == 1000
-    assert "first 1000 locations for this error" in modal_text
+    assert "Page 1 of 2" in modal_text
     assert "releases/999" in modal_text
     assert "releases/1000" not in modal_text
 
+    modal_body.locator(".next a").click()
+    page.wait_for_function("document.querySelector('.modal-body').textContent.includes('Page 2 of 2')")
+
+    assert modal_body.locator("table tbody tr").count() == 1
+    assert "releases/1000" in modal_body.text_content()
+
 
 @override_settings(VALIDATION_ERROR_LOCATIONS_LENGTH=1000)
 @pytest.mark.skipif(REMOTE, reason="Depends on VALIDATION_ERROR_LOCATIONS_LENGTH = 1000")
 def test_modal_error_list_999(submit_url):
     """
-    When there are less than 1000 error locations, they are all shown in the table, and there is no message.
+    When there are less than 1000 error locations, they are all shown in the table, and there is no pager.
     """
     page = submit_url("999_empty_releases.json")
 
@@ -114,10 +121,11 @@ def test_modal_error_list_999(submit_url):
 
     page.click("text=999")
     modal_body = page.locator(".modal-body").first
+    modal_body.locator("table tbody tr").first.wait_for()
     modal_text = modal_body.text_content()
 
     assert modal_body.locator("table tbody tr").count() == 999
-    assert "first 999 locations for this error" not in modal_text
+    assert not modal_body.locator(".pager").is_visible()
     assert "releases/998" in modal_text
     assert "releases/999" not in modal_text
 
@@ -129,7 +137,8 @@ def test_modal_error_list_999(submit_url):
 )
 def test_modal_error_list_1001_sample(submit_url):
     """
-    When there are more than 1000 error locations, a random 1000 are shown in the table, and there is a message.
+    When there are more than 1000 error locations, sampling doesn't apply: the first 1000 are shown in the table, and
+    the rest on another page.
     """
     page = submit_url("1001_empty_releases.json")
 
@@ -137,10 +146,19 @@ def test_modal_error_list_1001_sample(submit_url):
 
     page.click("text=1001")
     modal_body = page.locator(".modal-body").first
+    modal_body.locator("table tbody tr").first.wait_for()
     modal_text = modal_body.text_content()
 
     assert modal_body.locator("table tbody tr").count() == 1000
-    assert "random 1000 locations for this error" in modal_text
+    assert "random 1000 locations for this error" not in modal_text
+    assert "Page 1 of 2" in modal_text
+    assert "releases/999" in modal_text
+
+    modal_body.locator(".next a").click()
+    page.wait_for_function("document.querySelector('.modal-body').textContent.includes('Page 2 of 2')")
+
+    assert modal_body.locator("table tbody tr").count() == 1
+    assert "releases/1000" in modal_body.text_content()
 
 
 @override_settings(VALIDATION_ERROR_LOCATIONS_LENGTH=1000, VALIDATION_ERROR_LOCATIONS_SAMPLE=True)
@@ -150,7 +168,7 @@ def test_modal_error_list_1001_sample(submit_url):
 )
 def test_modal_error_list_999_sample(submit_url):
     """
-    When there are less than 1000 error locations, they are all shown in the table, and there is no message.
+    When there are less than 1000 error locations, they are all shown in the table, and there is no pager.
     """
     page = submit_url("999_empty_releases.json")
 
@@ -158,14 +176,49 @@ def test_modal_error_list_999_sample(submit_url):
 
     page.click("text=999")
     modal_body = page.locator(".modal-body").first
+    modal_body.locator("table tbody tr").first.wait_for()
     modal_text = modal_body.text_content()
 
     assert modal_body.locator("table tbody tr").count() == 999
-    assert "first 999 locations for this error" not in modal_text
+    assert not modal_body.locator(".pager").is_visible()
     assert "releases/998" in modal_text
     assert "releases/999" not in modal_text
 
 
+@override_settings(VALIDATION_ERROR_LOCATIONS_LENGTH=400)
+@pytest.mark.skipif(REMOTE, reason="Depends on VALIDATION_ERROR_LOCATIONS_LENGTH = 400")
+def test_modal_error_list_pages(submit_url):
+    """
+    When there are more error locations than fit on a page, the pager moves between the pages of locations.
+    """
+    page = submit_url("999_empty_releases.json")
+
+    page.click("text=999")
+    modal_body = page.locator(".modal-body").first
+    modal_body.locator("table tbody tr").first.wait_for()
+    pager = modal_body.locator(".pager")
+
+    assert pager.is_visible()
+    assert "Page 1 of 3" in pager.text_content()
+    assert "disabled" in pager.locator(".previous").get_attribute("class")
+    assert modal_body.locator("table tbody tr").count() == 400
+
+    for number, count in ((2, 400), (3, 199)):
+        pager.locator(".next a").click()
+        page.wait_for_function(f"document.querySelector('.modal-body').textContent.includes('Page {number} of 3')")
+        assert modal_body.locator("table tbody tr").count() == count
+
+    assert "releases/998" in modal_body.text_content()
+    assert "disabled" in pager.locator(".next").get_attribute("class")
+
+    pager.locator(".previous a").click()
+    page.wait_for_function("document.querySelector('.modal-body').textContent.includes('Page 2 of 3')")
+
+    assert modal_body.locator("table tbody tr").count() == 400
+    assert "releases/400" in modal_body.text_content()
+    assert "releases/800" not in modal_body.text_content()
+
+
 @pytest.mark.parametrize(
     ("filename", "english", "spanish"),
     [
@@ -9,11 +9,13 @@ import pytest
 from cove.input.models import SuppliedData
 from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import UploadedFile
+from django.core.management import call_command
 from libcove.lib.converters import convert_json, convert_spreadsheet
 from libcoveocds.api import ocds_json_output
 from libcoveocds.exceptions import OCDSVersionError
 from libcoveocds.schema import SchemaOCDS
 
+from cove_ocds.models import Conversion
 from tests import DEFAULT_SCHEMA_VERSION
 
 METRICS_EXT = (
@@ -187,7 +189,25 @@ def test_explore_page(client, json_data):
 
 
 @pytest.mark.django_db
-def test_explore_page_convert(client):
+@patch("cove_ocds.views.convert_json", return_value={"conversion": "flattened"})
+def test_explore_page_convert_inline(mock_object, client):
+    data = SuppliedData.objects.create()
+    data.original_file.save("test.json", ContentFile('{"releases":[]}'))
+
+    # No run_jobs workers are configured, so the data is converted during the request.
+    resp = client.post(data.get_absolute_url(), {"flatten": "true"})
+
+    assert resp.status_code == 200
+    assert resp.context["conversion"] == "flattened"
+    assert any(kwargs["flatten"] is True for _, kwargs in mock_object.call_args_list)
+    assert Conversion.objects.get(supplied_data=data).status == Conversion.Status.COMPLETED
+
+
+@pytest.mark.django_db
+def test_explore_page_convert(client, settings):
+    # run_jobs workers are configured.
+    settings.BACKGROUND_JOB_MIN_SIZE = 10485760
+
     data = SuppliedData.objects.create()
     data.original_file.save("test.json", ContentFile('{"releases":[]}'))
     data.current_app = "cove_ocds"
@@ -197,6 +217,13 @@ def test_explore_page_convert(client):
 
     resp = client.post(data.get_absolute_url(), {"flatten": "true"})
     assert resp.status_code == 200
+    assert resp.context["conversion"] == "converting"
+    assert b"Your data is being converted to a spreadsheet." in resp.content
+
+    call_command("run_jobs", "--burst")
+
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
     assert resp.context["conversion"] == "flatten"
     assert "converted_file_size" in resp.context
     assert "converted_file_size_titles" not in resp.context
@@ -355,7 +382,10 @@ def test_explore_schema_version_change(client, file_type, converter, replace_aft
 
 @pytest.mark.django_db
 @patch("cove_ocds.views.convert_json", side_effect=convert_json, autospec=True)
-def test_explore_schema_version_change_with_json_to_xlsx(mock_object, client):
+def test_explore_schema_version_change_with_json_to_xlsx(mock_object, client, settings):
+    # run_jobs workers are configured.
+    settings.BACKGROUND_JOB_MIN_SIZE = 10485760
+
     data = SuppliedData.objects.create()
     with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases.json")) as fp:
         data.original_file.save("test.json", UploadedFile(fp))
@@ -365,40 +395,47 @@ def test_explore_schema_version_change_with_json_to_xlsx(mock_object, client):
     args, kwargs = mock_object.call_args
     assert resp.status_code == 200
     assert "/1.0/" in kwargs["schema_url"]
-    assert kwargs["replace"] is False
+    assert kwargs["flatten"] is False
     mock_object.reset_mock()
 
+    # Don't convert if the data hasn't been converted.
     resp = client.post(data.get_absolute_url(), {"version": "1.1"})
     args, kwargs = mock_object.call_args
     assert resp.status_code == 200
-    assert kwargs["replace"] is False
+    assert kwargs["flatten"] is False
+    assert not Conversion.objects.exists()
     mock_object.reset_mock()
 
-    # Convert to spreadsheet
+    # Convert to spreadsheet, in the background.
     resp = client.post(data.get_absolute_url(), {"flatten": "true"})
-    assert kwargs["replace"] is False
-    mock_object.reset_mock()
+    assert resp.context["conversion"] == "converting"
+    assert not mock_object.called
 
-    # Do replace with version change now that it's been converted once
-    resp = client.post(data.get_absolute_url(), {"version": "1.0"})
+    call_command("run_jobs", "--burst")
     args, kwargs = mock_object.call_args
-    assert resp.status_code == 200
-    assert kwargs["replace"] is True
+    assert "/1.1/" in kwargs["schema_url"]
+    assert kwargs["flatten"] is True
     mock_object.reset_mock()
 
-    # Do not replace if the version does not changed
+    # Convert again with version change now that it's been converted once.
     resp = client.post(data.get_absolute_url(), {"version": "1.0"})
-    args, kwargs = mock_object.call_args
     assert resp.status_code == 200
-    assert kwargs["replace"] is False
-    mock_object.reset_mock()
+    assert resp.context["conversion"] == "converting"
 
-    resp = client.post(data.get_absolute_url(), {"version": "1.1"})
+    call_command("run_jobs", "--burst")
     args, kwargs = mock_object.call_args
-    assert resp.status_code == 200
+    assert "/1.0/" in kwargs["schema_url"]
     assert kwargs["replace"] is True
     mock_object.reset_mock()
 
+    # Don't convert again if the version doesn't change.
+    resp = client.post(data.get_absolute_url(), {"version": "1.0"})
+    args, kwargs = mock_object.call_args
+    assert resp.status_code == 200
+    assert resp.context["conversion"] == "flatten"
+    assert kwargs["flatten"] is False
+    assert Conversion.objects.get(supplied_data=data).status == Conversion.Status.COMPLETED
+
 
 @pytest.mark.django_db
 def test_data_supplied_schema_version(client):
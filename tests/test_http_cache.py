@@ -0,0 +1,233 @@
+import http.server
+import json
+import threading
+import time
+
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.base import ContentFile
+
+from cove_ocds.lib.schema import CacheInfo, prefetch, prefetched, schema_cache
+from cove_ocds.lib.schema import SchemaOCDS as LocalSchemaOCDS
+from cove_ocds.views import get_lib_cove_ocds_config
+
+
+class ExtensionHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serve extensions' files with an ETag, and record each request's path and If-None-Match header.
+
+    Also record the maximum number of concurrent requests.
+    """
+
+    files = {
+        "/colour/extension.json": {
+            "name": {"en": "Colour"},
+            "description": {"en": "Adds a colour field."},
+            "schemas": ["release-schema.json"],
+            "codelists": ["colour.csv"],
+        },
+        "/colour/release-schema.json": {"properties": {"colour": {"type": "string", "codelist": "colour.csv"}}},
+        "/colour/codelists/colour.csv": "Code\nred\n",
+        "/size/extension.json": {
+            "name": {"en": "Size"},
+            "description": {"en": "Adds a size field."},
+            "codelists": ["size.csv", "missing.csv"],
+        },
+        "/size/release-schema.json": {"properties": {"size": {"type": "string"}, "colour": {"type": "integer"}}},
+        "/size/codelists/size.csv": "Code\nsmall\n",
+        "/invalid/extension.json": {"name": {"en": "Invalid"}, "description": {"en": "Has an invalid patch."}},
+        "/invalid/release-schema.json": "{",
+    }
+    requests = []
+    delay = 0
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests.append((self.path, self.headers.get("If-None-Match")))
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(cls.delay)
+        with cls.lock:
+            cls.active -= 1
+
+        if self.path not in self.files:
+            self.send_error(404)
+            return
+
+        content = self.files[self.path]
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        etag = f'"{hash(content)}"'
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def extension_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ExtensionHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    ExtensionHandler.requests = []
+    ExtensionHandler.max_active = 0
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_extension_cache(settings, tmp_path, extension_server):
+    def check():
+        schema = LocalSchemaOCDS(
+            select_version="1.1", package_data={"extensions": [f"{extension_server}colour/extension.json"]}
+        )
+        assert "colour" in schema.get_schema_obj()["properties"]
+        schema.process_codelists()
+        assert schema.extended_codelists["colour.csv"] == {"red"}
+
+        # The paths of the requests, and whether the requests are conditional.
+        requests = {(path, etag is not None) for path, etag in ExtensionHandler.requests}
+        ExtensionHandler.requests.clear()
+        return requests
+
+    paths = ("/colour/extension.json", "/colour/release-schema.json", "/colour/codelists/colour.csv")
+
+    settings.EXTENSION_CACHE_PATH = str(tmp_path / "cache.sqlite")
+    assert check() == {(path, False) for path in paths}
+    # Repeat extensions add no requests.
+    assert check() == set()
+
+    # Expired responses are revalidated.
+    settings.EXTENSION_CACHE_PATH = str(tmp_path / "revalidate.sqlite")
+    settings.EXTENSION_CACHE_EXPIRE_AFTER = 0
+    assert {path for path, conditional in check() if not conditional} == set(paths)
+    assert check() == {(path, True) for path in paths}
+
+    # Responses are read from the database, as by another process.
+    settings.EXTENSION_CACHE_PATH = str(tmp_path / "cache.sqlite")
+    settings.EXTENSION_CACHE_EXPIRE_AFTER = 3600
+    assert check() == set()
+
+    # Without a database, responses are kept in memory.
+    settings.EXTENSION_CACHE_PATH = None
+    assert check() == {(path, False) for path in paths}
+    assert check() == set()
+
+
+def test_extension_prefetch(settings, tmp_path, extension_server):
+    def check(threads):
+        settings.EXTENSION_FETCH_THREADS = threads
+        # Use a new database, so that all files are requested.
+        settings.EXTENSION_CACHE_PATH = str(tmp_path / f"{threads}.sqlite")
+        ExtensionHandler.max_active = 0
+
+        schema = LocalSchemaOCDS(
+            select_version="1.1",
+            package_data={
+                "extensions": [
+                    f"{extension_server}colour/extension.json",
+                    f"{extension_server}absent/extension.json",
+                    f"{extension_server}size/extension.json",
+                    f"{extension_server}invalid/extension.json",
+                ]
+            },
+        )
+        release_schema = schema.get_schema_obj()
+        schema.process_codelists()
+        return (
+            ExtensionHandler.max_active,
+            release_schema["properties"],
+            schema.extensions,
+            schema.invalid_extension,
+            schema.extended_codelists,
+        )
+
+    ExtensionHandler.delay = 0.05
+    try:
+        sequential = check(1)
+        concurrent = check(8)
+    finally:
+        ExtensionHandler.delay = 0
+
+    assert sequential[0] == 1
+    assert concurrent[0] > 1
+    # The patches are merged, and the errors are reported, in the same order.
+    assert list(concurrent[1]) == list(sequential[1])
+    assert concurrent[1:] == sequential[1:]
+
+    assert concurrent[1]["colour"] == {"type": "integer", "codelist": "colour.csv"}
+    assert concurrent[2][f"{extension_server}size/extension.json"]["failed_codelists"] == {
+        "missing.csv": "404: Not Found"
+    }
+    assert concurrent[3] == {
+        f"{extension_server}absent/extension.json": "404: not found",
+        f"{extension_server}invalid/extension.json": "release schema patch is not valid JSON",
+    }
+    assert concurrent[4]["colour.csv"] == {"red"}
+    assert concurrent[4]["size.csv"] == {"small"}
+
+
+@pytest.mark.django_db
+def test_explore_prefetch(client, settings, tmp_path, extension_server):
+    settings.EXTENSION_CACHE_PATH = str(tmp_path / "cache.sqlite")
+    schema_cache.cache_clear()
+
+    extensions = [f"{extension_server}colour/extension.json", f"{extension_server}size/extension.json"]
+    data = {"version": "1.1", "extensions": extensions, "releases": [{"ocid": "ocds-213czf-1", "colour": 1}]}
+    path = tmp_path / "test.json"
+    path.write_text(json.dumps(data))
+    config = get_lib_cove_ocds_config()
+
+    schema = prefetch(path, None, config).result()
+    assert list(schema.extensions) == extensions
+    assert schema.get_schema_obj()["properties"]["colour"] == {"type": "integer", "codelist": "colour.csv"}
+
+    cached = schema_cache.get(LocalSchemaOCDS(package_data=data, lib_cove_ocds_config=config), prefetched=schema)
+    assert cached.shared is schema
+    assert schema_cache.cache_info().misses == 1
+
+    # An equivalent instance is cached.
+    assert prefetch(path, None, config).result() is None
+    schema_cache.cache_clear()
+
+    # Each file is requested once, as the page reuses the prefetched schema.
+    ExtensionHandler.requests.clear()
+    supplied_data = SuppliedData.objects.create()
+    supplied_data.original_file.save("test.json", ContentFile(json.dumps(data)))
+    response = client.get(supplied_data.get_absolute_url())
+
+    assert response.status_code == 200
+    assert "Colour" in response.content.decode()
+    assert schema_cache.cache_info() == CacheInfo(hits=0, misses=1, maxsize=settings.SCHEMA_CACHE_SIZE, currsize=1)
+    # Failed requests are repeated, so that lib-cove-ocds reports the errors.
+    paths = [path for path, _ in ExtensionHandler.requests if path != "/size/codelists/missing.csv"]
+    assert len(paths) == len(set(paths))
+
+    # The prefetched schema isn't used if the package type differs.
+    schema_cache.cache_clear()
+    path.write_text(json.dumps({"extensions": extensions, "releases": [], "records": []}))
+    schema = prefetch(path, None, config).result()
+    assert schema.package_schema_name == "release-package-schema.json"
+    record_package = {"extensions": extensions, "records": []}
+    cached = schema_cache.get(
+        LocalSchemaOCDS(package_data=record_package, lib_cove_ocds_config=config, record_pkg=True), schema
+    )
+    assert cached.shared is not schema
+
+    settings.SCHEMA_PREFETCH_THREADS = 0
+    assert prefetch(path, None, config) is None
+    assert prefetched(None) is None
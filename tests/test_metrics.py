@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import subprocess
+import time
+
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+
+from cove_ocds.lib import metrics
+
+
+@pytest.mark.django_db
+def test_metrics(client, settings, tmp_path):
+    settings.METRICS_DATABASE_PATH = str(tmp_path / "metrics.sqlite3")
+    settings.MIDDLEWARE = ("cove_ocds.middleware.MetricsMiddleware", *settings.MIDDLEWARE)
+
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases_invalid.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+    assert client.get(data.get_absolute_url()).status_code == 200
+
+    settings.BACKGROUND_JOB_MIN_SIZE = 1
+    queued = SuppliedData.objects.create()
+    queued.original_file.save("test.json", ContentFile('{"releases": []}'))
+    client.get(queued.get_absolute_url())
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp["Content-Type"].startswith("text/plain; version=0.0.4")
+    lines = resp.content.decode().splitlines()
+
+    assert "# TYPE cove_ocds_upload_size_bytes histogram" in lines
+    assert f"cove_ocds_upload_size_bytes_sum {float(data.original_file.size)}" in lines
+    assert 'cove_ocds_upload_size_bytes_bucket{le="1000.0"} 0.0' in lines
+    assert 'cove_ocds_upload_size_bytes_bucket{le="+Inf"} 1.0' in lines
+    assert 'cove_ocds_releases_or_records_bucket{le="1.0"} 0.0' in lines
+    assert 'cove_ocds_releases_or_records_bucket{le="10.0"} 1.0' in lines
+    assert 'cove_ocds_phase_duration_seconds_count{kind="request",phase="checks"} 1.0' in lines
+    assert 'cove_ocds_phase_duration_seconds_count{kind="request",phase="render"} 1.0' in lines
+    assert any(line.startswith('cove_ocds_cache_requests_total{cache="schema",result=') for line in lines)
+    assert 'cove_ocds_error_groups_total{category="format"} 4.0' in lines
+    assert 'cove_ocds_error_groups_total{category="required"} 2.0' in lines
+    assert "cove_ocds_analyses_in_progress 0.0" in lines
+    assert "cove_ocds_analyses_queued 1.0" in lines
+
+    settings.METRICS_DATABASE_PATH = None
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_in_progress(settings, tmp_path):
+    settings.METRICS_DATABASE_PATH = str(tmp_path / "metrics.sqlite3")
+
+    process = subprocess.Popen(["sleep", "0"])
+    process.wait()
+    # A process that died while checking an upload.
+    with metrics._connect() as connection, connection:  # noqa: SLF001
+        connection.execute("INSERT INTO live VALUES ('cove_ocds_analyses_in_progress', ?, 1)", (process.pid,))
+
+    with metrics.in_progress():
+        assert "cove_ocds_analyses_in_progress 1.0" in metrics.expose().splitlines()
+    assert "cove_ocds_analyses_in_progress 0.0" in metrics.expose().splitlines()
+
+    with metrics._connect() as connection:  # noqa: SLF001
+        assert connection.execute("SELECT pid FROM live").fetchall() == [(os.getpid(),)]
+
+
+def test_metrics_locked(settings, tmp_path, caplog):
+    settings.METRICS_DATABASE_PATH = str(tmp_path / "metrics.sqlite3")
+    metrics.increment("cove_ocds_conversions_total", status="completed")
+
+    # Another process holds a write lock.
+    other = sqlite3.connect(settings.METRICS_DATABASE_PATH)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        metrics.increment("cove_ocds_conversions_total", status="completed")
+        assert time.monotonic() - start < 5
+    finally:
+        other.rollback()
+        other.close()
+
+    assert "Failed to record metrics" in caplog.text
+    assert 'cove_ocds_conversions_total{status="completed"} 1.0' in metrics.expose().splitlines()
@@ -0,0 +1,131 @@
+import os
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.uploadedfile import UploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+
+from cove_ocds.models import Conversion, Job
+
+
+@pytest.mark.django_db
+def test_explore_page_job(client, settings):
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    # Jobs are disabled by default.
+    resp = client.get(data.get_absolute_url())
+    assert resp.templates[0].name == "cove_ocds/explore_release.html"
+    assert not Job.objects.exists()
+
+    settings.BACKGROUND_JOB_MIN_SIZE = 1
+
+    resp = client.post(data.get_absolute_url())
+    assert resp.status_code == 200
+    assert resp.templates[0].name == "cove_ocds/processing.html"
+    assert Job.objects.get(supplied_data=data).status == Job.Status.QUEUED
+
+    call_command("run_jobs", "--burst")
+
+    job = Job.objects.get(supplied_data=data)
+    assert job.status == Job.Status.COMPLETED
+    assert job.started <= job.finished
+    assert job.error is None
+
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+    assert resp.templates[0].name == "cove_ocds/explore_release.html"
+    assert resp.context["version_used"] == "1.0"
+
+    # Viewing the results in another language queues a new job, instead of processing the data in the request.
+    with patch("cove_ocds.views.analyze") as mock:
+        resp = client.get(data.get_absolute_url(), headers={"accept-language": "es"})
+    assert not mock.called
+    assert resp.templates[0].name == "cove_ocds/processing.html"
+    job = Job.objects.get(supplied_data=data)
+    assert job.status == Job.Status.QUEUED
+    assert job.language == "es"
+
+    call_command("run_jobs", "--burst")
+
+    resp = client.get(data.get_absolute_url(), headers={"accept-language": "es"})
+    assert resp.templates[0].name == "cove_ocds/explore_release.html"
+    assert resp.context["version_used"] == "1.0"
+    resp = client.get(data.get_absolute_url())
+    assert resp.templates[0].name == "cove_ocds/explore_release.html"
+
+    # Changing the version queues a new job.
+    resp = client.post(data.get_absolute_url(), {"version": "1.1"})
+    assert resp.status_code == 200
+    assert resp.templates[0].name == "cove_ocds/processing.html"
+
+    job = Job.objects.get(supplied_data=data)
+    assert job.status == Job.Status.QUEUED
+    assert job.version == "1.1"
+
+
+@pytest.mark.django_db
+def test_explore_page_job_failed(client, settings):
+    settings.BACKGROUND_JOB_MIN_SIZE = 1
+
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases_not_json.json")) as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    client.get(data.get_absolute_url())
+    call_command("run_jobs", "--burst")
+
+    assert Job.objects.get(supplied_data=data).status == Job.Status.FAILED
+
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+    assert resp.templates[0].name == "error.html"
+    assert b"not well formed JSON" in resp.content
+    assert b"<strong>Error message:</strong>" in resp.content
+
+
+@pytest.mark.django_db
+def test_explore_page_job_stale(client, settings):
+    settings.BACKGROUND_JOB_MIN_SIZE = 1
+
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    client.get(data.get_absolute_url())
+    job = Job.claim()
+    assert job.status == Job.Status.RUNNING
+
+    # A running job is pending, until it times out.
+    resp = client.get(data.get_absolute_url())
+    assert resp.templates[0].name == "cove_ocds/processing.html"
+
+    # A running job isn't replaced.
+    resp = client.post(data.get_absolute_url(), {"version": "1.1"})
+    assert resp.templates[0].name == "cove_ocds/processing.html"
+    assert resp.context["job"].status == Job.Status.RUNNING
+    assert Job.objects.get(pk=job.pk).started == job.started
+
+    # The worker was killed.
+    started = timezone.now() - timedelta(seconds=settings.BACKGROUND_JOB_TIMEOUT + 1)
+    Job.objects.filter(pk=job.pk).update(started=started)
+
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+    assert resp.templates[0].name == "error.html"
+    assert b"The processing of the data was interrupted" in resp.content
+    assert Job.objects.get(pk=job.pk).status == Job.Status.FAILED
+
+    # A worker fails stale tasks, instead of leaving them running.
+    conversion = Conversion.enqueue(data, "https://example.com/schema.json")
+    assert Conversion.claim() == conversion
+    Conversion.objects.filter(pk=conversion.pk).update(started=started)
+
+    assert Conversion.claim() is None
+    conversion = Conversion.objects.get(pk=conversion.pk)
+    assert conversion.status == Conversion.Status.FAILED
+    assert conversion.error.startswith("The conversion was interrupted")
@@ -0,0 +1,167 @@
+import gzip
+import json
+import os
+import shutil
+import subprocess
+from unittest.mock import patch
+
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.uploadedfile import UploadedFile
+from django.urls import reverse
+from libcoveocds.schema import SchemaOCDS
+
+from cove_ocds.lib import ocds_show_extra, summaries
+from cove_ocds.lib.schema import get_fields_index
+
+
+def test_iterencode():
+    with open(os.path.join("tests", "fixtures", "tenders_releases_extra_data.json")) as f:
+        json_data = json.load(f)
+
+    data = json.loads("".join(ocds_show_extra.iterencode(json_data, get_fields_index(SchemaOCDS()))))
+
+    assert data["releases"][0]["__extra"] == {"someExtraData": {"some": "uniquedata"}}
+    assert data["releases"][0]["tender"]["__extra"] == {"methodRationale": "Open"}
+    assert data["publisher"] == json_data["publisher"]
+    # The data isn't modified.
+    assert "__extra" not in json_data["releases"][0]
+
+
+def test_merge():
+    compiled = {}
+    releases = [
+        {"tag": ["tender"], "tender": {"id": "1", "title": "A"}, "awards": [{"id": "1", "status": "pending"}]},
+        {"tag": ["award"], "tender": {"title": None}, "awards": [{"id": "1", "status": "active"}, {"id": "2"}]},
+    ]
+
+    assert ocds_show_extra.merge(compiled, releases[0]) == {"tag": None, "tender": None, "awards": None}
+    patch = ocds_show_extra.merge(compiled, releases[1])
+
+    assert compiled == {
+        "tag": ["award"],
+        "tender": {"id": "1"},
+        "awards": [{"id": "1", "status": "active"}, {"id": "2"}],
+    }
+    # The patch reverts the compiled release to the previous step.
+    assert patch == {
+        "tag": ["tender"],
+        "tender": {"title": "A"},
+        "awards": [{"id": "1", "status": "pending"}],
+    }
+    # The releases aren't modified.
+    assert releases[1]["awards"] == [{"id": "1", "status": "active"}, {"id": "2"}]
+
+
+def test_read_step(tmp_path):
+    with open(os.path.join("tests", "fixtures", "7_records.json")) as f:
+        record = json.load(f)["records"][1]
+    path = tmp_path / "steps.json.gz"
+    fields = get_fields_index(SchemaOCDS(record_pkg=True))
+
+    ocds_show_extra.write_steps(path, record, fields)
+
+    steps = [ocds_show_extra.read_step(path, number) for number in range(len(record["releases"]))]
+    compiled = {}
+    for release, step in zip(sorted(record["releases"], key=lambda release: release["date"]), steps, strict=True):
+        ocds_show_extra.merge(compiled, release)
+        assert step["release"] == compiled
+    assert ocds_show_extra.read_step(path, len(steps)) is None
+
+    # The patch of each step reverts its compiled release to the previous step's, in OCDS Show and on the server.
+    with open(os.path.join("cove_ocds", "templates", "cove_ocds", "explore_base.html")) as f:
+        template = f.read()
+    start = template.index("var apply_patch = function")
+    script = template[start : template.index("var compiled_by_server", start)]
+    pairs = [[step["release"], step["diff"]] for step in steps]
+    expected = [{}] + [step["release"] for step in steps[:-1]]
+
+    assert [ocds_show_extra.apply_patch(*pair) for pair in json.loads(json.dumps(pairs))] == expected
+    if node := shutil.which("node"):
+        source = (
+            "var $ = {each: function (o, f) { Object.keys(o).forEach(function (k) { f(k, o[k]) }) }}\n"
+            f"{script}\n"
+            "process.stdout.write(JSON.stringify(JSON.parse(require('fs').readFileSync(0, 'utf8'))"
+            ".map(function (pair) { return apply_patch(pair[0], pair[1]) })))"
+        )
+        output = subprocess.run(
+            [node, "-e", source], input=json.dumps(pairs), capture_output=True, check=True, text=True
+        )
+        assert json.loads(output.stdout) == expected
+
+
+@pytest.mark.django_db
+def test_explore_ocds_show_steps(client):
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "7_records.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    url = reverse("explore_ocds_show", args=(data.pk,))
+
+    # Store the summaries, like when the data is checked.
+    with open(data.original_file.path) as f:
+        summaries.write(data.upload_dir(), json.load(f), "records", {}, data.original_file.path)
+
+    resp = client.get(url, {"ocid": "ocds-example-2", "step": "1"})
+    assert resp.status_code == 200
+    content = resp.json()
+    assert content["ocid"] == "ocds-example-2"
+    assert content["releaseNumber"] == 1
+    assert [release["id"] for release in content["releases"]] == [f"ocds-example-2-{i}" for i in range(1, 6)]
+    assert content["release"]["id"] == "ocds-example-2-2"
+    assert content["diff"] == {"id": "ocds-example-2-1"}
+
+    # The steps are compiled once, and stored in one file.
+    assert len(os.listdir(os.path.join(data.upload_dir(), "ocds_show"))) == 1
+
+    with patch("cove_ocds.lib.ocds_show_extra.merge") as mock_object:
+        assert client.get(url, {"ocid": "ocds-example-2", "step": "4"}).json()["release"]["id"] == "ocds-example-2-5"
+        assert not mock_object.called
+
+    assert client.get(url, {"ocid": "ocds-example-2", "step": "0"}).json()["diff"] == {
+        "ocid": None,
+        "id": None,
+        "date": None,
+    }
+    assert client.get(url, {"ocid": "ocds-example-2", "step": "5"}).status_code == 404
+    assert client.get(url, {"ocid": "ocds-example-2", "step": "-1"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_explore_ocds_show(client):
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_extra_data.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    url = reverse("explore_ocds_show", args=(data.pk,))
+
+    # The data is no longer embedded in the page.
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+    assert "ocds_show_data" not in resp.context
+
+    resp = client.get(url, {"ocid": "PW-14-00627094"}, HTTP_ACCEPT_ENCODING="gzip, deflate")
+    assert resp.status_code == 200
+    assert resp["Content-Encoding"] == "gzip"
+    assert "no-cache" in resp["Cache-Control"]
+    content = json.loads(gzip.decompress(resp.content))
+    assert [release["ocid"] for release in content["releases"]] == ["PW-14-00627094"]
+    assert content["releases"][0]["__extra"] == {"someExtraData": {"some": "uniquedata"}}
+
+    # The response can be revalidated.
+    assert client.get(url, {"ocid": "PW-14-00627094"}, HTTP_IF_NONE_MATCH=resp["ETag"]).status_code == 304
+
+    # The stored response is sent without building a schema.
+    with patch("cove_ocds.views.SchemaOCDS") as mock_object:
+        assert client.get(url, {"ocid": "PW-14-00627094"}).status_code == 200
+        assert not mock_object.called
+
+    resp = client.get(url, {"position": "1"})
+    assert resp.status_code == 200
+    assert "Content-Encoding" not in resp
+    assert [release["ocid"] for release in resp.json()["releases"]] == ["PW-14-00629344"]
+
+    assert client.get(url).status_code == 400
+    assert client.get(url, {"position": "x"}).status_code == 400
+    assert client.get(url, {"ocid": "missing"}).status_code == 404
+    assert client.get(reverse("explore_ocds_show", args=("00000000-0000-0000-0000-000000000000",))).status_code == 404
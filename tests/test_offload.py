@@ -0,0 +1,78 @@
+import importlib
+import os
+
+import pytest
+from asgiref.sync import async_to_sync
+from cove.input.models import SuppliedData
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from django.urls import clear_url_caches, reverse
+
+import core.urls
+from cove_ocds.lib import offload
+
+
+@pytest.fixture
+def async_views(settings):
+    settings.ASYNC_VIEWS = True
+    importlib.reload(core.urls)
+    clear_url_caches()
+    yield
+    settings.ASYNC_VIEWS = False
+    importlib.reload(core.urls)
+    clear_url_caches()
+
+
+# The async views query the database in other threads, so the test's data must be committed.
+@pytest.mark.django_db(transaction=True)
+def test_explore_async(async_client, settings, async_views):
+    settings.MIDDLEWARE = ("cove_ocds.middleware.ServerTimingMiddleware", *settings.MIDDLEWARE)
+    settings.ANALYSIS_PROCESSES = 0
+
+    @async_to_sync
+    async def get(path):
+        return await async_client.get(path)
+
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_extra_data.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    resp = get(data.get_absolute_url())
+
+    assert resp.status_code == 200
+    assert resp.templates[0].name == "cove_ocds/explore_release.html"
+    assert resp.context["first_render"] is True
+    assert resp.context["releases_or_records_count"] == 2
+    phases = [metric.split(";")[0] for metric in resp["Server-Timing"].split(", ")]
+    assert phases == ["parse", "schema", "conversion", "checks", "grouping", "table", "snapshot", "render", "total"]
+
+    # The stored results are rendered.
+    resp = get(data.get_absolute_url())
+    assert resp.context["first_render"] is False
+    assert resp["Server-Timing"].startswith("snapshot;")
+
+    resp = get(reverse("explore_table", args=(data.pk,)))
+    assert resp.status_code == 200
+    assert len(resp.json()["results"]) == 2
+
+    assert get("/").status_code == 200
+
+    # Errors are rendered.
+    data = SuppliedData.objects.create()
+    data.original_file.save("test.json", ContentFile(b"{"))
+    resp = get(data.get_absolute_url())
+
+    assert resp.status_code == 200
+    assert resp.templates[0].name == "error.html"
+    assert "not well formed JSON" in resp.content.decode()
+
+
+def test_offload_process(settings):
+    settings.ANALYSIS_PROCESSES = 1
+
+    try:
+        assert async_to_sync(offload.process)(os.getpid) != os.getpid()
+        assert async_to_sync(offload.thread)(os.getpid) == os.getpid()
+    finally:
+        offload.executor().shutdown()
+        offload._executor = None  # noqa: SLF001
@@ -0,0 +1,226 @@
+import gc
+import json
+import os
+import time
+import weakref
+from unittest.mock import patch
+
+import libcove.lib.common as cove_common
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.urls import reverse
+from libcoveocds.config import LibCoveOCDSConfig
+from libcoveocds.schema import SchemaOCDS
+
+from cove_ocds.lib.schema import (
+    CacheInfo,
+    RequestSchema,
+    SchemaCache,
+    build_fields_index,
+    extended_schemas_dir,
+    get_fields_index,
+    schema_cache,
+    store_extended_schema,
+)
+from cove_ocds.lib.schema import SchemaOCDS as LocalSchemaOCDS
+
+
+def paths(index, prefix=""):
+    for name, subindex in index.items():
+        yield f"{prefix}/{name}"
+        yield from paths(subindex, f"{prefix}/{name}")
+
+
+@pytest.mark.parametrize("record_pkg", [False, True])
+def test_fields_index(record_pkg):
+    schema = schema_cache.get(SchemaOCDS(record_pkg=record_pkg))
+    deref_schema = schema.get_schema_obj(deref=True)
+
+    index = get_fields_index(schema)
+
+    assert set(paths(index)) == set(cove_common.schema_dict_fields_generator(deref_schema))
+    assert index["tender"]["items"]["classification"]["scheme"] == {}
+    # The index is built once per shared instance.
+    assert get_fields_index(schema_cache.get(SchemaOCDS(record_pkg=record_pkg))) is index
+
+
+def test_build_fields_index():
+    schema = {
+        "properties": {
+            "a": {"oneOf": [{"properties": {"b": {}}}, {"items": {"properties": {"c": {}}}}, True]},
+            "d": {"items": {"items": {"oneOf": [{"properties": {"e": {}}}]}}},
+        }
+    }
+
+    assert build_fields_index(schema) == {"a": {"b": {}, "c": {}}, "d": {"e": {}}}
+    assert set(paths(build_fields_index(schema))) == set(cove_common.schema_dict_fields_generator(schema))
+
+
+def test_schema_cache():
+    cache = SchemaCache(2)
+
+    release = cache.get(SchemaOCDS())
+    assert cache.cache_info() == CacheInfo(hits=0, misses=1, maxsize=2, currsize=1)
+
+    # The same version, extensions, language and package type share an instance.
+    other = cache.get(SchemaOCDS(package_data={"version": "1.1", "releases": []}))
+    assert other.shared is release.shared
+    assert cache.cache_info() == CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+
+    # Request-specific attributes aren't shared.
+    other.extended_schema_url = "https://example.com/extended_schema.json"
+    other.config.config["skip_aggregates"] = True
+    assert release.extended_schema_url is None
+    assert not release.config.config["skip_aggregates"]
+    assert not release.shared.config.config["skip_aggregates"]
+
+    # The configuration options that SchemaOCDS reads are in the key.
+    config = LibCoveOCDSConfig()
+    config.config["context"] = "api"
+    assert SchemaCache.key(SchemaOCDS(lib_cove_ocds_config=config)) != SchemaCache.key(SchemaOCDS())
+
+    record = cache.get(SchemaOCDS(record_pkg=True))
+    assert record.shared is not release.shared
+    assert cache.cache_info() == CacheInfo(hits=1, misses=2, maxsize=2, currsize=2)
+
+    # The least recently used instance is evicted.
+    cache.get(SchemaOCDS(select_version="1.0"))
+    assert cache.cache_info() == CacheInfo(hits=1, misses=3, maxsize=2, currsize=2)
+    assert cache.get(SchemaOCDS()).shared is not release.shared
+
+    cache.cache_clear()
+    assert cache.cache_info() == CacheInfo(hits=0, misses=0, maxsize=2, currsize=0)
+
+
+def test_schema_cache_evicted():
+    cache = SchemaCache(1)
+
+    schema = cache.get(LocalSchemaOCDS())
+    schema.get_schema_obj()
+    get_fields_index(schema)
+    reference = weakref.ref(schema.shared)
+    del schema
+
+    # The evicted instance isn't held by its memoized results.
+    cache.get(LocalSchemaOCDS(record_pkg=True))
+    gc.collect()
+    assert reference() is None
+
+
+def test_schema_cache_not_reusable():
+    cache = SchemaCache(2)
+
+    schema = cache.get(SchemaOCDS())
+    schema.invalid_extension["https://example.com/extension.json"] = "fetching failed"
+
+    assert cache.get(SchemaOCDS()).shared is not schema.shared
+    assert cache.cache_info() == CacheInfo(hits=0, misses=2, maxsize=2, currsize=1)
+
+
+@pytest.mark.django_db
+def test_explore_page_schema_cache(client, settings):
+    schema_cache.cache_clear()
+
+    for _ in range(2):
+        data = SuppliedData.objects.create()
+        data.original_file.save("test.json", ContentFile('{"releases": [{"ocid": "a"}]}'))
+        resp = client.get(data.get_absolute_url())
+        assert resp.status_code == 200
+
+    # The validation step shares the schema across requests.
+    assert schema_cache.cache_info() == CacheInfo(hits=1, misses=1, maxsize=settings.SCHEMA_CACHE_SIZE, currsize=1)
+
+    # The OCDS Show endpoint shares it, too, if it writes a response.
+    assert client.get(reverse("explore_ocds_show", args=(data.pk,)), {"position": "1"}).status_code == 404
+    assert client.get(reverse("explore_ocds_show", args=(data.pk,)), {"position": "0"}).status_code == 200
+    assert schema_cache.cache_info() == CacheInfo(hits=2, misses=1, maxsize=settings.SCHEMA_CACHE_SIZE, currsize=1)
+
+
+@pytest.mark.django_db
+def test_extended_schema_shared_between_uploads(client, httpserver):
+    # The same content is served for extension.json and release-schema.json.
+    httpserver.serve_content(
+        json.dumps(
+            {
+                "name": {"en": "Test"},
+                "description": {"en": "Test"},
+                "documentationUrl": {"en": "https://example.com"},
+                "schemas": ["release-schema.json"],
+                "definitions": {"Tender": {"properties": {"testField": {"type": "string"}}}},
+            }
+        )
+    )
+    json_data = json.dumps({"extensions": [f"{httpserver.url}/extension.json"], "releases": []})
+
+    paths = []
+    for _ in range(2):
+        data = SuppliedData.objects.create()
+        data.original_file.save("test.json", ContentFile(json_data))
+        resp = client.get(data.get_absolute_url())
+        assert resp.status_code == 200
+        assert "extended_schema.json" in resp.content.decode()
+
+        paths.append(os.path.join(data.upload_dir(), "extended_schema.json"))
+
+    with open(paths[0]) as f:
+        assert "testField" in json.load(f)["definitions"]["Tender"]["properties"]
+    assert os.path.samefile(*paths)
+    assert os.stat(paths[0]).st_nlink == 3
+
+
+def test_store_extended_schema(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+    schema = SchemaOCDS()
+    path = store_extended_schema(schema)
+
+    assert os.path.dirname(path) == extended_schemas_dir()
+    assert store_extended_schema(SchemaOCDS()) == path
+    with open(path) as f:
+        assert json.load(f) == schema.get_schema_obj()
+
+    # The digest is held by the instance. A deleted file is written again.
+    assert os.path.basename(path) == f"{schema.extended_schema_digest}.json"
+    os.remove(path)
+    assert store_extended_schema(schema) == path
+    with open(path) as f:
+        assert json.load(f) == schema.get_schema_obj()
+
+
+def test_create_extended_schema_file_expired(tmp_path):
+    class Schema:
+        extended = True
+
+        def get_schema_obj(self):
+            return {}
+
+    stored = tmp_path / "stored.json"
+    stored.write_text("{}")
+    schema = RequestSchema(Schema(), None)
+
+    # The stored file is deleted by the expire_extended_schemas command, before it is linked.
+    with patch("cove_ocds.lib.schema.store_extended_schema", side_effect=[tmp_path / "expired.json", stored]) as mock:
+        schema.create_extended_schema_file(tmp_path, "/media/")
+
+    assert mock.call_count == 2
+    assert schema.extended_schema_file == os.path.join(tmp_path, "extended_schema.json")
+    assert os.path.samefile(schema.extended_schema_file, stored)
+
+
+def test_expire_extended_schemas(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    directory = tmp_path / "extended_schemas"
+    directory.mkdir()
+
+    for name in ("old.json", "old_linked.json", "new.json"):
+        (directory / name).write_text("{}")
+    os.link(directory / "old_linked.json", tmp_path / "extended_schema.json")
+    old = time.time() - (settings.DELETE_FILES_AFTER_DAYS + 1) * 86400
+    for name in ("old.json", "old_linked.json"):
+        os.utime(directory / name, (old, old))
+
+    call_command("expire_extended_schemas")
+
+    assert sorted(os.listdir(directory)) == ["new.json", "old_linked.json"]
@@ -0,0 +1,52 @@
+import json
+import os
+from unittest.mock import patch
+
+import libcove.lib.common as cove_common
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.base import ContentFile
+from libcoveocds.schema import SchemaOCDS
+
+from cove_ocds.lib import sharding
+from cove_ocds.lib.schema import schema_cache
+
+
+@pytest.mark.parametrize(
+    ("filename", "record_pkg"),
+    [
+        ("tenders_releases_2_releases_invalid.json", False),
+        ("badfile_all_validation_errors.json", False),
+        ("30_records.json", True),
+    ],
+)
+def test_sharded_validation_errors(filename, record_pkg):
+    schema_obj = schema_cache.get(SchemaOCDS(record_pkg=record_pkg))
+
+    with open(os.path.join("tests", "fixtures", filename)) as f:
+        json_data = json.load(f)
+    key = "records" if record_pkg else "releases"
+    # Duplicate the releases or records across chunks, and add an invalid release or record to a later chunk.
+    json_data[key] = json_data[key] * 3 + ["not an object"]
+
+    expected = cove_common.get_schema_validation_errors(json_data, schema_obj, "-", {}, {})
+    actual = sharding.get_validation_errors(json_data, schema_obj, 2, 2)
+
+    assert actual == expected
+
+
+@pytest.mark.django_db
+def test_explore_page_sharded_validation(client, settings):
+    settings.VALIDATION_PROCESSES = 2
+    settings.VALIDATION_CHUNK_SIZE = 1
+
+    with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases_invalid.json"), "rb") as f:
+        data = SuppliedData.objects.create()
+        data.original_file.save("test.json", ContentFile(f.read()))
+
+    with patch("cove_ocds.views.sharding.get_validation_errors", wraps=sharding.get_validation_errors) as mock:
+        response = client.get(data.get_absolute_url())
+
+    assert mock.call_count == 1
+    assert response.status_code == 200
+    assert response.context["validation_errors_count"] > 0
@@ -0,0 +1,108 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.uploadedfile import UploadedFile
+
+from cove_ocds.lib import snapshot
+
+
+@pytest.mark.django_db
+def test_explore_page_snapshot(client):
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+    assert resp.context["version_used"] == "1.0"
+    expected = resp.context["releases_aggregates"]
+
+    with patch("cove_ocds.views.common_checks_ocds") as mock_object:
+        resp = client.get(data.get_absolute_url())
+        assert resp.status_code == 200
+        assert resp.context["version_used"] == "1.0"
+        assert resp.context["releases_aggregates"] == json.loads(json.dumps(expected))
+        assert not resp.context["first_render"]
+        assert not mock_object.called
+
+    # The validation errors are stored separately.
+    with open(os.path.join(data.upload_dir(), "snapshot-en.json")) as f:
+        assert "validation_errors" not in json.load(f)["context"]
+
+    # Changing the version invalidates the stored results.
+    resp = client.post(data.get_absolute_url(), {"version": "1.1"})
+    assert resp.status_code == 200
+    assert resp.context["version_used"] == "1.1"
+
+    with patch("cove_ocds.views.common_checks_ocds") as mock_object:
+        resp = client.get(data.get_absolute_url())
+        assert resp.status_code == 200
+        assert resp.context["version_used"] == "1.1"
+        assert not mock_object.called
+
+    with open(os.path.join(data.upload_dir(), "fingerprint.json")) as f:
+        assert json.load(f)["fingerprint"]["version"] == "1.1"
+
+
+@pytest.mark.django_db
+def test_explore_page_stale_files(client):
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+
+    path = os.path.join(data.upload_dir(), "validation_errors-3.json")
+    with open(path, "w") as f:
+        json.dump({"stale": []}, f)
+
+    # The file is reused for the same fingerprint.
+    snapshot.remove_stale_files(data.upload_dir(), snapshot.read_fingerprint(data.upload_dir()))
+    assert os.path.exists(path)
+
+    # Changing the version invalidates the file.
+    resp = client.post(data.get_absolute_url(), {"version": "1.1"})
+    assert resp.status_code == 200
+
+    with open(path) as f:
+        assert "stale" not in json.load(f)
+
+
+@pytest.mark.django_db
+def test_explore_page_version_independent(client):
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+    assert resp.context["version_used"] == "1.0"
+    expected = {key: resp.context[key] for key in ("releases_aggregates", "additional_checks")}
+
+    # Changing the version reruns only the checks that depend on the version.
+    with (
+        patch("libcoveocds.common_checks.get_releases_aggregates") as get_releases_aggregates,
+        patch("libcoveocds.common_checks.run_additional_checks") as run_additional_checks,
+    ):
+        resp = client.post(data.get_absolute_url(), {"version": "1.1"})
+        assert resp.status_code == 200
+        assert resp.context["version_used"] == "1.1"
+        for key, value in expected.items():
+            assert resp.context[key] == json.loads(json.dumps(value))
+        assert not get_releases_aggregates.called
+        assert not run_additional_checks.called
+
+    # The options aren't changed for another upload that shares the schema.
+    other = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_2_releases.json"), "rb") as fp:
+        other.original_file.save("test.json", UploadedFile(fp))
+
+    with patch("libcoveocds.common_checks.get_releases_aggregates", return_value={}) as get_releases_aggregates:
+        resp = client.post(other.get_absolute_url(), {"version": "1.1"})
+        assert resp.status_code == 200
+        assert resp.context["version_used"] == "1.1"
+        assert get_releases_aggregates.called
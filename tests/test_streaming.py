@@ -0,0 +1,190 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.uploadedfile import UploadedFile
+
+from cove_ocds.lib import streaming
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ("filename", "expected"),
+    [
+        ("tenders_releases_2_releases.json", b"Releases Table:"),
+        ("tenders_releases_2_releases_not_json.json", b"not well formed JSON"),
+        ("tenders_releases_2_releases_not_json.json", b"Expecting value (byte 3332)"),
+        ("latin1.json", b"which requires UTF-8 encoding"),
+        ("latin1.json", b"invalid continuation byte (byte 38)"),
+        ("bad_toplevel_list.json", b"OCDS JSON should have an object as the top level"),
+        ("tenders_releases_1_release_unpackaged.json", b"Missing OCDS package"),
+    ],
+)
+def test_explore_streaming(client, settings, filename, expected):
+    settings.STREAMING_JSON_MIN_SIZE = 0
+
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", filename), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+    assert expected in resp.content
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+@pytest.mark.parametrize("filename", ["tenders_releases_2_releases.json", "record_minimal_valid.json"])
+def test_streaming(filename, incremental):
+    path = os.path.join("tests", "fixtures", filename)
+    with open(path) as fp:
+        expected = json.load(fp)
+    key = "releases" if "releases" in expected else "records"
+
+    with patch.object(streaming, "INCREMENTAL", incremental):
+        assert streaming.load(path) == expected
+    assert streaming.read_spans(path, zip(*streaming.find_spans(path, key), strict=True)) == expected[key]
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        (
+            '{"releases": [1, "a,]\\"", {"x": [1, 2]}, [], null ] , "x": "releases"}',
+            [1, 'a,]"', {"x": [1, 2]}, [], None],
+        ),
+        ('{"uri": "é", "releases": [{"title": "éé"}, 2]}', [{"title": "éé"}, 2]),
+        ('{"re\\u006cease\\u0073": [3]}', [3]),
+        ('{"releases": [1], "releases": {"a": 1}}', []),
+        ('{"releases": {"a": 1}, "releases": [ 2 ]}', [2]),
+        ('{"x": {"releases": [1]}, "y": ["releases", [1]]}', []),
+        ('["releases", [1]]', []),
+        ("", []),
+        # Longer than a chunk, with multi-byte characters.
+        ('{"uri": "é", "releases": [' + ", ".join(['{"title": "é"}'] * 10000) + "]}", [{"title": "é"}] * 10000),
+    ],
+)
+def test_find_spans(tmp_path, text, expected):
+    path = tmp_path / "test.json"
+    path.write_text(text, encoding="utf-8")
+
+    assert streaming.read_spans(path, zip(*streaming.find_spans(path, "releases"), strict=True)) == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "kind", "offset"),
+    [
+        ('{"releases": []}', None, None),
+        (' {"uri": "é", "records": [{"x": [1, {"y": null}]}, 2.5e3, "]"]} \n', None, None),
+        ("", "syntax", 0),
+        ("\ufeff{}", "syntax", 0),
+        ('{"uri": "é", "releases": [1, 2,]}', "syntax", 32),
+        ('{"uri": "é", "releases": [1, 2 3]}', "syntax", 32),
+        ('{"uri": "é" "releases": []}', "syntax", 13),
+        ('{"uri": "é", releases: []}', "syntax", 14),
+        ('{"uri" "é"}', "syntax", 7),
+        ('{"releases": [], "uri": "é', "syntax", 24),
+        ('{"releases": [{"a": tru', "syntax", 20),
+        ('{"releases": []} {', "syntax", 17),
+        ('[{"releases": []}]', "top_level", 0),
+        (' "é"', "top_level", 1),
+        ('{"uri": "é", "release": []}', "package", 27),
+        ("{}", "package", 1),
+    ],
+)
+def test_check(tmp_path, text, kind, offset):
+    path = tmp_path / "test.json"
+    path.write_text(text, encoding="utf-8")
+
+    if kind is None:
+        streaming.check(path)
+    else:
+        with pytest.raises(streaming.StructureError) as excinfo:
+            streaming.check(path)
+        assert excinfo.value.kind == kind
+        assert excinfo.value.offset == offset
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 65536])
+def test_check_chunks(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(streaming, "CHUNK_SIZE", chunk_size)
+    path = tmp_path / "test.json"
+
+    path.write_bytes('{"releases": [{"title": "ééé", "value": 123456789}, "\\u00e9"]}'.encode())
+    streaming.check(path)
+
+    path.write_bytes('{"releases": [{"title": "ééé"}, 1]}'.encode()[:-3] + b"\xe9]}")
+    with pytest.raises(streaming.StructureError) as excinfo:
+        streaming.check(path)
+    assert excinfo.value.kind == "encoding"
+    assert excinfo.value.offset == 35
+
+
+@pytest.mark.parametrize(
+    "filename", sorted(name for name in os.listdir(os.path.join("tests", "fixtures")) if name.endswith(".json"))
+)
+def test_check_fixtures(filename):
+    path = os.path.join("tests", "fixtures", filename)
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except UnicodeError:
+        expected = "encoding"
+    except ValueError:
+        expected = "syntax"
+    else:
+        if not isinstance(data, dict):
+            expected = "top_level"
+        elif "releases" not in data and "records" not in data:
+            expected = "package"
+        else:
+            expected = None
+
+    try:
+        streaming.check(path)
+    except streaming.StructureError as e:
+        assert e.kind == expected
+    else:
+        assert expected is None
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_streaming_trailing_data(tmp_path, incremental):
+    path = tmp_path / "test.json"
+    path.write_text('{"releases": []} {}')
+
+    with patch.object(streaming, "INCREMENTAL", incremental), pytest.raises(ValueError):
+        streaming.load(path)
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        (
+            '{"version": "1.1", "extensions": ["a"], "extensions": ["b"], "releases": [{"version": "1.0"}]}',
+            {"version": "1.1", "extensions": ["b"], "releases": []},
+        ),
+        ('{"uri": "", "publisher": {"name": {"version": "1.0"}}, "records": [], "version": "1.1"}', {"records": []}),
+        ('{"version": "1.1", "extensions": [', {"version": "1.1"}),
+        ('{"version": "1.1"} {', {}),
+        ('[{"version": "1.1"}]', {}),
+        ('"version"', {}),
+        ("", {}),
+    ],
+)
+def test_read_header(tmp_path, text, expected):
+    path = tmp_path / "test.json"
+    path.write_text(text, encoding="utf-8")
+
+    assert streaming.read_header(path) == expected
+
+
+def test_read_header_limit(tmp_path):
+    path = tmp_path / "test.json"
+    path.write_text(json.dumps({"uri": "x" * streaming.HEADER_SIZE, "version": "1.1", "releases": []}))
+
+    assert streaming.read_header(path) == {}
+
+    path.write_bytes(b'{"version": "1.1", "uri": "\xff", "releases": []}')
+
+    assert streaming.read_header(path) == {}
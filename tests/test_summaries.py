@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.uploadedfile import UploadedFile
+from django.urls import reverse
+
+from cove_ocds.lib import summaries
+
+
+@pytest.mark.django_db
+def test_explore_table(client):
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "30_releases.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    url = reverse("explore_table", args=(data.pk,))
+
+    # The summaries are extracted when the data is checked.
+    assert client.get(url).status_code == 404
+
+    resp = client.get(data.get_absolute_url())
+    assert resp.status_code == 200
+    assert [release["id"] for release in resp.context["releases"]] == [
+        f"ocds-example-{i // 5 + 1}-{i % 5 + 1}" for i in range(25)
+    ]
+    assert b"Showing releases 25 at a time, out of 30." in resp.content
+
+    resp = client.get(url, {"page": "2"})
+    assert resp.status_code == 200
+    content = resp.json()
+    assert content["release_or_record"] == "release"
+    assert content["count"] == 30
+    assert content["num_pages"] == 2
+    assert [release["id"] for release in content["results"]] == [f"ocds-example-6-{i}" for i in range(1, 6)]
+    # The dates in this fixture have no seconds, so they aren't displayed, like in the template.
+    assert content["results"][0]["date_display"] == ""
+    assert set(content["results"][0]) <= {*summaries.RELEASE_FIELDS, "date_display"}
+
+    content = client.get(url, {"sort": "-id", "ocid": "ocds-example-2"}).json()
+    assert content["count"] == 5
+    assert [release["id"] for release in content["results"]] == [f"ocds-example-2-{i}" for i in range(5, 0, -1)]
+
+    # Releases can be read without parsing the whole file.
+    with open(data.original_file.path) as f:
+        releases = json.load(f)["releases"]
+    upload_dir = data.upload_dir()
+    assert summaries.read(upload_dir, ocid="ocds-example-2") == releases[5:10]
+    assert summaries.read(upload_dir, id="ocds-example-3-2") == [releases[11]]
+    assert summaries.read(upload_dir, position=29) == [releases[29]]
+    assert summaries.read(upload_dir, position=30) == []
+
+    assert client.get(url, {"page": "0"}).status_code == 400
+    assert client.get(url, {"sort": "tag"}).status_code == 400
+    assert client.get(reverse("explore_table", args=("00000000-0000-0000-0000-000000000000",))).status_code == 404
+
+
+def test_summaries(tmp_path):
+    json_data = {"records": [{"ocid": "b", "releases": [{}, {}], "compiledRelease": {}}, "x", {"ocid": "a\U0010ffff"}]}
+
+    summaries.write(tmp_path, json_data, "records", {"file": "abc"})
+
+    assert summaries.read_metadata(tmp_path) == {
+        "format": summaries.FORMAT,
+        "fingerprint": {"file": "abc"},
+        "key": "records",
+        "path": None,
+        "schema_url": None,
+    }
+    assert summaries.page(tmp_path, 1, 2) == {
+        "count": 3,
+        "results": [
+            {"ocid": "b", "release_count": 2, "compiledRelease": False, "versionedRelease": False},
+            {"release_count": 0, "compiledRelease": False, "versionedRelease": False},
+        ],
+    }
+    assert [record["ocid"] for record in summaries.page(tmp_path, 1, 5, "ocid")["results"][1:]] == ["a\U0010ffff", "b"]
+    assert summaries.page(tmp_path, 1, 5, ocid="a")["count"] == 1
+    assert summaries.page(tmp_path, 1, 5, ocid="a\U0010ffff")["count"] == 1
+    assert summaries.page(tmp_path / "missing", 1, 5) is None
+    # No byte offsets are stored if the data wasn't read from a file.
+    assert summaries.read(tmp_path, position=0) == []
@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+from cove.input.models import SuppliedData
+from django.core.files.uploadedfile import UploadedFile
+
+from cove_ocds.lib import timing
+
+
+@pytest.mark.django_db
+def test_server_timing(client, settings, caplog):
+    settings.MIDDLEWARE = ("cove_ocds.middleware.ServerTimingMiddleware", *settings.MIDDLEWARE)
+
+    data = SuppliedData.objects.create()
+    with open(os.path.join("tests", "fixtures", "tenders_releases_extra_data.json"), "rb") as fp:
+        data.original_file.save("test.json", UploadedFile(fp))
+
+    with caplog.at_level("INFO", logger="cove_ocds.middleware"):
+        resp = client.get(data.get_absolute_url())
+
+    assert resp.status_code == 200
+    phases = [metric.split(";")[0] for metric in resp["Server-Timing"].split(", ")]
+    assert phases == ["parse", "schema", "conversion", "checks", "grouping", "table", "snapshot", "render", "total"]
+
+    (message,) = caplog.messages
+    line = json.loads(message)
+    assert line["status"] == 200
+    assert line["file_size"] == data.original_file.size
+    assert line["release_count"] == 2
+    assert line["schema_version"] == "1.1"
+    assert line["extension_count"] == 0
+    assert set(line["phases"]) == set(phases) - {"total"}
+
+    # The stored results are rendered.
+    resp = client.get(data.get_absolute_url())
+    assert resp["Server-Timing"].startswith("snapshot;")
+
+    # Responses from views without phases aren't timed.
+    assert "Server-Timing" not in client.get("/")
+
+
+def test_timing_disabled():
+    # The phases do nothing outside a request.
+    with timing.phase("parse"):
+        timing.annotate(file_size=1)
+
+    with timing.record() as timings, timing.phase("parse"):
+        timing.annotate(file_size=1)
+
+    assert list(timings.phases) == ["parse"]
+    assert timings.fields == {"file_size": 1}
+    assert timings.header(0.5).endswith(", total;dur=500.0")
@@ -683,7 +683,7 @@ def test_table_rows(client, filename, total, items, subtotal):
     panel = document.cssselect(f"#{items}-table-panel")[0].text_content()
 
     assert f"This file contains {total} {items}" in document.cssselect(".key-facts ul li")[0].text_content()
-    assert "first" not in panel if total <= subtotal else f"first 25 {items}" in panel
+    assert "at a time" not in panel if total <= subtotal else f"Showing {items} 25 at a time, out of {total}" in panel
     assert len(document.cssselect(f"#{items}-table-panel table tbody tr")) == subtotal
 
 
@@ -706,7 +706,7 @@ def test_table_rows_settings(client, filename, total, items, subtotal):
     panel = document.cssselect(f"#{items}-table-panel")[0].text_content()
 
     assert f"This file contains {total} {items}" in document.cssselect(".key-facts ul li")[0].text_content()
-    assert "first" not in panel if total <= subtotal else f"first 10 {items}" in panel
+    assert "at a time" not in panel if total <= subtotal else f"Showing {items} 10 at a time, out of {total}" in panel
     assert len(document.cssselect(f"#{items}-table-panel table tbody tr")) == subtotal
 
 